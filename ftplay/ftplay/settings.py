@@ -147,3 +147,12 @@ SIMPLE_JWT = {
 }
 
 AUTH_USER_MODEL = 'main.CustomUser'
+
+# Push delivery (see main/push.py). The log transport writes each multicast
+# to PUSH_LOG_FILE, or to the main.push logger when unset
+PUSH_TRANSPORT = 'main.push.LogTransport'
+PUSH_LOG_FILE = None
+
+# Unread NEW_PARTICIPANT/NEW_COMMENT notifications for the same recipient
+# and game within this many seconds are merged into one digest; 0 disables
+NOTIFICATION_COALESCE_WINDOW_SECONDS = 300
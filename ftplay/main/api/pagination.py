@@ -0,0 +1,70 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class GameCursorPagination(CursorPagination):
+    """Keyset pagination over (start_at, id) with an opaque cursor.
+
+    Page size defaults to page_size and can be set per request with
+    ?page_size=, capped at max_page_size.
+    """
+    ordering = ('start_at', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class LeaderboardCursorPagination(CursorPagination):
+    """Keyset pagination down one leaderboard metric, ties broken by player.
+
+    The view sets `metric`; the page walks the matching
+    (board, -metric, player) index.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return (f'-{view.metric}', 'player_id')
+
+
+class NearbyCursorPagination(CursorPagination):
+    """Keyset pagination outwards by distance_km, ties broken by id.
+
+    Expects a queryset from Game.objects.within_radius().
+    """
+    ordering = ('distance_km', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class SearchCursorPagination(CursorPagination):
+    """Keyset pagination down search_rank, ties broken by id.
+
+    Expects a queryset from Game.objects.search().
+    """
+    ordering = ('-search_rank', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecommendationPagination(PageNumberPagination):
+    """Page numbers over an already ranked list of recommendations"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class NotificationCursorPagination(CursorPagination):
+    """Keyset pagination through an inbox, latest event first, over (last_event_at, id).
+
+    Coalescing only ever moves last_event_at forward, so rows only move
+    towards the head of the inbox: a walk down the pages never repeats a
+    row, and a digest that gains an event mid-walk is left off the later
+    pages but heads a reloaded first page, still unread.
+    """
+    ordering = ('-last_event_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -1,11 +1,14 @@
 from rest_framework import serializers
 from main.models import Game, GameRating, GameComment
+from main.models.game import compute_game_window
+from django.db import transaction
 from django.utils import timezone
-import datetime
 
 class GameSerializer(serializers.ModelSerializer):
     organizer_name = serializers.CharField(source='organizer.name', read_only=True)
     participants_count = serializers.SerializerMethodField()
+    status = serializers.SerializerMethodField()
+    is_joined = serializers.SerializerMethodField()
     
     class Meta:
         model = Game
@@ -14,13 +17,64 @@ class GameSerializer(serializers.ModelSerializer):
             'venue_details', 'location', 'duration', 'number_of_participants',
             'player_fees', 'game_rules', 'status', 'visibility', 'password',
             'organizer', 'organizer_name', 'participants', 'participants_count',
-            'created_at', 'updated_at'
+            'is_joined', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'organizer', 'organizer_name']
 
     def get_participants_count(self, obj):
+        # Annotated by Game.objects.with_participant_data()
+        participant_count = getattr(obj, 'participant_count', None)
+        if participant_count is not None:
+            return participant_count
         return obj.participants.count()
 
+    def get_status(self, obj):
+        # Querysets from Game.objects.with_effective_status() carry the status
+        # as of now; the stored status may lag until the background update runs
+        return getattr(obj, 'effective_status', obj.status)
+
+    def get_is_joined(self, obj):
+        # GameViewSet passes the requesting player's cached joined game ids
+        joined_game_ids = self.context.get('joined_game_ids')
+        return joined_game_ids is not None and obj.pk in joined_game_ids
+
+class GameRecommendationSerializer(GameSerializer):
+    # Set on each game by the recommended_games action
+    recommendation_score = serializers.FloatField(read_only=True)
+    distance_km = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta(GameSerializer.Meta):
+        fields = GameSerializer.Meta.fields + ['recommendation_score', 'distance_km']
+
+class GameRecommendationQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lon = serializers.FloatField(required=False, min_value=-180, max_value=180)
+
+    def validate(self, data):
+        if ('lat' in data) != ('lon' in data):
+            raise serializers.ValidationError("lat and lon must be given together")
+        return data
+
+class GameNearbySerializer(GameSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+
+    class Meta(GameSerializer.Meta):
+        fields = GameSerializer.Meta.fields + ['distance_km']
+
+class GameNearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(default=10, min_value=0.1, max_value=100)
+
+class GameSearchSerializer(GameSerializer):
+    search_rank = serializers.FloatField(read_only=True)
+
+    class Meta(GameSerializer.Meta):
+        fields = GameSerializer.Meta.fields + ['search_rank']
+
+class GameSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+
 class GameCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Game
@@ -34,10 +88,12 @@ class GameCreateSerializer(serializers.ModelSerializer):
         """Custom validation for game creation"""
         # Validate that date and time are in the future
         if 'date' in data and 'time' in data:
-            game_datetime = datetime.datetime.combine(data['date'], data['time'].time())
-            # Make the datetime timezone-aware
-            game_datetime = timezone.make_aware(game_datetime)
-            if game_datetime <= timezone.now():
+            # The same start the game will be stored with, in the game's region
+            start, _ = compute_game_window(
+                data['date'], data['time'], data.get('duration'),
+                data.get('region', Game._meta.get_field('region').default)
+            )
+            if start <= timezone.now():
                 raise serializers.ValidationError("Game date and time must be in the future")
         
         # Validate number of participants
@@ -72,25 +128,19 @@ class GameUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Cannot update a completed or canceled game")
         
         # Validate that date and time are in the future
-        if 'date' in data and 'time' in data:
-            game_datetime = datetime.datetime.combine(data['date'], data['time'].time())
-            game_datetime = timezone.make_aware(game_datetime)
-            if game_datetime <= timezone.now():
-                raise serializers.ValidationError("Game date and time must be in the future")
-        elif 'date' in data and instance.time:
-            game_datetime = datetime.datetime.combine(data['date'], instance.time.time())
-            game_datetime = timezone.make_aware(game_datetime)
-            if game_datetime <= timezone.now():
-                raise serializers.ValidationError("Game date and time must be in the future")
-        elif 'time' in data and instance.date:
-            game_datetime = datetime.datetime.combine(instance.date, data['time'].time())
-            game_datetime = timezone.make_aware(game_datetime)
-            if game_datetime <= timezone.now():
+        if {'date', 'time', 'region'} & set(data):
+            start, _ = compute_game_window(
+                data.get('date', instance.date),
+                data.get('time', instance.time),
+                data.get('duration', instance.duration),
+                data.get('region', instance.region),
+            )
+            if start <= timezone.now():
                 raise serializers.ValidationError("Game date and time must be in the future")
         
         # Validate number of participants (can't be less than current participants)
         if 'number_of_participants' in data:
-            current_participants = instance.participants.count()
+            current_participants = instance.spots_taken
             if data['number_of_participants'] < current_participants:
                 raise serializers.ValidationError(
                     f"Cannot reduce participants below current count ({current_participants})"
@@ -108,6 +158,25 @@ class GameUpdateSerializer(serializers.ModelSerializer):
         
         return data
 
+    def update(self, instance, validated_data):
+        """Save the game and fill any spots it gained from the waitlist.
+
+        The spot counter is re-read under the row lock, so joins that landed
+        since the instance was loaded are counted against a reduced capacity.
+        """
+        with transaction.atomic():
+            instance.spots_taken = Game.objects.select_for_update().values_list(
+                'spots_taken', flat=True,
+            ).get(pk=instance.pk)
+            if validated_data.get('number_of_participants', instance.spots_taken) < instance.spots_taken:
+                raise serializers.ValidationError(
+                    f"Cannot reduce participants below current count ({instance.spots_taken})"
+                )
+            instance = super().update(instance, validated_data)
+            if 'number_of_participants' in validated_data:
+                instance.promote_waitlisted()
+        return instance
+
 class GameRatingSerializer(serializers.ModelSerializer):
     player_name = serializers.CharField(source='player.name', read_only=True)
     
@@ -119,6 +188,17 @@ class GameRatingSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'verification_status']
 
+class GameRatingBulkVerifySerializer(serializers.Serializer):
+    rating_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False
+    )
+    all_pending = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if bool(data.get('rating_ids')) == data['all_pending']:
+            raise serializers.ValidationError("Provide either rating_ids or all_pending")
+        return data
+
 class GameCommentSerializer(serializers.ModelSerializer):
     player_name = serializers.CharField(source='player.name', read_only=True)
     organizer_name = serializers.CharField(source='organizer.name', read_only=True)
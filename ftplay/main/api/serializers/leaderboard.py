@@ -0,0 +1,30 @@
+from rest_framework import serializers
+from main.models import LeaderboardEntry
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    player_name = serializers.CharField(source='player.name', read_only=True)
+
+    class Meta:
+        model = LeaderboardEntry
+        fields = [
+            'player', 'player_name', 'wins', 'draw', 'lose', 'goals',
+            'assists', 'games_played', 'win_percentage'
+        ]
+
+class LeaderboardRankSerializer(LeaderboardEntrySerializer):
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta(LeaderboardEntrySerializer.Meta):
+        fields = LeaderboardEntrySerializer.Meta.fields + ['rank']
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    metric = serializers.ChoiceField(
+        choices=[choice for choice, _ in LeaderboardEntry.METRIC_CHOICES],
+        default='win_percentage'
+    )
+    period = serializers.ChoiceField(
+        choices=[choice for choice, _ in LeaderboardEntry.PERIOD_CHOICES],
+        default='ALL_TIME'
+    )
+    location = serializers.CharField(required=False, allow_blank=True)
+    date = serializers.DateField(required=False)
@@ -0,0 +1,18 @@
+from rest_framework import serializers
+from main.models import Notification
+
+class NotificationSerializer(serializers.ModelSerializer):
+    game_title = serializers.CharField(source='game.title', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'type', 'message', 'coalesced_count', 'is_read', 'game', 'game_title',
+            'actor_player', 'actor_organizer', 'created_at', 'last_event_at'
+        ]
+        read_only_fields = fields
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    # Newest notification the client has seen; everything up to it is marked
+    # read. Omit to mark every notification read
+    up_to = serializers.UUIDField(required=False)
@@ -25,6 +25,14 @@ class OrganizerProfileUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Name must be at least 2 characters long")
         return value.strip()
 
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # Only the edited fields, so counters moved concurrently on the row
+        # are not written back stale
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
 class OrganizerDeleteSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
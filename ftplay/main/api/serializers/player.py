@@ -1,5 +1,22 @@
 from rest_framework import serializers
-from main.models import Player, PlayerDetails
+from django.db import transaction
+from main.models import GameRating, Player, PlayerDetails
+
+def update_player_details(player, details_data):
+    """Save `details_data` on the player's details, moving leaderboard entries on a location change.
+
+    Only the edited fields are written, so the result counters moved by
+    verified ratings are never saved back stale.
+    """
+    with transaction.atomic():
+        details, created = PlayerDetails.objects.select_for_update().get_or_create(player=player)
+        moved = 'location' in details_data and details_data['location'] != details.location
+        for attr, value in details_data.items():
+            setattr(details, attr, value)
+        details.save(update_fields=[*details_data, 'updated_at'])
+        if moved:
+            GameRating.rebuild_leaderboard_entries([player.pk])
+    return details
 
 class PlayerDetailsSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,7 +25,11 @@ class PlayerDetailsSerializer(serializers.ModelSerializer):
             'age_group', 'play_position', 'trait_that_suits', 'skill_level',
             'often_play_football', 'rank_technique_score', 'rank_physical_score',
             'rank_defense_score', 'rank_attack_score', 'video_link', 'video_key',
-            'title', 'location', 'wins', 'draw', 'lose', 'goal', 'assists'
+            'title', 'location', 'wins', 'draw', 'lose', 'goal', 'assists',
+            'skill_rating', 'rated_games'
+        ]
+        read_only_fields = [
+            'wins', 'draw', 'lose', 'goal', 'assists', 'skill_rating', 'rated_games'
         ]
 
 class PlayerProfileSerializer(serializers.ModelSerializer):
@@ -28,17 +49,15 @@ class PlayerProfileSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         details_data = validated_data.pop('details', None)
         
-        # Update Player fields
+        # Update Player fields; only those edited, so counters moved
+        # concurrently on the row are not written back stale
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        instance.save(update_fields=[*validated_data, 'updated_at'])
 
         # Update or create PlayerDetails
         if details_data:
-            details, created = PlayerDetails.objects.get_or_create(player=instance)
-            for attr, value in details_data.items():
-                setattr(details, attr, value)
-            details.save()
+            update_player_details(instance, details_data)
 
         return instance
 
@@ -70,7 +89,9 @@ class PlayerProfileUpdateSerializer(serializers.Serializer):
         player_data = {k: v for k, v in validated_data.items() if k in player_fields}
         for attr, value in player_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        # Only the edited fields, so counters moved concurrently on the row
+        # are not written back stale
+        instance.save(update_fields=[*player_data, 'updated_at'])
 
         # Update PlayerDetails fields
         details_fields = [
@@ -81,10 +102,7 @@ class PlayerProfileUpdateSerializer(serializers.Serializer):
         details_data = {k: v for k, v in validated_data.items() if k in details_fields}
         
         if details_data:
-            details, created = PlayerDetails.objects.get_or_create(player=instance)
-            for attr, value in details_data.items():
-                setattr(details, attr, value)
-            details.save()
+            update_player_details(instance, details_data)
 
         return instance
 
@@ -95,10 +113,7 @@ class PlayerRankScoreUpdateSerializer(serializers.Serializer):
     rank_attack_score = serializers.IntegerField(min_value=0, max_value=100)
 
     def update(self, instance, validated_data):
-        details, created = PlayerDetails.objects.get_or_create(player=instance)
-        for attr, value in validated_data.items():
-            setattr(details, attr, value)
-        details.save()
+        update_player_details(instance, validated_data)
         return instance
 
 class PlayerDeleteSerializer(serializers.Serializer):
@@ -5,6 +5,12 @@ from .views.auth import RegisterView, LoginView, ChangePasswordView
 from .views.player import PlayerProfileView, PlayerRankScoreView
 from .views.organizer import OrganizerProfileView
 from .views.game import GameViewSet
+from .views.leaderboard import LeaderboardView, LeaderboardMyRankView
+from .views.notification import (
+    NotificationInboxView,
+    NotificationUnreadCountView,
+    NotificationMarkReadView
+)
 
 router = DefaultRouter()
 router.register(r'games', GameViewSet, basename='game')
@@ -17,5 +23,10 @@ urlpatterns = [
     path('player/profile/', PlayerProfileView.as_view(), name='player_profile'),
     path('player/rank-scores/', PlayerRankScoreView.as_view(), name='player_rank_scores'),
     path('organizer/profile/', OrganizerProfileView.as_view(), name='organizer_profile'),
+    path('leaderboards/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboards/me/', LeaderboardMyRankView.as_view(), name='leaderboard_my_rank'),
+    path('notifications/', NotificationInboxView.as_view(), name='notification_inbox'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification_unread_count'),
+    path('notifications/mark-read/', NotificationMarkReadView.as_view(), name='notification_mark_read'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
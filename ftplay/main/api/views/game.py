@@ -3,20 +3,38 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from ..serializers.game import (
     GameSerializer, 
     GameCreateSerializer, 
     GameUpdateSerializer,
     GameRatingSerializer, 
-    GameCommentSerializer
+    GameRatingBulkVerifySerializer,
+    GameCommentSerializer,
+    GameRecommendationSerializer,
+    GameRecommendationQuerySerializer,
+    GameNearbySerializer,
+    GameNearbyQuerySerializer,
+    GameSearchSerializer,
+    GameSearchQuerySerializer
+)
+from ..pagination import (
+    GameCursorPagination,
+    NearbyCursorPagination,
+    RecommendationPagination,
+    SearchCursorPagination
+)
+from main.recommendations import recommend_games
+from main.models import (
+    Game, GameRating, GameComment, GameSuggestion, GameWaitlistEntry, Notification, Organizer
 )
-from main.models import Game, GameRating, GameComment, Organizer
 
 class GameViewSet(viewsets.ModelViewSet):
     queryset = Game.objects.all()
     serializer_class = GameSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = GameCursorPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -25,30 +43,37 @@ class GameViewSet(viewsets.ModelViewSet):
             return GameUpdateSerializer
         return GameSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user if self.request else None
+        # Same role order as get_queryset, so organizers never look up a player
+        if user is not None and not hasattr(user, 'organizer') and hasattr(user, 'player'):
+            context['joined_game_ids'] = user.player.get_joined_game_ids()
+        return context
+
+    def get_base_queryset(self):
+        """Games annotated with everything GameSerializer reads"""
+        return Game.objects.with_effective_status().with_participant_data()
+
     def get_queryset(self):
-        """Filter games based on user role and permissions, and update statuses"""
+        """Filter games based on user role and permissions"""
         user = self.request.user
         
-        # Update game statuses before returning queryset
-        Game.update_all_game_statuses()
-        
         # If user is an organizer, show their games
         if hasattr(user, 'organizer'):
-            return Game.objects.filter(organizer=user.organizer)
+            return self.get_base_queryset().filter(organizer=user.organizer)
         
         # If user is a player, show games they can participate in
         elif hasattr(user, 'player'):
-            return Game.objects.filter(visibility='PUBLIC')
+            return self.get_base_queryset().filter(visibility='PUBLIC')
         
         return Game.objects.none()
 
-    def retrieve(self, request, *args, **kwargs):
-        """Retrieve a single game and update its status"""
-        instance = self.get_object()
-        # Update the game status before returning
-        instance.update_status()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+    def paginated_response(self, games):
+        """Serialize one cursor page of `games`"""
+        page = self.paginate_queryset(games)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def perform_create(self, serializer):
         """Create a game and assign the current organizer as the creator"""
@@ -70,7 +95,7 @@ class GameViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only the game creator can update this game")
         
         # Prevent updating if game is already completed or canceled
-        if game.status in ['COMPLETED', 'CANCELED']:
+        if game.effective_status in ['COMPLETED', 'CANCELED']:
             raise PermissionDenied("Cannot update a completed or canceled game")
         
         serializer.save()
@@ -90,15 +115,20 @@ class GameViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only the game creator can cancel this game")
         
         # Check if game can be canceled
-        if game.status in ['COMPLETED', 'CANCELED']:
+        if game.effective_status in ['COMPLETED', 'CANCELED']:
             return Response(
                 {'error': 'Game is already completed or canceled'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Cancel the game
-        game.status = 'CANCELED'
-        game.save()
+        # Cancel the game; the event commits with the change it reports
+        with transaction.atomic():
+            game.status = 'CANCELED'
+            game.save(update_fields=['status', 'updated_at'])
+            Notification.notify_game(
+                game, 'GAME_CANCELED', f'"{game.title}" has been canceled',
+                Notification.AUDIENCE_PARTICIPANTS, actor_organizer=user.organizer
+            )
         
         return Response(
             {'message': 'Game canceled successfully', 'status': game.status},
@@ -115,73 +145,123 @@ class GameViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'player'):
             raise PermissionDenied("Only players can join games")
         
-        # Update game status before checking
-        game.update_status()
-        
-        # Check if game is joinable
-        if game.status != 'UPCOMING':
+        errors = {
+            Game.NOT_OPEN: 'Game is not open for joining',
+            Game.ALREADY_JOINED: 'Already joined this game',
+            Game.FULL: 'Game is full',
+        }
+        # The event commits with the join it reports
+        with transaction.atomic():
+            outcome = game.add_participant(user.player)
+            if outcome == Game.JOINED:
+                Notification.notify_game(
+                    game, 'NEW_PARTICIPANT', f'{user.player.name} joined "{game.title}"',
+                    Notification.AUDIENCE_EVERYONE, actor_player=user.player
+                )
+        if outcome in errors:
             return Response(
-                {'error': 'Game is not open for joining'}, 
+                {'error': errors[outcome]}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if player is already in the game
-        if game.participants.filter(id=user.player.id).exists():
+        return Response(
+            {'message': 'Successfully joined the game'},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'])
+    def leave(self, request, pk=None):
+        """Leave a game as a player"""
+        game = self.get_object()
+        user = self.request.user
+        
+        # Check if user is a player
+        if not hasattr(user, 'player'):
+            raise PermissionDenied("Only players can leave games")
+        
+        if game.remove_participant(user.player) == Game.NOT_JOINED:
             return Response(
-                {'error': 'Already joined this game'}, 
+                {'error': 'Not joined this game'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if game is full
-        if game.participants.count() >= game.number_of_participants:
+        return Response(
+            {'message': 'Successfully left the game'},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'])
+    def join_waitlist(self, request, pk=None):
+        """Queue for a spot in a full game"""
+        game = self.get_object()
+        user = self.request.user
+        
+        if not hasattr(user, 'player'):
+            raise PermissionDenied("Only players can join waitlists")
+        
+        outcome, position = game.add_to_waitlist(user.player)
+        errors = {
+            Game.ALREADY_JOINED: 'Already joined this game',
+            Game.NOT_OPEN: 'Game is not open for joining',
+            Game.SPOTS_AVAILABLE: 'Game has open spots, join it directly',
+            Game.ALREADY_WAITLISTED: 'Already on the waitlist for this game',
+        }
+        if outcome in errors:
             return Response(
-                {'error': 'Game is full'}, 
+                {'error': errors[outcome]}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Join the game
-        game.participants.add(user.player)
-        
         return Response(
-            {'message': 'Successfully joined the game'},
+            {'message': 'Added to the waitlist', 'position': position},
             status=status.HTTP_200_OK
         )
 
     @action(detail=True, methods=['post'])
-    def leave(self, request, pk=None):
-        """Leave a game as a player"""
+    def leave_waitlist(self, request, pk=None):
+        """Leave the waitlist of a game"""
         game = self.get_object()
         user = self.request.user
         
-        # Check if user is a player
         if not hasattr(user, 'player'):
-            raise PermissionDenied("Only players can leave games")
+            raise PermissionDenied("Only players can leave waitlists")
         
-        # Check if player is in the game
-        if not game.participants.filter(id=user.player.id).exists():
+        if game.remove_from_waitlist(user.player) == Game.NOT_WAITLISTED:
             return Response(
-                {'error': 'Not joined this game'}, 
+                {'error': 'Not on the waitlist for this game'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Leave the game
-        game.participants.remove(user.player)
-        
         return Response(
-            {'message': 'Successfully left the game'},
+            {'message': 'Successfully left the waitlist'},
             status=status.HTTP_200_OK
         )
 
+    @action(detail=True, methods=['get'])
+    def waitlist_position(self, request, pk=None):
+        """Get the current player's place in the waitlist"""
+        game = self.get_object()
+        user = self.request.user
+        
+        if not hasattr(user, 'player'):
+            raise PermissionDenied("Only players can access this endpoint")
+        
+        entry = GameWaitlistEntry.objects.filter(game=game, player=user.player).first()
+        if entry is None:
+            return Response(
+                {'error': 'Not on the waitlist for this game'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({'position': entry.position}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def rate(self, request, pk=None):
         """Rate a game"""
         game = self.get_object()
         
-        # Update game status before allowing rating
-        game.update_status()
-        
-        # Only allow rating completed games
-        if game.status != 'COMPLETED':
+        # Only allow rating completed games; the stored status may lag behind
+        if game.effective_status != 'COMPLETED':
             return Response(
                 {'error': 'Can only rate completed games'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -189,10 +269,64 @@ class GameViewSet(viewsets.ModelViewSet):
         
         serializer = GameRatingSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(game=game, player=request.user.player)
+            with transaction.atomic():
+                serializer.save(game=game, player=request.user.player)
+                Notification.notify_game(
+                    game, 'RATING_SUBMITTED', f'{request.user.player.name} rated "{game.title}"',
+                    Notification.AUDIENCE_ORGANIZER, actor_player=request.user.player
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'])
+    def verify_ratings(self, request, pk=None):
+        """Verify submitted ratings in bulk - only the creator can verify"""
+        game = self.get_object()
+        user = self.request.user
+        
+        if not hasattr(user, 'organizer') or game.organizer != user.organizer:
+            raise PermissionDenied("Only the game creator can verify ratings")
+        
+        serializer = GameRatingBulkVerifySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        verified_ids = GameRating.verify_pending(
+            game,
+            rating_ids=serializer.validated_data.get('rating_ids'),
+            actor_organizer=user.organizer,
+        )
+        return Response(
+            {'verified': len(verified_ids), 'rating_ids': verified_ids},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['get'])
+    def balance_teams(self, request, pk=None):
+        """Split the participants into even teams - only the creator can balance"""
+        game = self.get_object()
+        user = self.request.user
+        
+        if not hasattr(user, 'organizer') or game.organizer != user.organizer:
+            raise PermissionDenied("Only the game creator can balance teams")
+        
+        try:
+            team_count = int(request.query_params.get('teams', 2))
+        except ValueError:
+            team_count = 0
+        if team_count < 2:
+            return Response(
+                {'error': 'teams must be an integer of at least 2'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if team_count > game.spots_taken:
+            return Response(
+                {'error': 'Not enough participants for that many teams'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(game.get_balanced_teams(team_count), status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def comment(self, request, pk=None):
         """Comment on a game"""
@@ -201,11 +335,19 @@ class GameViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             # Set the appropriate user (player or organizer)
             if hasattr(request.user, 'player'):
-                serializer.save(game=game, player=request.user.player)
+                author = request.user.player
+                saved_by, actor = {'player': author}, {'actor_player': author}
             elif hasattr(request.user, 'organizer'):
-                serializer.save(game=game, organizer=request.user.organizer)
+                author = request.user.organizer
+                saved_by, actor = {'organizer': author}, {'actor_organizer': author}
             else:
                 raise PermissionDenied("Invalid user type")
+            with transaction.atomic():
+                serializer.save(game=game, **saved_by)
+                Notification.notify_game(
+                    game, 'NEW_COMMENT', f'{author.name} commented on "{game.title}"',
+                    Notification.AUDIENCE_EVERYONE, **actor
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -217,12 +359,8 @@ class GameViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'organizer'):
             raise PermissionDenied("Only organizers can access this endpoint")
         
-        # Update all game statuses before returning
-        Game.update_all_game_statuses()
-        
-        games = Game.objects.filter(organizer=user.organizer)
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        games = self.get_base_queryset().filter(organizer=user.organizer)
+        return self.paginated_response(games)
 
     @action(detail=False, methods=['get'])
     def available_games(self, request):
@@ -232,16 +370,81 @@ class GameViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'player'):
             raise PermissionDenied("Only players can access this endpoint")
         
-        # Update all game statuses before returning
-        Game.update_all_game_statuses()
+        games = self.get_base_queryset().filter_effective_status('UPCOMING').filter(
+            visibility='PUBLIC'
+        ).exclude(pk__in=user.player.get_joined_game_ids())
+        
+        return self.paginated_response(games)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search public games by title, venue name and rules with ?q=, best match first"""
+        query = GameSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
         
-        games = Game.objects.filter(
-            status='UPCOMING',
+        games = self.get_base_queryset().search(query.validated_data['q']).filter(
+            visibility='PUBLIC'
+        )
+        
+        paginator = SearchCursorPagination()
+        page = paginator.paginate_queryset(games, request, view=self)
+        serializer = GameSearchSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Get up to 10 public game titles and venue names completing ?q="""
+        suggestions = GameSuggestion.suggest(request.query_params.get('q', ''))
+        return Response({'suggestions': suggestions}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Get upcoming public games within ?radius= km of ?lat=&lon=, nearest first"""
+        query = GameNearbyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        
+        games = self.get_base_queryset().within_radius(
+            params['lat'], params['lon'], params['radius']
+        ).filter_effective_status('UPCOMING').filter(
             visibility='PUBLIC'
-        ).exclude(participants=user.player)
+        )
         
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        paginator = NearbyCursorPagination()
+        page = paginator.paginate_queryset(games, request, view=self)
+        serializer = GameNearbySerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def recommended_games(self, request):
+        """Get open games ranked for the current player, nearest to ?lat=&lon= first"""
+        user = self.request.user
+        
+        if not hasattr(user, 'player'):
+            raise PermissionDenied("Only players can access this endpoint")
+        
+        query = GameRecommendationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ranked = recommend_games(
+            user.player,
+            latitude=query.validated_data.get('lat'),
+            longitude=query.validated_data.get('lon'),
+        )
+        
+        paginator = RecommendationPagination()
+        page = paginator.paginate_queryset(ranked, request, view=self)
+        games = self.get_base_queryset().in_bulk([game_id for game_id, _, _ in page])
+        results = []
+        for game_id, score, distance in page:
+            game = games.get(game_id)
+            if game is None:
+                continue
+            game.recommendation_score = score
+            game.distance_km = distance
+            results.append(game)
+        
+        serializer = GameRecommendationSerializer(results, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def joined_games(self, request):
@@ -251,49 +454,45 @@ class GameViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'player'):
             raise PermissionDenied("Only players can access this endpoint")
         
-        # Update all game statuses before returning
-        Game.update_all_game_statuses()
-        
-        games = Game.objects.filter(participants=user.player)
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        games = self.get_base_queryset().filter(participants=user.player)
+        return self.paginated_response(games)
 
     @action(detail=False, methods=['get'])
     def completed_games(self, request):
         """Get completed games for the current user"""
         user = self.request.user
         
-        # Update all game statuses before returning
-        Game.update_all_game_statuses()
-        
         if hasattr(user, 'organizer'):
             # For organizers, show their completed games
-            games = Game.objects.filter(organizer=user.organizer, status='COMPLETED')
+            games = self.get_base_queryset().filter_effective_status('COMPLETED').filter(
+                organizer=user.organizer
+            )
         elif hasattr(user, 'player'):
             # For players, show completed games they participated in
-            games = Game.objects.filter(participants=user.player, status='COMPLETED')
+            games = self.get_base_queryset().filter_effective_status('COMPLETED').filter(
+                participants=user.player
+            )
         else:
             games = Game.objects.none()
         
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(games)
 
     @action(detail=False, methods=['get'])
     def ongoing_games(self, request):
         """Get ongoing games for the current user"""
         user = self.request.user
         
-        # Update all game statuses before returning
-        Game.update_all_game_statuses()
-        
         if hasattr(user, 'organizer'):
             # For organizers, show their ongoing games
-            games = Game.objects.filter(organizer=user.organizer, status='ONGOING')
+            games = self.get_base_queryset().filter_effective_status('ONGOING').filter(
+                organizer=user.organizer
+            )
         elif hasattr(user, 'player'):
             # For players, show ongoing games they're participating in
-            games = Game.objects.filter(participants=user.player, status='ONGOING')
+            games = self.get_base_queryset().filter_effective_status('ONGOING').filter(
+                participants=user.player
+            )
         else:
             games = Game.objects.none()
         
-        serializer = self.get_serializer(games, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        return self.paginated_response(games) 
\ No newline at end of file
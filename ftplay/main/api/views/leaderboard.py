@@ -0,0 +1,65 @@
+from rest_framework import generics, status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from django.utils import timezone
+from ..pagination import LeaderboardCursorPagination
+from ..serializers.leaderboard import (
+    LeaderboardEntrySerializer,
+    LeaderboardRankSerializer,
+    LeaderboardQuerySerializer
+)
+from main.models import LeaderboardEntry
+
+def get_board(request):
+    """Resolve ?metric=&period=&location=&date= to (board key, metric)"""
+    query = LeaderboardQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    params = query.validated_data
+    board = LeaderboardEntry.board_key(
+        location=params.get('location'),
+        period=params['period'],
+        on=params.get('date') or timezone.localdate(),
+    )
+    return board, params['metric']
+
+class LeaderboardView(generics.ListAPIView):
+    """Top players of one board, ordered by the requested metric"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = LeaderboardEntrySerializer
+    pagination_class = LeaderboardCursorPagination
+
+    def get_queryset(self):
+        board, self.metric = get_board(self.request)
+        return LeaderboardEntry.objects.filter(
+            board=board,
+            games_played__gt=0,
+        ).select_related('player')
+
+class LeaderboardMyRankView(APIView):
+    """The current player's entry and rank on one board"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not hasattr(request.user, 'player'):
+            return Response(
+                {'error': 'User is not a player'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        board, metric = get_board(request)
+        entry = LeaderboardEntry.objects.filter(
+            board=board,
+            player=request.user.player,
+            games_played__gt=0,
+        ).annotate(
+            rank=LeaderboardEntry.rank_annotation(metric)
+        ).select_related('player').first()
+        
+        if entry is None:
+            return Response(
+                {'error': 'No verified results on this leaderboard yet'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(LeaderboardRankSerializer(entry).data)
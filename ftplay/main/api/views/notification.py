@@ -0,0 +1,70 @@
+from rest_framework import generics, status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import PermissionDenied
+from ..pagination import NotificationCursorPagination
+from ..serializers.notification import NotificationSerializer, NotificationMarkReadSerializer
+from main.models import Notification
+
+def get_recipient(user):
+    """The Player or Organizer whose inbox the user reads"""
+    if hasattr(user, 'organizer'):
+        return user.organizer
+    if hasattr(user, 'player'):
+        return user.player
+    raise PermissionDenied("Only players and organizers have notifications")
+
+class NotificationInboxView(generics.ListAPIView):
+    """The current user's notifications, latest event first; ?unread=true for unread only"""
+    permission_classes = [IsAuthenticated]
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
+
+    def get_queryset(self):
+        notifications = Notification.objects.filter(
+            **Notification.recipient_filter(get_recipient(self.request.user))
+        ).select_related('game').only(
+            'id', 'type', 'message', 'coalesced_count', 'is_read', 'created_at', 'last_event_at',
+            'actor_player_id', 'actor_organizer_id', 'game__id', 'game__title',
+        )
+        if self.request.query_params.get('unread') in ('true', '1'):
+            notifications = notifications.filter(is_read=False)
+        return notifications
+
+class NotificationUnreadCountView(APIView):
+    """Unread badge count, read from the recipient's maintained counter"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        recipient = get_recipient(request.user)
+        return Response({'unread': max(recipient.unread_notifications, 0)})
+
+class NotificationMarkReadView(APIView):
+    """Mark notifications read up to and including `up_to`, or all of them"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        recipient = get_recipient(request.user)
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        up_to = None
+        if 'up_to' in serializer.validated_data:
+            up_to = Notification.objects.filter(
+                pk=serializer.validated_data['up_to'],
+                **Notification.recipient_filter(recipient)
+            ).only('id', 'last_event_at').first()
+            if up_to is None:
+                return Response(
+                    {'error': 'Notification not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        marked = Notification.mark_read(recipient, up_to=up_to)
+        recipient.refresh_from_db(fields=['unread_notifications'])
+        return Response(
+            {'marked': marked, 'unread': max(recipient.unread_notifications, 0)},
+            status=status.HTTP_200_OK
+        )
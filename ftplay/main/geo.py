@@ -0,0 +1,106 @@
+"""Plain-Python geometry for games located by the coordinates in Game.location.
+
+There is no GIS extension behind the database, so games carry their
+latitude/longitude in ordinary columns plus a coarse grid cell key that
+nearby-game lookups can match with an index.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+# Roughly 22 km of latitude per cell
+CELL_SIZE_DEGREES = 0.2
+
+LATITUDE_KEYS = ('lat', 'latitude')
+LONGITUDE_KEYS = ('lng', 'lon', 'long', 'longitude')
+
+
+def parse_coordinate(value, limit):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value) or abs(value) > limit:
+        return None
+    return value
+
+
+def extract_coordinates(location):
+    """Find a (latitude, longitude) pair in a Game.location value, or (None, None).
+
+    Accepts a dict with lat/lng style keys, a GeoJSON point, or a list of
+    either; the first usable pair wins.
+    """
+    if isinstance(location, dict):
+        latitude = next((location[key] for key in LATITUDE_KEYS if key in location), None)
+        longitude = next((location[key] for key in LONGITUDE_KEYS if key in location), None)
+        latitude, longitude = parse_coordinate(latitude, 90), parse_coordinate(longitude, 180)
+        if latitude is not None and longitude is not None:
+            return latitude, longitude
+        coordinates = location.get('coordinates')
+        if isinstance(coordinates, (list, tuple)) and len(coordinates) == 2:
+            # GeoJSON order is [longitude, latitude]
+            latitude, longitude = parse_coordinate(coordinates[1], 90), parse_coordinate(coordinates[0], 180)
+            if latitude is not None and longitude is not None:
+                return latitude, longitude
+        nested = [value for value in location.values() if isinstance(value, (dict, list))]
+        return extract_coordinates(nested)
+    if isinstance(location, (list, tuple)):
+        for item in location:
+            if isinstance(item, (dict, list, tuple)):
+                coordinates = extract_coordinates(item)
+                if coordinates[0] is not None:
+                    return coordinates
+    return None, None
+
+
+def cell_index(latitude, longitude):
+    return (
+        math.floor(latitude / CELL_SIZE_DEGREES),
+        math.floor(longitude / CELL_SIZE_DEGREES),
+    )
+
+
+def get_cell(latitude, longitude):
+    """Grid cell key of a point, or None when the point is unknown"""
+    if latitude is None or longitude is None:
+        return None
+    return '%d:%d' % cell_index(latitude, longitude)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing a circle of `radius_km`"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # Longitude degrees shrink towards the poles
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lon_delta = min(lat_delta / cos_lat, 180)
+    return (
+        max(latitude - lat_delta, -90),
+        min(latitude + lat_delta, 90),
+        longitude - lon_delta,
+        longitude + lon_delta,
+    )
+
+
+def cells_within(latitude, longitude, radius_km):
+    """Every grid cell key overlapping the bounding box of a circle"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    min_row, min_col = cell_index(min_lat, min_lon)
+    max_row, max_col = cell_index(max_lat, max_lon)
+    columns = 360 / CELL_SIZE_DEGREES
+    half = columns // 2
+    return [
+        # Wrap columns across the antimeridian
+        '%d:%d' % (row, (col + half) % columns - half)
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    ]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
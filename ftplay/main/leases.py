@@ -0,0 +1,56 @@
+"""Leased work queues, shared by the push outbox and notification events.
+
+A queue row is due while its status is pending and next_attempt_at has
+passed. claim_batch() leases due rows to one worker by moving
+next_attempt_at CLAIM_TIMEOUT ahead, so a crashed worker's rows come due
+again. The lease doubles as the worker's claim: a worker taking over an
+expired row moves it again, and holds_lease() then tells the slow worker
+the row is no longer its own. A failed row is retried after
+get_backoff() until MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+
+# How long a worker holds claimed rows before another may take them
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def get_backoff(attempts):
+    """Delay before retrying a row that has failed `attempts` times"""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def claim_batch(pending, batch_size, now, ordering=('next_attempt_at',)):
+    """Lease up to `batch_size` due rows of the `pending` queryset to this worker.
+
+    On PostgreSQL concurrent workers skip each other's locked rows; the
+    lease keeps them claimed after the short locking transaction ends.
+    Each returned row carries its lease in next_attempt_at.
+    """
+    lease = now + CLAIM_TIMEOUT
+    with transaction.atomic():
+        due = pending.filter(next_attempt_at__lte=now).order_by(*ordering)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due[:batch_size])
+        pending.filter(pk__in=[row.pk for row in rows]).update(next_attempt_at=lease)
+    for row in rows:
+        row.next_attempt_at = lease
+    return rows
+
+
+def holds_lease(pending, row):
+    """Lock `row` and check it is still in `pending` under the lease it was claimed with.
+
+    Call inside the transaction that completes the row, so no other
+    worker can take it over before that commits.
+    """
+    return pending.select_for_update().filter(
+        pk=row.pk, next_attempt_at=row.next_attempt_at,
+    ).values_list('pk', flat=True).first() is not None
+
@@ -0,0 +1,93 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from main.models import Game, Organizer, Player
+
+# A page as fetched by GameCursorPagination, one extra row to detect a next page
+PAGE_ROWS = 21
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # A bare "SCAN table" reads every row; "SCAN table USING INDEX" walks
+    # an index in order and is how cursor pages are served
+    'sqlite': re.compile(r'^(?:\d+ \d+ \d+ )?SCAN (\w+)(?: AS \w+)?$', re.MULTILINE),
+}
+
+
+def get_hot_querysets(organizer, player, now):
+    """(name, queryset) for each GameViewSet list endpoint, as it pages"""
+    base = Game.objects.with_effective_status(now).with_participant_data()
+    querysets = [
+        ('list/my_games (organizer)', base.filter(organizer=organizer)),
+        ('list (player)', base.filter(visibility='PUBLIC')),
+        ('available_games', base.filter_effective_status('UPCOMING', now).filter(
+            visibility='PUBLIC'
+        ).exclude(pk__in=player.get_joined_game_ids())),
+        ('joined_games', base.filter(participants=player)),
+        ('completed_games (organizer)', base.filter_effective_status('COMPLETED', now).filter(organizer=organizer)),
+        ('completed_games (player)', base.filter_effective_status('COMPLETED', now).filter(participants=player)),
+        ('ongoing_games (organizer)', base.filter_effective_status('ONGOING', now).filter(organizer=organizer)),
+        ('ongoing_games (player)', base.filter_effective_status('ONGOING', now).filter(participants=player)),
+    ]
+    return [(name, queryset.order_by('start_at', 'id')[:PAGE_ROWS]) for name, queryset in querysets]
+
+
+def explain(queryset):
+    """Query plan of `queryset`, asking PostgreSQL to avoid sequential scans wherever an index exists.
+
+    With tiny tables PostgreSQL rightly prefers sequential scans, so they
+    are penalized to reveal whether an index path exists at all.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def find_seq_scans(plan):
+    """Tables a plan reads in full"""
+    pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return sorted(set(pattern.findall(plan)))
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the GameViewSet list querysets and flag sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Print every query plan',
+        )
+
+    def handle(self, *args, **options):
+        organizer = Organizer.objects.order_by('pk').first()
+        player = Player.objects.order_by('pk').first()
+        if organizer is None or player is None:
+            raise CommandError('Need at least one organizer and one player to build the querysets')
+
+        if connection.vendor not in SEQ_SCAN_PATTERNS:
+            self.stdout.write(
+                self.style.WARNING(f'Sequential scan detection is not supported on {connection.vendor}')
+            )
+
+        flagged = []
+        for name, queryset in get_hot_querysets(organizer, player, timezone.now()):
+            plan = explain(queryset)
+            seq_scans = find_seq_scans(plan)
+            if seq_scans:
+                flagged.append(name)
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {name}: {", ".join(seq_scans)}'))
+            else:
+                self.stdout.write(f'OK        {name}')
+            if options['verbose']:
+                self.stdout.write(plan)
+
+        if flagged:
+            raise CommandError(f'{len(flagged)} queryset(s) read a table in full: {", ".join(flagged)}')
+        self.stdout.write(self.style.SUCCESS('No sequential scans in hot querysets'))
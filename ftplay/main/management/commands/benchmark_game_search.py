@@ -0,0 +1,108 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from main.models import Game, Organizer
+from main.models.user import CustomUser
+from main.search import build_search_document
+
+WORDS = [
+    'arena', 'park', 'stadium', 'turf', 'indoor', 'outdoor', 'futsal', 'league',
+    'friendly', 'sunday', 'evening', 'morning', 'city', 'model', 'town', 'sports',
+    'club', 'academy', 'ground', 'cage', 'rooftop', 'community', 'united', 'rovers',
+    'boots', 'bibs', 'referee', 'kickoff', 'halftime', 'tackles', 'keeper', 'rotation',
+]
+
+SYLLABLES = ['ka', 'ro', 'mi', 'tan', 'shi', 'lo', 'ver', 'den', 'ba', 'nor', 'qu', 'el']
+
+# Common words, a rarer two-word match, a venue-name word and a miss
+QUERIES = ['arena', 'sunday futsal', 'rooftop cage keeper', 'kalover', 'zzzz']
+
+
+class Command(BaseCommand):
+    help = (
+        'Time game search over synthetic games. The games are created in a '
+        'transaction that is rolled back, leaving the database unchanged'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=1000000,
+            help='Synthetic games to create (default: 1000000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Times each query is run (default: 20)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Games inserted per statement (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['games'], options['batch_size'])
+            for query in QUERIES:
+                self.time_query(query, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, synthetic games rolled back'))
+
+    def seed(self, count, batch_size):
+        rng = random.Random(0)
+        # Place names are drawn from a larger pool so some terms are rare
+        places = [
+            ''.join(rng.choices(SYLLABLES, k=3)) for _ in range(2000)
+        ]
+        user = CustomUser.objects.create(username='search-benchmark', email='search-benchmark@example.com')
+        organizer = Organizer.objects.create(user=user, name='Search benchmark')
+        start = timezone.now() + timedelta(days=1)
+
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            games = []
+            for _ in range(min(batch_size, count - offset)):
+                title = ' '.join(rng.sample(WORDS, 3)).title()
+                venue_details = [{'name': f'{rng.choice(places)} {rng.choice(WORDS)}'.title()}]
+                game_rules = ' '.join(rng.choices(WORDS, k=12))
+                game = Game(
+                    title=title,
+                    images=[],
+                    time=start,
+                    date=start.date(),
+                    venue_details=venue_details,
+                    number_of_participants=10,
+                    player_fees=0,
+                    game_rules=game_rules,
+                    organizer=organizer,
+                    visibility='PUBLIC',
+                    search_document=build_search_document(title, game_rules, venue_details),
+                )
+                game.start_at, game.end_at = game.get_game_window()
+                games.append(game)
+            Game.objects.bulk_create(games)
+        self.stdout.write(f'Seeded {count} games in {time.perf_counter() - started:.1f}s')
+
+    def time_query(self, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            page = list(
+                Game.objects.search(query).filter(visibility='PUBLIC').order_by('-search_rank', 'id')[:20]
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'{query!r}: {len(page)} results, '
+            f'p50 {statistics.median(timings):.1f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms'
+        )
@@ -0,0 +1,113 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+from main.models import Game, Organizer, Player
+from main.models.user import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Time parallel joins of synthetic players into synthetic games and '
+        'report joins/sec. The joins must commit to contend for real, so the '
+        'synthetic users, players and games are deleted afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--players',
+            type=int,
+            default=200,
+            help='Players racing to join each game (default: 200)',
+        )
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            default=22,
+            help='Spots in each game (default: 22)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Threads joining in parallel (default: 16)',
+        )
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=5,
+            help='Games joined one after another (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.has_select_for_update:
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor} has no row locking; joins run one at a time'
+            ))
+        prefix = f'join-benchmark-{uuid.uuid4().hex[:8]}-'
+        try:
+            organizer, players = self.seed(prefix, options['players'])
+            joins, seconds = 0, 0.0
+            for number in range(1, options['games'] + 1):
+                elapsed = self.time_game(organizer, players, options['capacity'], options['workers'])
+                joins += len(players)
+                seconds += elapsed
+                self.stdout.write(
+                    f'game {number}: {len(players)} parallel joins in {elapsed:.3f}s '
+                    f'({len(players) / elapsed:.0f} joins/sec)'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'total: {joins} joins in {seconds:.3f}s ({joins / seconds:.0f} joins/sec)'
+            ))
+        finally:
+            # Players, the organizer and its games go with their users
+            CustomUser.objects.filter(username__startswith=prefix).delete()
+
+    def seed(self, prefix, count):
+        user = CustomUser.objects.create(username=f'{prefix}organizer', email=f'{prefix}organizer@example.com')
+        organizer = Organizer.objects.create(user=user, name='Join benchmark')
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com')
+            for i in range(count)
+        ])
+        players = Player.objects.bulk_create([
+            Player(user=user, name=user.username) for user in users
+        ])
+        return organizer, players
+
+    def time_game(self, organizer, players, capacity, workers):
+        start = timezone.now() + timedelta(days=1)
+        game = Game.objects.create(
+            organizer=organizer,
+            title='Join benchmark',
+            images=[],
+            time=start,
+            date=start.date(),
+            venue_details=[],
+            number_of_participants=capacity,
+            player_fees=0,
+            game_rules='',
+            visibility='PUBLIC',
+        )
+
+        def join(player):
+            try:
+                return Game.objects.get(pk=game.pk).add_participant(player)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(join, players))
+        elapsed = time.perf_counter() - started
+
+        game.refresh_from_db(fields=['spots_taken'])
+        joined = outcomes.count(Game.JOINED)
+        if joined != min(capacity, len(players)) or game.spots_taken != joined:
+            self.stderr.write(self.style.ERROR(
+                f'{joined} joins for {capacity} spots, spots_taken {game.spots_taken}'
+            ))
+        return elapsed
@@ -0,0 +1,27 @@
+from main.management.worker import QueueWorkerCommand
+from main.push import BatchStats, deliver_batch, get_transport
+
+
+class Command(QueueWorkerCommand):
+    help = 'Send queued push notifications in batches and report throughput per batch'
+    default_batch_size = 1000
+    default_idle_sleep = 2.0
+    items = 'messages'
+
+    def handle(self, *args, **options):
+        self.transport = get_transport()
+        super().handle(*args, **options)
+
+    def run_batch(self, batch_size):
+        return deliver_batch(self.transport, batch_size)
+
+    def empty_stats(self):
+        return BatchStats()
+
+    def format_stats(self, label, report):
+        return (
+            f'{label}: {report["claimed"]} claimed in {report["multicasts"]} multicasts, '
+            f'{report["sent"]} sent, {report["retried"]} retrying, {report["failed"]} failed, '
+            f'{report["dead"]} dead ({report["tokens_pruned"]} tokens pruned), '
+            f'{report["seconds"]}s ({report["send_seconds"]}s sending), {report["per_second"]}/s'
+        )
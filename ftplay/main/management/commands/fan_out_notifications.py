@@ -0,0 +1,33 @@
+import time
+from dataclasses import dataclass
+
+from main.management.worker import QueueWorkerCommand
+from main.models import NotificationEvent
+
+
+@dataclass
+class FanOutStats:
+    claimed: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self):
+        return {'claimed': self.claimed, 'failed': self.failed, 'seconds': round(self.seconds, 3)}
+
+
+class Command(QueueWorkerCommand):
+    help = 'Fan queued game events out to their recipients as notifications, in batches'
+    default_batch_size = 100
+    default_idle_sleep = 1.0
+    items = 'events'
+
+    def run_batch(self, batch_size):
+        started = time.monotonic()
+        claimed, failed = NotificationEvent.process_batch(batch_size)
+        return FanOutStats(claimed, failed, time.monotonic() - started)
+
+    def empty_stats(self):
+        return FanOutStats()
+
+    def format_stats(self, label, report):
+        return f'{label}: {report["claimed"]} events claimed, {report["failed"]} failed, {report["seconds"]}s'
@@ -0,0 +1,219 @@
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+from main.models import Game, Notification, Organizer, Player
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete old read notifications and collapse stale unread ones into one row '
+        'per recipient, game and type, in primary-key-ordered batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--read-days',
+            type=int,
+            default=30,
+            help='Delete read notifications older than this many days (default: 30)',
+        )
+        parser.add_argument(
+            '--unread-days',
+            type=int,
+            default=90,
+            help='Collapse unread notifications older than this many days (default: 90)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows examined per batch (default: 1000)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='Seconds to pause between batches (default: 0.5)',
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='Stop after the batch that exceeds this many seconds; rerun to continue',
+        )
+        parser.add_argument(
+            '--reconcile-counters',
+            action='store_true',
+            help='Also reset every player and organizer unread counter to their unread notifications',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count what would be removed without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.options = options
+        self.started = time.monotonic()
+        self.batches = 0
+        now = timezone.now()
+        self.totals = {'read_deleted': 0, 'unread_collapsed': 0, 'counters_fixed': 0}
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        finished = True
+        try:
+            self.delete_read(now - timedelta(days=options['read_days']))
+            self.collapse_unread(now - timedelta(days=options['unread_days']))
+            if options['reconcile_counters']:
+                self.reconcile_counters()
+        except BudgetExceeded:
+            finished = False
+
+        elapsed = time.monotonic() - self.started
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        summary = (
+            f'{verb} {self.totals["read_deleted"]} read and {self.totals["unread_collapsed"]} '
+            f'collapsed unread notifications in {self.batches} batches, {elapsed:.1f}s'
+        )
+        if options['reconcile_counters']:
+            verb = 'would fix' if options['dry_run'] else 'fixed'
+            summary += f'; {verb} {self.totals["counters_fixed"]} unread counters'
+        if finished:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.WARNING(f'{summary}; --max-seconds reached, rerun to continue'))
+
+    def batches_of(self, queryset):
+        """Yield `queryset` in pk order, batch_size rows at a time, pacing between batches"""
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(page.order_by('pk')[:self.options['batch_size']])
+            if not rows:
+                return
+            last_pk = rows[-1].pk
+            yield rows
+
+            self.batches += 1
+            max_seconds = self.options['max_seconds']
+            if max_seconds is not None and time.monotonic() - self.started >= max_seconds:
+                raise BudgetExceeded
+            if len(rows) == self.options['batch_size'] and self.options['sleep']:
+                time.sleep(self.options['sleep'])
+
+    def report(self, phase, batch_count, total):
+        self.stdout.write(
+            f'[{time.monotonic() - self.started:7.1f}s] {phase}: batch {self.batches + 1}, '
+            f'{batch_count} rows ({total} total)'
+        )
+
+    def delete_read(self, cutoff):
+        old_read = Notification.objects.filter(is_read=True, last_event_at__lt=cutoff).only('id')
+        for rows in self.batches_of(old_read):
+            if not self.options['dry_run']:
+                # Read notifications never become unread again, so no counter changes
+                Notification.objects.filter(pk__in=[row.pk for row in rows]).delete()
+            self.totals['read_deleted'] += len(rows)
+            self.report('read', len(rows), self.totals['read_deleted'])
+
+    def collapse_unread(self, cutoff):
+        """Fold each stale unread notification into the newest one for its recipient, game and type.
+
+        The survivor of each row's group is looked up in SQL alongside the
+        row, so nothing is held between batches. The kept row absorbs the
+        others' coalesced_count; the removed rows come off the recipients'
+        unread counters.
+        """
+        stale = Notification.objects.filter(is_read=False, last_event_at__lt=cutoff)
+        # Players and organizers apart, as NULL recipients never compare equal
+        for field in ('recipient_player_id', 'recipient_organizer_id'):
+            survivor = stale.filter(
+                **{field: models.OuterRef(field)},
+                game_id=models.OuterRef('game_id'),
+                type=models.OuterRef('type'),
+            ).order_by('-last_event_at', '-id').values('pk')[:1]
+            rows = stale.filter(**{f'{field}__isnull': False}).annotate(
+                survivor_id=models.Subquery(survivor),
+            ).only(
+                'id', 'type', 'is_read', 'game_id', 'recipient_player_id', 'recipient_organizer_id',
+                'coalesced_count',
+            )
+            for batch in self.batches_of(rows):
+                absorbed = defaultdict(list)
+                for row in batch:
+                    if row.survivor_id is not None and row.survivor_id != row.pk:
+                        absorbed[row.survivor_id].append(row)
+                collapsed = sum(len(group) for group in absorbed.values())
+                if collapsed and not self.options['dry_run']:
+                    collapsed = self.merge(absorbed)
+                self.totals['unread_collapsed'] += collapsed
+                self.report('unread', collapsed, self.totals['unread_collapsed'])
+
+    def merge(self, absorbed):
+        """Delete the absorbed rows and bump their survivors, in one transaction; returns rows deleted"""
+        ids = [row.pk for group in absorbed.values() for row in group] + list(absorbed)
+        with transaction.atomic():
+            # Rows read since they were fetched have already left the counters; leave them alone
+            still_unread = set(
+                Notification.objects.select_for_update().filter(
+                    pk__in=ids, is_read=False,
+                ).values_list('pk', flat=True)
+            )
+            removed, bumps = [], defaultdict(list)
+            for survivor_id, group in absorbed.items():
+                if survivor_id not in still_unread:
+                    continue
+                group = [row for row in group if row.pk in still_unread]
+                if group:
+                    removed.extend(group)
+                    bumps[sum(row.coalesced_count for row in group)].append((survivor_id, group[0]))
+            if not removed:
+                return 0
+
+            Notification.objects.filter(pk__in=[row.pk for row in removed]).delete()
+            Notification.adjust_unread_counters(removed, sign=-1)
+
+            for added, survivors in bumps.items():
+                Notification.objects.filter(pk__in=[survivor_id for survivor_id, _ in survivors]).update(
+                    coalesced_count=models.F('coalesced_count') + added, updated_at=timezone.now(),
+                )
+
+            # Digests also get their message rewritten to the new count
+            digests = defaultdict(list)
+            for survivors in bumps.values():
+                for survivor_id, row in survivors:
+                    if row.type in Notification.DIGEST_SUFFIXES:
+                        digests[(row.type, row.game_id)].append(survivor_id)
+            titles = dict(Game.objects.filter(
+                pk__in={game_id for _, game_id in digests}
+            ).values_list('pk', 'title')) if digests else {}
+            for (notification_type, game_id), survivor_ids in digests.items():
+                suffix = Notification.DIGEST_SUFFIXES[notification_type].format(title=titles.get(game_id, ''))
+                Notification.objects.filter(pk__in=survivor_ids).update(
+                    message=Concat(Cast('coalesced_count', models.CharField()), models.Value(suffix)),
+                )
+        return len(removed)
+
+    def reconcile_counters(self):
+        """Recount the unread counters of every player and organizer, one locked batch at a time"""
+        for model in (Player, Organizer):
+            for rows in self.batches_of(model.objects.only('id')):
+                fixed = Notification.reconcile_unread_counters(
+                    model, [row.pk for row in rows], dry_run=self.options['dry_run'],
+                )
+                self.totals['counters_fixed'] += fixed
+                self.report('counters', fixed, self.totals['counters_fixed'])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from main.models import GameSuggestionPrefix
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-prefix top suggestions from the titles and venues of open public games'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Suggestion rows fetched and prefix rows inserted per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting game suggestion rebuild at {timezone.now()}')
+        )
+
+        with transaction.atomic():
+            written = GameSuggestionPrefix.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {written} suggestion prefix counts')
+        )
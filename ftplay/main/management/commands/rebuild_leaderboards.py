@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.models import GameRating, Player
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every leaderboard from verified ratings, one batch of players at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Players rebuilt per transaction (default: 500)',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Show detailed output',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verbose = options['verbose']
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting leaderboard rebuild at {timezone.now()}')
+        )
+
+        # Each batch upserts its players' entries and drops the ones on
+        # boards they no longer belong to, so only that batch's rows are
+        # locked and memory stays bounded by the batch size
+        players = Player.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = None
+        processed = 0
+        written = 0
+        while True:
+            batch = players if last_pk is None else players.filter(pk__gt=last_pk)
+            player_ids = list(batch[:batch_size])
+            if not player_ids:
+                break
+            written += GameRating.rebuild_leaderboard_entries(player_ids)
+            processed += len(player_ids)
+            last_pk = player_ids[-1]
+            if verbose:
+                self.stdout.write(f'  Processed {processed} players')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {written} leaderboard entries for {processed} players'
+            )
+        )
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from main.models import GameRating, Player, PlayerDetails
+
+COUNTER_FIELDS = ['wins', 'draw', 'lose', 'goal', 'assists']
+
+
+class Command(BaseCommand):
+    help = 'Recompute PlayerDetails win/draw/lose/goal/assists counters from verified ratings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Players per aggregate query (default: 500)',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Show detailed output',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verbose = options['verbose']
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting player stats rebuild at {timezone.now()}')
+        )
+
+        players = Player.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = None
+        processed = 0
+        changed = 0
+        while True:
+            batch = players if last_pk is None else players.filter(pk__gt=last_pk)
+            player_ids = list(batch[:batch_size])
+            if not player_ids:
+                break
+            changed += self.rebuild_batch(player_ids)
+            processed += len(player_ids)
+            last_pk = player_ids[-1]
+            if verbose:
+                self.stdout.write(f'  Processed {processed} players')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt stats for {processed} players ({changed} changed)'
+            )
+        )
+
+    def rebuild_batch(self, player_ids):
+        """Recompute one chunk of players with a single aggregate query.
+
+        The details rows are locked before the aggregate is read, so a
+        verify_pending() either committed before it and is counted, or waits
+        for the rebuild and then adds its increments on top.
+        """
+        with transaction.atomic():
+            details = {
+                d.player_id: d
+                for d in PlayerDetails.objects.select_for_update().filter(player_id__in=player_ids)
+            }
+            totals = {
+                row['player_id']: row
+                for row in GameRating.objects.filter(
+                    player_id__in=player_ids,
+                    verification_status='VERIFIED',
+                ).order_by().values('player_id').annotate(
+                    wins=Count('pk', filter=Q(result='WIN')),
+                    draw=Count('pk', filter=Q(result='DRAW')),
+                    lose=Count('pk', filter=Q(result='LOSE')),
+                    goal=Sum('goals'),
+                    assists=Sum('assists'),
+                )
+            }
+            to_create = []
+            to_update = []
+            for player_id in player_ids:
+                row = totals.get(player_id, {})
+                counters = {field: row.get(field) or 0 for field in COUNTER_FIELDS}
+                player_details = details.get(player_id)
+                if player_details is None:
+                    if any(counters.values()):
+                        to_create.append(PlayerDetails(player_id=player_id, **counters))
+                    continue
+                if any(getattr(player_details, f) != v for f, v in counters.items()):
+                    for field, value in counters.items():
+                        setattr(player_details, field, value)
+                    to_update.append(player_details)
+
+            PlayerDetails.objects.bulk_create(to_create)
+            PlayerDetails.objects.bulk_update(to_update, COUNTER_FIELDS)
+        return len(to_create) + len(to_update)
@@ -1,7 +1,39 @@
+import heapq
+import json
+import signal
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.models import Count, Max, Q
 from django.utils import timezone
 from main.models import Game
 
+TRANSITION_KEYS = ['UPCOMING->ONGOING', 'UPCOMING->COMPLETED', 'ONGOING->COMPLETED']
+
+# Changed games are re-read from a little before the last one seen, so a
+# save that commits late with an older updated_at is not missed
+CHANGE_POLL_OVERLAP = timedelta(seconds=30)
+
+
+class QueryTimer:
+    """connection.execute_wrapper hook that counts queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.elapsed += time.monotonic() - start
+
 
 class Command(BaseCommand):
     help = 'Update game statuses based on current time (ongoing/completed)'
@@ -17,96 +49,286 @@ class Command(BaseCommand):
             action='store_true',
             help='Show detailed output',
         )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print a machine-readable run report instead of text output',
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Keep running and apply each transition when its start/end time is reached',
+        )
+        parser.add_argument(
+            '--resync-interval',
+            type=int,
+            default=300,
+            help='Seconds between reloads of upcoming transitions in daemon mode (default: 300)',
+        )
+        parser.add_argument(
+            '--change-poll-interval',
+            type=float,
+            default=5,
+            help='Seconds between checks for created or rescheduled games in daemon mode (default: 5)',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         verbose = options['verbose']
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'Starting game status update at {timezone.now()}')
-        )
-        
-        if dry_run:
+        as_json = options['json']
+
+        if options['daemon']:
+            if dry_run:
+                self.stderr.write(self.style.ERROR('--dry-run cannot be combined with --daemon'))
+                return
+            self.run_daemon(options['resync_interval'], verbose, options['change_poll_interval'])
+            return
+
+        started = time.monotonic()
+        now = timezone.now()
+        sql_timer = QueryTimer()
+
+        if not as_json:
             self.stdout.write(
-                self.style.WARNING('DRY RUN MODE - No changes will be made')
+                self.style.SUCCESS(f'Starting game status update at {now}')
             )
-        
-        # Get all non-canceled games
-        games = Game.objects.exclude(status='CANCELED')
-        
-        if verbose:
-            self.stdout.write(f'Found {games.count()} games to check')
-        
-        updated_games = []
-        
-        for game in games:
-            current_status = game.status
-            should_be_ongoing = game.should_be_ongoing()
-            should_be_completed = game.should_be_completed()
-            
-            if verbose:
-                game_datetime = game.get_game_datetime()
-                game_end = game.get_game_end_datetime()
-                self.stdout.write(
-                    f'Game: {game.title} (ID: {game.id})'
-                )
-                self.stdout.write(
-                    f'  Current Status: {current_status}'
-                )
-                self.stdout.write(
-                    f'  Game Start: {game_datetime}'
-                )
-                self.stdout.write(
-                    f'  Game End: {game_end}'
-                )
-                self.stdout.write(
-                    f'  Should be ongoing: {should_be_ongoing}'
-                )
+            if dry_run:
                 self.stdout.write(
-                    f'  Should be completed: {should_be_completed}'
+                    self.style.WARNING('DRY RUN MODE - No changes will be made')
                 )
-            
-            if not dry_run:
-                if game.update_status():
-                    updated_games.append(game)
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'Updated game "{game.title}" from {current_status} to {game.status}'
-                        )
-                    )
+
+        with connection.execute_wrapper(sql_timer):
+            if dry_run:
+                transition_counts, rows_scanned = self.plan_transitions(now)
+                transitions = Game.compute_status_transitions(now=now) if verbose else []
             else:
-                # Dry run - just show what would happen
-                if should_be_completed and current_status != 'COMPLETED':
-                    updated_games.append(game)
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Would update game "{game.title}" from {current_status} to COMPLETED'
-                        )
-                    )
-                elif should_be_ongoing and current_status != 'ONGOING':
-                    updated_games.append(game)
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'Would update game "{game.title}" from {current_status} to ONGOING'
-                        )
-                    )
-        
-        if updated_games:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully updated {len(updated_games)} games'
+                candidates = Game.compute_status_transitions(now=now)
+                # Candidates are the rows the engine's range scans read;
+                # only those still in their old status are applied
+                rows_scanned = len(candidates)
+                transitions = Game.apply_status_transitions(candidates, now=now) if candidates else []
+                transition_counts = Counter(
+                    f'{t.old_status}->{t.new_status}' for t in transitions
                 )
+
+            if verbose and transitions and not as_json:
+                self.write_transition_details(transitions, dry_run)
+
+            status_counts = dict(
+                Game.objects.order_by().values_list('status').annotate(count=Count('pk'))
             )
+
+        updated_count = sum(transition_counts.values())
+        report = {
+            'started_at': now.isoformat(),
+            'dry_run': dry_run,
+            'transitions': {key: transition_counts.get(key, 0) for key in TRANSITION_KEYS},
+            'updated': updated_count,
+            'rows_scanned': rows_scanned,
+            'queries': sql_timer.count,
+            'sql_time_ms': round(sql_timer.elapsed * 1000, 3),
+            'wall_time_ms': round((time.monotonic() - started) * 1000, 3),
+            'status_summary': status_counts,
+        }
+
+        if as_json:
+            self.stdout.write(json.dumps(report))
+            return
+
+        if updated_count:
+            verb = 'Would update' if dry_run else 'Successfully updated'
+            self.stdout.write(self.style.SUCCESS(f'{verb} {updated_count} games'))
+            for key, count in report['transitions'].items():
+                if count:
+                    self.stdout.write(f'  {key}: {count} games')
         else:
             self.stdout.write(
                 self.style.SUCCESS('No games needed status updates')
             )
-        
-        # Show summary by status
-        status_counts = {}
-        for game in Game.objects.all():
-            status_counts[game.status] = status_counts.get(game.status, 0) + 1
-        
+
+        if verbose:
+            self.stdout.write(
+                f'Rows scanned: {rows_scanned}, queries: {sql_timer.count}, '
+                f'SQL time: {report["sql_time_ms"]}ms, wall time: {report["wall_time_ms"]}ms'
+            )
+
         self.stdout.write('\nCurrent game status summary:')
         for status, count in status_counts.items():
-            self.stdout.write(f'  {status}: {count} games') 
\ No newline at end of file
+            self.stdout.write(f'  {status}: {count} games')
+
+    def plan_transitions(self, now):
+        """Count due transitions with one conditional aggregate.
+
+        rows_scanned counts the same candidate rows
+        Game.compute_status_transitions() reads in apply mode.
+        """
+        plan = Game.objects.filter(
+            status__in=['UPCOMING', 'ONGOING'],
+            start_at__lte=now,
+        ).aggregate(
+            upcoming_to_ongoing=Count('pk', filter=Q(status='UPCOMING', end_at__gt=now)),
+            upcoming_to_completed=Count('pk', filter=Q(status='UPCOMING', end_at__lte=now)),
+            ongoing_to_completed=Count('pk', filter=Q(status='ONGOING', end_at__lte=now)),
+        )
+        transition_counts = Counter({
+            'UPCOMING->ONGOING': plan['upcoming_to_ongoing'],
+            'UPCOMING->COMPLETED': plan['upcoming_to_completed'],
+            'ONGOING->COMPLETED': plan['ongoing_to_completed'],
+        })
+        return transition_counts, sum(transition_counts.values())
+
+    def write_transition_details(self, transitions, dry_run):
+        games = Game.objects.in_bulk(
+            [t.game_id for t in transitions],
+        )
+        for transition in transitions:
+            game = games.get(transition.game_id)
+            if game is None:
+                continue
+            self.stdout.write(f'Game: {game.title} (ID: {game.id})')
+            self.stdout.write(f'  Game Start: {game.start_at}')
+            self.stdout.write(f'  Game End: {game.end_at}')
+            message = (
+                f'{"Would update" if dry_run else "Updated"} game "{game.title}" '
+                f'from {transition.old_status} to {transition.new_status}'
+            )
+            style = self.style.WARNING if dry_run else self.style.SUCCESS
+            self.stdout.write(style(message))
+
+    def run_daemon(self, resync_interval, verbose, change_poll_interval=5):
+        """Sleep until the next start/end instant and apply only the due transitions.
+
+        Upcoming instants are kept in a heap that covers one resync interval.
+        The heap is reloaded when that window runs out, or right away on
+        SIGHUP (send it after bulk schedule changes). Every
+        change_poll_interval seconds, games saved since the last check add
+        their instants, so new or rescheduled games are picked up without
+        waiting for the resync. SIGINT/SIGTERM stop the loop.
+        """
+        wakeup = threading.Event()
+        state = {'stop': False, 'resync': True}
+
+        def request_stop(signum, frame):
+            state['stop'] = True
+            wakeup.set()
+
+        def request_resync(signum, frame):
+            state['resync'] = True
+            wakeup.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, request_resync)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Starting game status daemon at {timezone.now()} '
+                f'(resync every {resync_interval}s)'
+            )
+        )
+
+        heap = []
+        next_resync = timezone.now()
+        next_change_poll = next_resync
+        changes_since, changes_seen = None, {}
+        while not state['stop']:
+            close_old_connections()
+            now = timezone.now()
+
+            if state['resync'] or now >= next_resync:
+                state['resync'] = False
+                next_resync = now + timedelta(seconds=resync_interval)
+                changes_since, changes_seen = self.latest_change(), {}
+                heap = self.load_transition_instants(now, next_resync)
+                # Catch up on anything that became due while we weren't watching
+                self.apply_due_transitions(now, verbose)
+                if verbose:
+                    self.stdout.write(f'Scheduled {len(heap)} transition instants until {next_resync}')
+
+            if now >= next_change_poll:
+                next_change_poll = now + timedelta(seconds=change_poll_interval)
+                instants, changes_since = self.load_changed_instants(changes_since, next_resync, changes_seen)
+                for instant in instants:
+                    heapq.heappush(heap, instant)
+                if verbose and instants:
+                    self.stdout.write(f'Scheduled {len(instants)} instants from changed games')
+
+            if heap and heap[0][0] <= now:
+                while heap and heap[0][0] <= now:
+                    heapq.heappop(heap)
+                self.apply_due_transitions(now, verbose)
+
+            wake_at = min(heap[0][0], next_resync, next_change_poll) if heap else min(next_resync, next_change_poll)
+            wakeup.wait(max((wake_at - timezone.now()).total_seconds(), 0))
+            wakeup.clear()
+
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS('Game status daemon stopped'))
+
+    def load_transition_instants(self, now, until):
+        """Heap of (instant, game_id) for start/end times in (now, until]"""
+        active = Game.objects.filter(status__in=['UPCOMING', 'ONGOING'])
+        heap = [
+            (start_at, game_id)
+            for game_id, start_at in active.filter(
+                status='UPCOMING', start_at__gt=now, start_at__lte=until,
+            ).values_list('id', 'start_at').iterator()
+        ]
+        heap.extend(
+            (end_at, game_id)
+            for game_id, end_at in active.filter(
+                end_at__gt=now, end_at__lte=until,
+            ).values_list('id', 'end_at').iterator()
+        )
+        heapq.heapify(heap)
+        return heap
+
+    def latest_change(self):
+        return Game.objects.aggregate(latest=Max('updated_at'))['latest']
+
+    def load_changed_instants(self, since, until, seen=None):
+        """Start/end instants up to `until` of active games saved after `since`.
+
+        Returns (instants, new since). `seen` maps game ids to the
+        updated_at already handled, so games re-read inside the overlap
+        are only scheduled again after another save. Instants already due
+        are included so the loop applies them right away.
+        """
+        seen = {} if seen is None else seen
+        changed = Game.objects.filter(status__in=['UPCOMING', 'ONGOING'])
+        if since is not None:
+            changed = changed.filter(updated_at__gt=since - CHANGE_POLL_OVERLAP)
+        instants = []
+        latest = since
+        for game_id, status, start_at, end_at, updated_at in changed.values_list(
+            'id', 'status', 'start_at', 'end_at', 'updated_at',
+        ).iterator():
+            latest = updated_at if latest is None else max(latest, updated_at)
+            if seen.get(game_id) == updated_at:
+                continue
+            seen[game_id] = updated_at
+            if status == 'UPCOMING' and start_at <= until:
+                instants.append((start_at, game_id))
+            if end_at <= until:
+                instants.append((end_at, game_id))
+
+        if latest is not None:
+            for game_id, updated_at in list(seen.items()):
+                if updated_at <= latest - CHANGE_POLL_OVERLAP:
+                    del seen[game_id]
+        return instants, latest
+
+    def apply_due_transitions(self, now, verbose):
+        transitions = Game.update_all_game_statuses(now=now)
+        for transition in transitions:
+            if verbose:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Updated game {transition.game_id} from '
+                        f'{transition.old_status} to {transition.new_status}'
+                    )
+                )
+        if transitions:
+            self.stdout.write(f'[{now}] Applied {len(transitions)} status transitions')
+        return transitions
@@ -0,0 +1,47 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.models import SkillRatingCheckpoint
+
+
+class Command(BaseCommand):
+    help = 'Update player skill ratings from newly completed games with verified results'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replay',
+            action='store_true',
+            help='Reset every rating and replay all completed games from the start',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Games rated per transaction (default: 200)',
+        )
+        parser.add_argument(
+            '--settle-hours',
+            type=float,
+            default=48,
+            help='Only rate games that ended at least this many hours ago (default: 48)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS(f'Starting skill rating update at {timezone.now()}')
+        )
+        if options['replay']:
+            self.stdout.write(self.style.WARNING('REPLAY MODE - all ratings are rebuilt'))
+
+        processed = SkillRatingCheckpoint.process_games(
+            batch_size=options['batch_size'],
+            settle=timedelta(hours=options['settle_hours']),
+            replay=options['replay'],
+        )
+
+        checkpoint = SkillRatingCheckpoint.objects.filter(name='elo').first()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rated {processed} games')
+        )
+        if checkpoint and checkpoint.last_end_at:
+            self.stdout.write(f'Checkpoint: game {checkpoint.last_game_id} at {checkpoint.last_end_at}')
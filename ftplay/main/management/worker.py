@@ -0,0 +1,104 @@
+import json
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class QueueWorkerCommand(BaseCommand):
+    """Drains a leased queue (see main.leases) in batches, reporting each one.
+
+    Subclasses set the defaults below and implement run_batch(), returning
+    a stats object with a `claimed` count, summable fields and as_dict(),
+    plus empty_stats() and format_stats().
+    """
+    default_batch_size = 100
+    default_idle_sleep = 1.0
+    # Plural of what one queue row is, for help texts
+    items = 'rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=self.default_batch_size,
+            help=f'{self.items.capitalize()} claimed per batch (default: {self.default_batch_size})',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (default: until the queue is empty)',
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Keep polling the queue instead of stopping when it is empty',
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=self.default_idle_sleep,
+            help=f'Seconds to wait after an empty batch in daemon mode (default: {self.default_idle_sleep:g})',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print one JSON object per batch and a final total',
+        )
+
+    def handle(self, *args, **options):
+        wakeup = threading.Event()
+        state = {'stop': False}
+
+        def request_stop(signum, frame):
+            state['stop'] = True
+            wakeup.set()
+
+        if options['daemon']:
+            signal.signal(signal.SIGINT, request_stop)
+            signal.signal(signal.SIGTERM, request_stop)
+
+        total = self.empty_stats()
+        batches = 0
+        while not state['stop']:
+            if options['max_batches'] is not None and batches >= options['max_batches']:
+                break
+            close_old_connections()
+            stats = self.run_batch(options['batch_size'])
+            if stats.claimed:
+                batches += 1
+                self.add_to_total(total, stats)
+                self.write_stats(f'batch {batches}', stats, options['json'])
+            if stats.claimed < options['batch_size']:
+                if not options['daemon']:
+                    break
+                wakeup.wait(options['idle_sleep'])
+                wakeup.clear()
+
+        close_old_connections()
+        self.write_stats('total', total, options['json'], style=self.style.SUCCESS)
+
+    def run_batch(self, batch_size):
+        """Claim and process one batch; returns its stats"""
+        raise NotImplementedError
+
+    def empty_stats(self):
+        raise NotImplementedError
+
+    def format_stats(self, label, report):
+        """One line of text for a stats report from as_dict()"""
+        raise NotImplementedError
+
+    def add_to_total(self, total, stats):
+        for name, value in vars(stats).items():
+            setattr(total, name, getattr(total, name) + value)
+
+    def write_stats(self, label, stats, as_json, style=None):
+        report = stats.as_dict()
+        if as_json:
+            self.stdout.write(json.dumps({'label': label, **report}))
+            return
+        line = self.format_stats(label, report)
+        self.stdout.write(style(line) if style else line)
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="end_at",
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="start_at",
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:10
+
+from datetime import datetime, timedelta
+import zoneinfo
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def compute_game_window(date, time, duration, region):
+    # Frozen copy of main.models.game.compute_game_window
+    try:
+        tz = zoneinfo.ZoneInfo(region)
+    except (zoneinfo.ZoneInfoNotFoundError, TypeError, ValueError):
+        tz = timezone.get_default_timezone()
+    if timezone.is_aware(time):
+        time = time.astimezone(tz)
+    start = timezone.make_aware(datetime.combine(date, time.time()), tz)
+    return start, start + timedelta(minutes=duration or 120)
+
+
+def backfill_game_windows(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    games = Game.objects.order_by("pk").only("pk", "date", "time", "duration", "region")
+
+    last_pk = None
+    while True:
+        batch = games if last_pk is None else games.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        for game in batch:
+            game.start_at, game.end_at = compute_game_window(
+                game.date, game.time, game.duration, game.region
+            )
+        Game.objects.bulk_update(batch, ["start_at", "end_at"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks
+    atomic = False
+
+    dependencies = [
+        ("main", "0002_game_start_at_end_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_game_windows, migrations.RunPython.noop),
+    ]
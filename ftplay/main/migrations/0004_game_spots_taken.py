@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_spots_taken(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    through = Game.participants.through
+    participant_count = (
+        through.objects.filter(game_id=models.OuterRef("pk"))
+        .order_by()
+        .values("game_id")
+        .annotate(count=models.Count("*"))
+        .values("count")
+    )
+    Game.objects.update(
+        spots_taken=Coalesce(
+            models.Subquery(participant_count, output_field=models.IntegerField()), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0003_backfill_game_start_at_end_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="spots_taken",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_spots_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0004_game_spots_taken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameWaitlistEntry",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("game", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="waitlist_entries", to="main.game")),
+                ("player", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="waitlist_entries", to="main.player")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["game", "created_at", "id"], name="waitlist_game_order_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="gamewaitlistentry",
+            constraint=models.UniqueConstraint(fields=("game", "player"), name="unique_waitlist_entry"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0005_game_waitlist"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("board", models.CharField(max_length=300)),
+                ("wins", models.IntegerField(default=0)),
+                ("draw", models.IntegerField(default=0)),
+                ("lose", models.IntegerField(default=0)),
+                ("goals", models.IntegerField(default=0)),
+                ("assists", models.IntegerField(default=0)),
+                ("games_played", models.IntegerField(default=0)),
+                ("win_percentage", models.FloatField(default=0)),
+                ("player", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="leaderboard_entries", to="main.player")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["board", "-win_percentage", "player"], name="leaderboard_win_pct_idx"), models.Index(fields=["board", "-wins", "player"], name="leaderboard_wins_idx"), models.Index(fields=["board", "-goals", "player"], name="leaderboard_goals_idx"), models.Index(fields=["board", "-assists", "player"], name="leaderboard_assists_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboardentry",
+            constraint=models.UniqueConstraint(fields=("board", "player"), name="unique_leaderboard_entry"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:16
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0006_leaderboard_entry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SkillRatingCheckpoint",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("name", models.CharField(default="elo", max_length=50, unique=True)),
+                ("last_start_at", models.DateTimeField(blank=True, null=True)),
+                ("last_game_id", models.UUIDField(blank=True, null=True)),
+                ("games_processed", models.IntegerField(default=0)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="playerdetails",
+            name="rated_games",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="playerdetails",
+            name="skill_rating",
+            field=models.FloatField(default=1500.0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0007_skill_rating"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="geo_cell",
+            field=models.CharField(editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="latitude",
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="longitude",
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["geo_cell", "start_at"], name="game_geo_cell_start_idx"),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:21
+
+import math
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+CELL_SIZE_DEGREES = 0.2
+
+
+def parse_coordinate(value, limit):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value) or abs(value) > limit:
+        return None
+    return value
+
+
+def extract_coordinates(location):
+    # Frozen copy of main.geo.extract_coordinates
+    if isinstance(location, dict):
+        latitude = next((location[key] for key in ("lat", "latitude") if key in location), None)
+        longitude = next((location[key] for key in ("lng", "lon", "long", "longitude") if key in location), None)
+        latitude, longitude = parse_coordinate(latitude, 90), parse_coordinate(longitude, 180)
+        if latitude is not None and longitude is not None:
+            return latitude, longitude
+        coordinates = location.get("coordinates")
+        if isinstance(coordinates, (list, tuple)) and len(coordinates) == 2:
+            latitude, longitude = parse_coordinate(coordinates[1], 90), parse_coordinate(coordinates[0], 180)
+            if latitude is not None and longitude is not None:
+                return latitude, longitude
+        nested = [value for value in location.values() if isinstance(value, (dict, list))]
+        return extract_coordinates(nested)
+    if isinstance(location, (list, tuple)):
+        for item in location:
+            if isinstance(item, (dict, list, tuple)):
+                coordinates = extract_coordinates(item)
+                if coordinates[0] is not None:
+                    return coordinates
+    return None, None
+
+
+def get_cell(latitude, longitude):
+    # Frozen copy of main.geo.get_cell
+    if latitude is None or longitude is None:
+        return None
+    return "%d:%d" % (
+        math.floor(latitude / CELL_SIZE_DEGREES),
+        math.floor(longitude / CELL_SIZE_DEGREES),
+    )
+
+
+def backfill_game_coordinates(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    games = Game.objects.filter(location__isnull=False).order_by("pk").only("pk", "location")
+
+    last_pk = None
+    while True:
+        batch = games if last_pk is None else games.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        for game in batch:
+            game.latitude, game.longitude = extract_coordinates(game.location)
+            game.geo_cell = get_cell(game.latitude, game.longitude)
+        Game.objects.bulk_update(batch, ["latitude", "longitude", "geo_cell"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks
+    atomic = False
+
+    dependencies = [
+        ("main", "0008_game_coordinates"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_game_coordinates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_backfill_game_coordinates"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["latitude", "longitude"], name="game_lat_lon_idx"),
+        ),
+    ]
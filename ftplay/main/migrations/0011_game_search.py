@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+def create_search_vector(apps, schema_editor):
+    # SQLite gets an FTS5 table from main.search.ensure_sqlite_search_index
+    # after migrate instead, since table rebuilds there would drop it
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    # A nullable column without a default is a catalog-only change; a
+    # GENERATED ... STORED column would rewrite main_game under ACCESS
+    # EXCLUSIVE. The trigger fills it as 0012 backfills search_document in
+    # batches, and 0012 then builds the GIN index concurrently
+    schema_editor.execute("ALTER TABLE main_game ADD COLUMN search_vector tsvector")
+    schema_editor.execute(
+        "CREATE FUNCTION main_game_search_vector_update() RETURNS trigger AS $$ "
+        "BEGIN NEW.search_vector := to_tsvector('english', NEW.search_document); RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    schema_editor.execute(
+        "CREATE TRIGGER main_game_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF search_document ON main_game "
+        "FOR EACH ROW EXECUTE FUNCTION main_game_search_vector_update()"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS main_game_search_vector_update ON main_game")
+    schema_editor.execute("DROP FUNCTION IF EXISTS main_game_search_vector_update()")
+    schema_editor.execute("ALTER TABLE main_game DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0010_game_lat_lon_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="search_document",
+            field=models.TextField(default="", editable=False),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
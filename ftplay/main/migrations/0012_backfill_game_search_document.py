@@ -0,0 +1,82 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:22
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+VENUE_NAME_KEY = re.compile(r"name|title|venue", re.IGNORECASE)
+
+
+def get_venue_names(venue_details):
+    # Frozen copy of main.search.get_venue_names
+    if isinstance(venue_details, str):
+        return [venue_details]
+    names = []
+    if isinstance(venue_details, dict):
+        for key, value in venue_details.items():
+            if isinstance(value, str) and VENUE_NAME_KEY.search(str(key)):
+                names.append(value)
+            elif isinstance(value, (dict, list)):
+                names.extend(get_venue_names(value))
+    elif isinstance(venue_details, list):
+        for item in venue_details:
+            names.extend(get_venue_names(item))
+    return names
+
+
+def build_search_document(title, game_rules, venue_details):
+    # Frozen copy of main.search.build_search_document
+    parts = [title or "", *get_venue_names(venue_details), game_rules or ""]
+    return "\n".join(part.strip() for part in parts if part and part.strip())
+
+
+def backfill_search_documents(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    games = Game.objects.order_by("pk").only("pk", "title", "game_rules", "venue_details")
+
+    last_pk = None
+    while True:
+        batch = games if last_pk is None else games.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        for game in batch:
+            game.search_document = build_search_document(
+                game.title, game.game_rules, game.venue_details
+            )
+        Game.objects.bulk_update(batch, ["search_document"])
+        last_pk = batch[-1].pk
+
+
+def create_search_index(apps, schema_editor):
+    # Built once the backfill has filled search_vector; CONCURRENTLY keeps
+    # main_game writable while the index builds
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS game_search_vector_idx "
+        "ON main_game USING GIN (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS game_search_vector_idx")
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks,
+    # and CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("main", "0011_game_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
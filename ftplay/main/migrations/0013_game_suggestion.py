@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0012_backfill_game_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameSuggestion",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("text", models.CharField(max_length=255)),
+                ("key", models.CharField(max_length=255)),
+                ("game", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="suggestions", to="main.game")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["key"], name="game_suggestion_key_idx", opclasses=["varchar_pattern_ops"])],
+            },
+        ),
+    ]
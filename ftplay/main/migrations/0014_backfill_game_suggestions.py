@@ -0,0 +1,82 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:31
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+VENUE_NAME_KEY = re.compile(r"name|title|venue", re.IGNORECASE)
+SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+MAX_SUGGESTION_WORDS = 8
+MAX_SUGGESTION_LENGTH = 255
+
+
+def get_venue_names(venue_details):
+    # Frozen copy of main.search.get_venue_names
+    if isinstance(venue_details, str):
+        return [venue_details]
+    names = []
+    if isinstance(venue_details, dict):
+        for key, value in venue_details.items():
+            if isinstance(value, str) and VENUE_NAME_KEY.search(str(key)):
+                names.append(value)
+            elif isinstance(value, (dict, list)):
+                names.extend(get_venue_names(value))
+    elif isinstance(venue_details, list):
+        for item in venue_details:
+            names.extend(get_venue_names(item))
+    return names
+
+
+def normalize_suggestion(text):
+    # Frozen copy of main.search.normalize_suggestion
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(SEARCH_TERM.findall(text.casefold()))
+
+
+def get_suggestion_keys(title, venue_details):
+    # Frozen copy of main.search.get_suggestion_keys
+    keys = set()
+    for text in [title or "", *get_venue_names(venue_details)]:
+        text = " ".join(text.split())[:MAX_SUGGESTION_LENGTH]
+        words = normalize_suggestion(text).split(" ")
+        for start in range(min(len(words), MAX_SUGGESTION_WORDS)):
+            key = " ".join(words[start:])
+            if key:
+                keys.add((text, key[:MAX_SUGGESTION_LENGTH]))
+    return keys
+
+
+def backfill_game_suggestions(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    GameSuggestion = apps.get_model("main", "GameSuggestion")
+    games = Game.objects.order_by("pk").only("pk", "title", "venue_details")
+
+    last_pk = None
+    while True:
+        batch = games if last_pk is None else games.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        GameSuggestion.objects.bulk_create([
+            GameSuggestion(game_id=game.pk, text=text, key=key)
+            for game in batch
+            for text, key in get_suggestion_keys(game.title, game.venue_details)
+        ])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks
+    atomic = False
+
+    dependencies = [
+        ("main", "0013_game_suggestion"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_game_suggestions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+GAME_INDEXES = [
+    models.Index(fields=["organizer", "start_at", "id"], name="game_organizer_start_idx"),
+    models.Index(condition=models.Q(("visibility", "PUBLIC")), fields=["start_at", "id"], name="game_public_start_idx"),
+    models.Index(condition=models.Q(("status", "UPCOMING"), ("visibility", "PUBLIC")), fields=["start_at", "id"], name="game_public_upcoming_idx"),
+]
+
+
+def create_indexes(apps, schema_editor):
+    # CONCURRENTLY keeps main_game writable while the indexes build
+    Game = apps.get_model("main", "Game")
+    postgresql = schema_editor.connection.vendor == "postgresql"
+    for index in GAME_INDEXES:
+        if postgresql:
+            schema_editor.add_index(Game, index, concurrently=True)
+        else:
+            schema_editor.add_index(Game, index)
+    # The auto-created participants table only has (game_id, player_id)
+    # and single-column indexes; joined_games and the available_games
+    # anti-join look games up by player, which this covers
+    schema_editor.execute(
+        ("CREATE INDEX CONCURRENTLY" if postgresql else "CREATE INDEX")
+        + " IF NOT EXISTS game_participants_player_game_idx ON main_game_participants (player_id, game_id)"
+    )
+
+
+def drop_indexes(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    postgresql = schema_editor.connection.vendor == "postgresql"
+    schema_editor.execute(
+        ("DROP INDEX CONCURRENTLY" if postgresql else "DROP INDEX")
+        + " IF EXISTS game_participants_player_game_idx"
+    )
+    for index in GAME_INDEXES:
+        if postgresql:
+            schema_editor.remove_index(Game, index, concurrently=True)
+        else:
+            schema_editor.remove_index(Game, index)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("main", "0014_backfill_game_suggestions"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name="game", index=index) for index in GAME_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:34
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0015_game_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="player",
+            name="joined_games_version",
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
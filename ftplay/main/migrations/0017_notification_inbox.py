@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0016_player_joined_games_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="organizer",
+            name="unread_notifications",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="player",
+            name="unread_notifications",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["recipient_player", "is_read", "created_at"], name="notif_player_unread_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["recipient_organizer", "is_read", "created_at"], name="notif_org_unread_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["recipient_player", "-created_at", "-id"], name="notif_player_inbox_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(fields=["recipient_organizer", "-created_at", "-id"], name="notif_org_inbox_idx"),
+        ),
+    ]
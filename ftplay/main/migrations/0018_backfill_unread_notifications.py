@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:37
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Notification = apps.get_model("main", "Notification")
+    for model_name, field in (("Player", "recipient_player"), ("Organizer", "recipient_organizer")):
+        unread = Notification.objects.filter(
+            is_read=False, **{field: models.OuterRef("pk")}
+        ).order_by().values(field).annotate(count=models.Count("*")).values("count")
+        apps.get_model("main", model_name).objects.update(
+            unread_notifications=Coalesce(models.Subquery(unread, output_field=models.IntegerField()), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0017_notification_inbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0018_backfill_unread_notifications"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushMessage",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("token", models.CharField(max_length=255)),
+                ("title", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("data", models.JSONField(blank=True, default=dict)),
+                ("status", models.CharField(choices=[("PENDING", "Pending"), ("SENT", "Sent"), ("FAILED", "Failed"), ("DEAD_TOKEN", "Dead Token")], default="PENDING", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField()),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("notification", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="push_messages", to="main.notification")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="push_due_idx"), models.Index(fields=["token", "status"], name="push_token_status_idx")],
+            },
+        ),
+    ]
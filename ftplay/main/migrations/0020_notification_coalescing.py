@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0019_push_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="coalesced_count",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
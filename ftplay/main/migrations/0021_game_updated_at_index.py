@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+INDEX = models.Index(fields=["updated_at"], name="game_updated_at_idx")
+
+
+def create_index(apps, schema_editor):
+    # CONCURRENTLY keeps main_game writable while the index builds
+    Game = apps.get_model("main", "Game")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(Game, INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(Game, INDEX)
+
+
+def drop_index(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.remove_index(Game, INDEX, concurrently=True)
+    else:
+        schema_editor.remove_index(Game, INDEX)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("main", "0020_notification_coalescing"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name="game", index=INDEX)],
+            database_operations=[migrations.RunPython(create_index, drop_index)],
+        ),
+    ]
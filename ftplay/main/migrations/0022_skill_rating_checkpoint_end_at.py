@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:20
+
+from django.db import migrations
+
+
+def move_checkpoint_to_end_at(apps, schema_editor):
+    # The checkpoint now advances by (end_at, id); carry each one over to
+    # the end of the last game it processed
+    SkillRatingCheckpoint = apps.get_model("main", "SkillRatingCheckpoint")
+    Game = apps.get_model("main", "Game")
+    for checkpoint in SkillRatingCheckpoint.objects.exclude(last_game_id=None):
+        checkpoint.last_end_at = Game.objects.filter(pk=checkpoint.last_game_id).values_list(
+            "end_at", flat=True
+        ).first()
+        if checkpoint.last_end_at is None:
+            checkpoint.last_game_id = None
+        checkpoint.save(update_fields=["last_end_at", "last_game_id"])
+
+
+def move_checkpoint_to_start_at(apps, schema_editor):
+    SkillRatingCheckpoint = apps.get_model("main", "SkillRatingCheckpoint")
+    Game = apps.get_model("main", "Game")
+    for checkpoint in SkillRatingCheckpoint.objects.exclude(last_game_id=None):
+        checkpoint.last_end_at = Game.objects.filter(pk=checkpoint.last_game_id).values_list(
+            "start_at", flat=True
+        ).first()
+        checkpoint.save(update_fields=["last_end_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0021_game_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="skillratingcheckpoint",
+            old_name="last_start_at",
+            new_name="last_end_at",
+        ),
+        migrations.RunPython(move_checkpoint_to_end_at, move_checkpoint_to_start_at),
+    ]
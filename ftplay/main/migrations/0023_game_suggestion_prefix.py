@@ -0,0 +1,37 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:57
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0022_skill_rating_checkpoint_end_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesuggestion",
+            name="is_open",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="GameSuggestionPrefix",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("prefix", models.CharField(max_length=10)),
+                ("text", models.CharField(max_length=255)),
+                ("games", models.IntegerField(default=0)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["prefix", "-games", "text"], name="game_suggestion_top_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="gamesuggestionprefix",
+            constraint=models.UniqueConstraint(fields=("prefix", "text"), name="unique_game_suggestion_prefix"),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:58
+
+from collections import Counter
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+MAX_SUGGESTION_PREFIX_LENGTH = 10
+
+
+def get_suggestion_prefixes(keys):
+    # Frozen copy of main.search.get_suggestion_prefixes
+    return {
+        (key[:length], text)
+        for text, key in keys
+        for length in range(1, min(len(key), MAX_SUGGESTION_PREFIX_LENGTH) + 1)
+        if key[length - 1] != " "
+    }
+
+
+def backfill_game_suggestion_prefixes(apps, schema_editor):
+    Game = apps.get_model("main", "Game")
+    GameSuggestion = apps.get_model("main", "GameSuggestion")
+    GameSuggestionPrefix = apps.get_model("main", "GameSuggestionPrefix")
+    games = Game.objects.filter(visibility="PUBLIC", status="UPCOMING").order_by("pk").values_list("pk", flat=True)
+
+    counts = Counter()
+    last_pk = None
+    while True:
+        batch = games if last_pk is None else games.filter(pk__gt=last_pk)
+        game_ids = list(batch[:BATCH_SIZE])
+        if not game_ids:
+            break
+        GameSuggestion.objects.filter(game_id__in=game_ids).update(is_open=True)
+        keys = {}
+        for game_id, text, key in GameSuggestion.objects.filter(game_id__in=game_ids).values_list(
+            "game_id", "text", "key",
+        ):
+            keys.setdefault(game_id, set()).add((text, key))
+        for game_keys in keys.values():
+            counts.update(get_suggestion_prefixes(game_keys))
+        last_pk = game_ids[-1]
+
+    GameSuggestionPrefix.objects.bulk_create(
+        [GameSuggestionPrefix(prefix=prefix, text=text, games=games) for (prefix, text), games in counts.items()],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks
+    atomic = False
+
+    dependencies = [
+        ("main", "0023_game_suggestion_prefix"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_game_suggestion_prefixes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-18 13:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0024_backfill_game_suggestion_prefixes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationEvent",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("type", models.CharField(max_length=50)),
+                ("message", models.TextField()),
+                ("audience", models.CharField(max_length=20)),
+                ("status", models.CharField(choices=[("PENDING", "Pending"), ("DONE", "Done"), ("FAILED", "Failed")], default="PENDING", max_length=20)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("actor_organizer", models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="notification_events", to="main.organizer")),
+                ("actor_player", models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="notification_events", to="main.player")),
+                ("game", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="notification_events", to="main.game")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["status", "next_attempt_at"], name="notif_event_due_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0025_notification_event"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="last_event_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_last_event_at(apps, schema_editor):
+    Notification = apps.get_model("main", "Notification")
+    notifications = Notification.objects.order_by("pk").values_list("pk", flat=True)
+
+    last_pk = None
+    while True:
+        batch = notifications if last_pk is None else notifications.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        Notification.objects.filter(pk__in=batch).update(last_event_at=models.F("created_at"))
+        last_pk = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own so the backfill never holds long locks
+    atomic = False
+
+    dependencies = [
+        ("main", "0026_notification_last_event_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_last_event_at, migrations.RunPython.noop),
+    ]
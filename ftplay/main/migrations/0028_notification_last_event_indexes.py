@@ -0,0 +1,62 @@
+# Generated by Django 4.2.23 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+OLD_INDEXES = [
+    models.Index(fields=["recipient_player", "is_read", "created_at"], name="notif_player_unread_idx"),
+    models.Index(fields=["recipient_organizer", "is_read", "created_at"], name="notif_org_unread_idx"),
+    models.Index(fields=["recipient_player", "-created_at", "-id"], name="notif_player_inbox_idx"),
+    models.Index(fields=["recipient_organizer", "-created_at", "-id"], name="notif_org_inbox_idx"),
+]
+
+NEW_INDEXES = [
+    models.Index(fields=["recipient_player", "is_read", "last_event_at"], name="notif_player_unread_evt_idx"),
+    models.Index(fields=["recipient_organizer", "is_read", "last_event_at"], name="notif_org_unread_evt_idx"),
+    models.Index(fields=["recipient_player", "-last_event_at", "-id"], name="notif_player_inbox_evt_idx"),
+    models.Index(fields=["recipient_organizer", "-last_event_at", "-id"], name="notif_org_inbox_evt_idx"),
+]
+
+
+def swap_indexes(schema_editor, Notification, add, remove):
+    # CONCURRENTLY keeps main_notification writable while the indexes change;
+    # the new ones are built before the old ones go
+    concurrently = schema_editor.connection.vendor == "postgresql"
+    for index in add:
+        if concurrently:
+            schema_editor.add_index(Notification, index, concurrently=True)
+        else:
+            schema_editor.add_index(Notification, index)
+    for index in remove:
+        if concurrently:
+            schema_editor.remove_index(Notification, index, concurrently=True)
+        else:
+            schema_editor.remove_index(Notification, index)
+
+
+def use_last_event_indexes(apps, schema_editor):
+    swap_indexes(schema_editor, apps.get_model("main", "Notification"), NEW_INDEXES, OLD_INDEXES)
+
+
+def use_created_at_indexes(apps, schema_editor):
+    swap_indexes(schema_editor, apps.get_model("main", "Notification"), OLD_INDEXES, NEW_INDEXES)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("main", "0027_backfill_notification_last_event_at"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                *[migrations.RemoveIndex(model_name="notification", name=index.name) for index in OLD_INDEXES],
+                *[migrations.AddIndex(model_name="notification", index=index) for index in NEW_INDEXES],
+            ],
+            database_operations=[
+                migrations.RunPython(use_last_event_indexes, use_created_at_indexes),
+            ],
+        ),
+    ]
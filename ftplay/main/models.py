@@ -7,7 +7,14 @@ from .models import (
     GameRating,
     GameComment,
     GamePayment,
+    GameWaitlistEntry,
+    GameSuggestion,
+    GameSuggestionPrefix,
+    LeaderboardEntry,
+    SkillRatingCheckpoint,
     Notification,
+    NotificationEvent,
+    PushMessage,
 )
 
 __all__ = [
@@ -19,5 +26,12 @@ __all__ = [
     'GameRating',
     'GameComment',
     'GamePayment',
+    'GameWaitlistEntry',
+    'GameSuggestion',
+    'GameSuggestionPrefix',
+    'LeaderboardEntry',
+    'SkillRatingCheckpoint',
     'Notification',
+    'NotificationEvent',
+    'PushMessage',
 ]
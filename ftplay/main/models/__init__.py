@@ -6,7 +6,12 @@ from .game import Game
 from .game_rating import GameRating
 from .game_comment import GameComment
 from .game_payment import GamePayment
-from .notification import Notification
+from .game_waitlist import GameWaitlistEntry
+from .game_suggestion import GameSuggestion, GameSuggestionPrefix
+from .leaderboard import LeaderboardEntry
+from .skill_rating import SkillRatingCheckpoint
+from .notification import Notification, NotificationEvent
+from .push_message import PushMessage
 
 __all__ = [
     'Base',
@@ -17,5 +22,12 @@ __all__ = [
     'GameRating',
     'GameComment',
     'GamePayment',
+    'GameWaitlistEntry',
+    'GameSuggestion',
+    'GameSuggestionPrefix',
+    'LeaderboardEntry',
+    'SkillRatingCheckpoint',
     'Notification',
+    'NotificationEvent',
+    'PushMessage',
 ] 
\ No newline at end of file
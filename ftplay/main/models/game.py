@@ -1,9 +1,196 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models.functions import ASin, Coalesce, Cos, Power, Radians, Sin, Sqrt
 from django.utils import timezone
+from django.core.cache import cache
+from collections import defaultdict, namedtuple
 from datetime import datetime, timedelta
+import hashlib
+import math
+import zoneinfo
 from .base import Base
+from .game_suggestion import GameSuggestion
+from .game_waitlist import GameWaitlistEntry
+from .player import Player
+from ..search import build_search_document, get_search_sql, get_search_terms
+from ..geo import EARTH_RADIUS_KM, bounding_box, extract_coordinates, get_cell
+from ..team_balance import balance_teams, describe_players
+
+StatusTransition = namedtuple('StatusTransition', ['game_id', 'old_status', 'new_status'])
+
+# Default game length in minutes when duration is not set
+DEFAULT_DURATION_MINUTES = 120
+
+# Fields start_at/end_at are derived from
+WINDOW_SOURCE_FIELDS = frozenset(['date', 'time', 'duration', 'region'])
+
+# Fields extracted from location on save
+COORDINATE_FIELDS = frozenset(['latitude', 'longitude', 'geo_cell'])
+
+# Fields search_document is built from
+SEARCH_SOURCE_FIELDS = frozenset(['title', 'game_rules', 'venue_details'])
+
+# (source fields, derived fields) - saving any source also saves the derived
+DERIVED_FIELDS = [
+    (WINDOW_SOURCE_FIELDS, frozenset(['start_at', 'end_at'])),
+    (frozenset(['location']), COORDINATE_FIELDS),
+    (SEARCH_SOURCE_FIELDS, frozenset(['search_document'])),
+]
+
+# Counters maintained only by conditional UPDATEs; a full save() of a
+# possibly stale instance leaves them alone
+COUNTER_FIELDS = frozenset(['spots_taken'])
+
+# Fields GameSuggestion rows are built from, and those deciding whether
+# the game is suggested at all
+SUGGESTION_SOURCE_FIELDS = frozenset(['title', 'venue_details', 'visibility', 'status'])
+
+
+def get_region_timezone(region):
+    """Resolve a game's region to a tzinfo, falling back to the default time zone"""
+    try:
+        return zoneinfo.ZoneInfo(region)
+    except (zoneinfo.ZoneInfoNotFoundError, TypeError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def compute_game_window(date, time, duration, region):
+    """Return the aware (start, end) of a game.
+
+    The start is `date` combined with the time of day of `time` as seen in
+    the game's region; the end adds `duration` minutes (2 hours by default).
+    """
+    tz = get_region_timezone(region)
+    if timezone.is_aware(time):
+        time = time.astimezone(tz)
+    start = timezone.make_aware(datetime.combine(date, time.time()), tz)
+    return start, start + timedelta(minutes=duration or DEFAULT_DURATION_MINUTES)
+
+
+class GameQuerySet(models.QuerySet):
+    def with_effective_status(self, now=None):
+        """Annotate `effective_status`, the status the game has at `now`.
+
+        Mirrors Game.update_status(): canceled games keep their status, games
+        past their end are COMPLETED and games past their start are ONGOING.
+        Filtering on the annotation keeps reads free of status writes; stored
+        statuses are reconciled in the background by update_game_statuses.
+        """
+        now = now or timezone.now()
+        return self.annotate(
+            effective_status=models.Case(
+                models.When(status='CANCELED', then=models.F('status')),
+                models.When(end_at__lte=now, then=models.Value('COMPLETED')),
+                models.When(start_at__lte=now, then=models.Value('ONGOING')),
+                default=models.F('status'),
+                output_field=models.CharField(max_length=10),
+            )
+        )
+
+    def filter_effective_status(self, status, now=None):
+        """Filter on the `effective_status` annotation plus equivalent indexable predicates.
+
+        The CASE annotation cannot use an index; the extra conditions on
+        status, start_at and end_at select the same games and can.
+        """
+        now = now or timezone.now()
+        if status == 'UPCOMING':
+            hints = models.Q(status='UPCOMING', start_at__gt=now)
+        elif status == 'ONGOING':
+            hints = models.Q(start_at__lte=now, end_at__gt=now) & ~models.Q(status='CANCELED')
+        elif status == 'COMPLETED':
+            hints = models.Q(end_at__lte=now) & ~models.Q(status='CANCELED')
+        else:
+            hints = models.Q(status=status)
+        return self.filter(hints, effective_status=status)
+
+    def with_participant_data(self):
+        """Preload what GameSerializer reads so a page costs a fixed number of queries.
+
+        The participant count is a correlated subquery rather than
+        Count('participants') so it stays correct when the queryset is also
+        filtered on participants.
+        """
+        through = self.model.participants.through
+        participant_count = through.objects.filter(
+            game_id=models.OuterRef('pk'),
+        ).order_by().values('game_id').annotate(
+            count=models.Count('*'),
+        ).values('count')
+        return self.select_related('organizer').annotate(
+            participant_count=Coalesce(
+                models.Subquery(participant_count, output_field=models.IntegerField()),
+                0,
+            )
+        ).prefetch_related(
+            models.Prefetch('participants', queryset=Player.objects.only('id'))
+        )
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Games within `radius_km` of a point, annotated with `distance_km`.
+
+        The bounding box of the circle is a range on the (latitude,
+        longitude) index; the haversine distance is only computed for rows
+        inside it. Both run on any backend, no GIS extension needed.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        if min_lon < -180:
+            longitude_range = models.Q(longitude__gte=min_lon + 360) | models.Q(longitude__lte=max_lon)
+        elif max_lon > 180:
+            longitude_range = models.Q(longitude__gte=min_lon) | models.Q(longitude__lte=max_lon - 360)
+        else:
+            longitude_range = models.Q(longitude__range=(min_lon, max_lon))
+
+        phi = math.radians(latitude)
+        half_d_phi = (Radians('latitude') - phi) / 2
+        half_d_lambda = (Radians('longitude') - math.radians(longitude)) / 2
+        haversine = Power(Sin(half_d_phi), 2) + math.cos(phi) * Cos(Radians('latitude')) * Power(Sin(half_d_lambda), 2)
+        return self.filter(
+            longitude_range,
+            latitude__range=(min_lat, max_lat),
+        ).annotate(
+            distance_km=models.ExpressionWrapper(
+                2 * EARTH_RADIUS_KM * ASin(Sqrt(haversine)),
+                output_field=models.FloatField(),
+            )
+        ).filter(distance_km__lte=radius_km)
+
+    def search(self, query):
+        """Games matching every word of `query`, annotated with `search_rank`.
+
+        Uses the backend's full-text index (see main.search); a query with
+        no words matches nothing.
+        """
+        terms = get_search_terms(query)
+        if not terms:
+            return self.none().annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+        tables, where, rank_sql, params = get_search_sql(connections[self.db].vendor, terms)
+        rank_params = params if '%s' in rank_sql else []
+        # The full-text index lives outside the ORM, so it is joined with extra()
+        return self.extra(tables=tables, where=where, params=params).annotate(
+            search_rank=models.expressions.RawSQL(rank_sql, rank_params, output_field=models.FloatField()),
+        )
+
 
 class Game(Base):
+    # Max ids per UPDATE ... WHERE id IN (...) statement
+    STATUS_UPDATE_BATCH_SIZE = 500
+
+    # Balanced team splits are cached per participant list for this long
+    TEAM_BALANCE_CACHE_SECONDS = 60 * 60
+
+    # Outcomes of add_participant/remove_participant
+    JOINED = 'JOINED'
+    LEFT = 'LEFT'
+    FULL = 'FULL'
+    NOT_OPEN = 'NOT_OPEN'
+    ALREADY_JOINED = 'ALREADY_JOINED'
+    NOT_JOINED = 'NOT_JOINED'
+    # Outcomes of add_to_waitlist/remove_from_waitlist
+    WAITLISTED = 'WAITLISTED'
+    ALREADY_WAITLISTED = 'ALREADY_WAITLISTED'
+    SPOTS_AVAILABLE = 'SPOTS_AVAILABLE'
+    NOT_WAITLISTED = 'NOT_WAITLISTED'
+
     title = models.CharField(max_length=255)
     images = models.JSONField()  # Array of image URLs
     time = models.DateTimeField()
@@ -39,6 +226,25 @@ class Game(Base):
     )
     
     password = models.CharField(max_length=255, null=True, blank=True)
+
+    # Materialized from date, time, duration and region on save so queries
+    # can filter and sort on when a game actually starts and ends
+    start_at = models.DateTimeField(null=True, editable=False, db_index=True)
+    end_at = models.DateTimeField(null=True, editable=False, db_index=True)
+
+    # Maintained by add_participant/remove_participant; the conditional
+    # UPDATE on it is what keeps concurrent joins from overfilling a game
+    spots_taken = models.IntegerField(default=0, editable=False)
+
+    # Extracted from location on save; geo_cell is the grid cell used to
+    # find nearby upcoming games without scanning the whole table
+    latitude = models.FloatField(null=True, editable=False)
+    longitude = models.FloatField(null=True, editable=False)
+    geo_cell = models.CharField(max_length=20, null=True, editable=False)
+
+    # Title, venue names and rules; indexed for full-text search by the
+    # database, see main.search
+    search_document = models.TextField(default='', editable=False)
     
     # Relationships
     organizer = models.ForeignKey(
@@ -52,32 +258,83 @@ class Game(Base):
         related_name='games'
     )
 
+    objects = GameQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['geo_cell', 'start_at'], name='game_geo_cell_start_idx'),
+            models.Index(fields=['latitude', 'longitude'], name='game_lat_lon_idx'),
+            # Cursor pages of one organizer's games (list, my_games and
+            # the organizer side of completed_games/ongoing_games)
+            models.Index(fields=['organizer', 'start_at', 'id'], name='game_organizer_start_idx'),
+            # Cursor pages of public games for players
+            models.Index(
+                fields=['start_at', 'id'],
+                name='game_public_start_idx',
+                condition=models.Q(visibility='PUBLIC'),
+            ),
+            # available_games: open public games in start order
+            models.Index(
+                fields=['start_at', 'id'],
+                name='game_public_upcoming_idx',
+                condition=models.Q(visibility='PUBLIC', status='UPCOMING'),
+            ),
+            # update_game_statuses --daemon polls for recently saved games
+            models.Index(fields=['updated_at'], name='game_updated_at_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.start_at, self.end_at = self.get_game_window()
+        self.latitude, self.longitude = extract_coordinates(self.location)
+        self.geo_cell = get_cell(self.latitude, self.longitude)
+        self.search_document = build_search_document(self.title, self.game_rules, self.venue_details)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = update_fields = {
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            }
+        elif update_fields is not None:
+            update_fields = set(update_fields)
+            for sources, derived in DERIVED_FIELDS:
+                if sources.intersection(update_fields):
+                    update_fields.update(derived)
+            kwargs['update_fields'] = update_fields
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or SUGGESTION_SOURCE_FIELDS.intersection(update_fields):
+                GameSuggestion.sync_game(self)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            GameSuggestion.sync_game(self, is_open=False)
+            return super().delete(*args, **kwargs)
+
+    def get_game_window(self):
+        """Get the (start, end) datetimes of the game in its region"""
+        return compute_game_window(self.date, self.time, self.duration, self.region)
+
     def get_game_datetime(self):
         """Get the combined date and time of the game"""
-        return datetime.combine(self.date, self.time.time())
+        return self.get_game_window()[0]
 
     def get_game_end_datetime(self):
         """Get the end time of the game (start time + duration)"""
-        game_start = self.get_game_datetime()
-        if self.duration:
-            return game_start + timedelta(minutes=self.duration)
-        # Default 2 hours if no duration specified
-        return game_start + timedelta(hours=2)
+        return self.get_game_window()[1]
 
     def should_be_ongoing(self):
         """Check if game should be marked as ongoing"""
         now = timezone.now()
-        game_start = timezone.make_aware(self.get_game_datetime())
-        return game_start <= now < timezone.make_aware(self.get_game_end_datetime())
+        game_start, game_end = self.get_game_window()
+        return game_start <= now < game_end
 
     def should_be_completed(self):
         """Check if game should be marked as completed"""
         now = timezone.now()
-        game_end = timezone.make_aware(self.get_game_end_datetime())
-        return now >= game_end
+        return now >= self.get_game_end_datetime()
 
     def update_status(self):
         """Update game status based on current time"""
@@ -97,19 +354,204 @@ class Game(Base):
         
         return False
 
+    def add_participant(self, player, now=None):
+        """Atomically take a spot in the game for `player`.
+
+        The capacity check and the spot increment are one conditional UPDATE,
+        which also row-locks the game until the participant row is inserted.
+        A duplicate join trips the through table's unique constraint and
+        rolls the increment back.
+        """
+        now = now or timezone.now()
+        through = Game.participants.through
+        try:
+            with transaction.atomic():
+                reserved = Game.objects.filter(
+                    pk=self.pk,
+                    status='UPCOMING',
+                    start_at__gt=now,
+                    spots_taken__lt=models.F('number_of_participants'),
+                ).update(spots_taken=models.F('spots_taken') + 1)
+                if not reserved:
+                    if through.objects.filter(game_id=self.pk, player_id=player.pk).exists():
+                        return self.ALREADY_JOINED
+                    if Game.objects.filter(pk=self.pk, status='UPCOMING', start_at__gt=now).exists():
+                        return self.FULL
+                    return self.NOT_OPEN
+                through.objects.create(game_id=self.pk, player_id=player.pk)
+                player.bump_joined_games_version()
+        except IntegrityError:
+            return self.ALREADY_JOINED
+        return self.JOINED
+
+    def remove_participant(self, player):
+        """Atomically give up `player`'s spot and hand it to the first waiting player"""
+        through = Game.participants.through
+        with transaction.atomic():
+            removed, _ = through.objects.filter(game_id=self.pk, player_id=player.pk).delete()
+            if not removed:
+                return self.NOT_JOINED
+            Game.objects.filter(pk=self.pk).update(spots_taken=models.F('spots_taken') - 1)
+            player.bump_joined_games_version()
+            self.promote_waitlisted()
+        return self.LEFT
+
+    def add_to_waitlist(self, player, now=None):
+        """Queue `player` for a spot; only full, still-open games have a waitlist.
+
+        The game row is locked for the check and the insert, so a spot
+        freed concurrently is either seen here or handed to this entry by
+        remove_participant()'s promotion once the lock is released.
+        Returns (outcome, position); the 1-based position is read under the
+        same lock and is None unless the player was WAITLISTED.
+        """
+        now = now or timezone.now()
+        if Game.participants.through.objects.filter(game_id=self.pk, player_id=player.pk).exists():
+            return self.ALREADY_JOINED, None
+        try:
+            with transaction.atomic():
+                game = Game.objects.select_for_update().filter(pk=self.pk).values(
+                    'status', 'start_at', 'spots_taken', 'number_of_participants',
+                ).first()
+                if game is None or game['status'] != 'UPCOMING' or game['start_at'] <= now:
+                    return self.NOT_OPEN, None
+                if game['spots_taken'] < game['number_of_participants']:
+                    return self.SPOTS_AVAILABLE, None
+                entry = GameWaitlistEntry.objects.create(game_id=self.pk, player_id=player.pk)
+                position = entry.position
+        except IntegrityError:
+            return self.ALREADY_WAITLISTED, None
+        return self.WAITLISTED, position
+
+    def remove_from_waitlist(self, player):
+        removed, _ = GameWaitlistEntry.objects.filter(game_id=self.pk, player_id=player.pk).delete()
+        return self.LEFT if removed else self.NOT_WAITLISTED
+
+    def promote_waitlisted(self, now=None):
+        """Move waiting players into free spots in FIFO order.
+
+        Runs inside the caller's transaction so a freed or added spot is
+        handed over before anyone else can take it. Returns the promoted
+        players' ids.
+        """
+        now = now or timezone.now()
+        promoted = []
+        with transaction.atomic():
+            while True:
+                entry = GameWaitlistEntry.objects.select_for_update().filter(
+                    game_id=self.pk,
+                ).order_by('created_at', 'id').select_related('player').first()
+                if entry is None:
+                    break
+                outcome = self.add_participant(entry.player, now=now)
+                if outcome not in (self.JOINED, self.ALREADY_JOINED):
+                    break
+                entry.delete()
+                if outcome == self.JOINED:
+                    promoted.append(entry.player_id)
+        return promoted
+
+    def get_balanced_teams(self, team_count=2):
+        """Split the participants into even teams, cached until the participant list changes"""
+        participant_ids = sorted(
+            str(player_id)
+            for player_id in Game.participants.through.objects.filter(
+                game_id=self.pk,
+            ).values_list('player_id', flat=True)
+        )
+        digest = hashlib.sha1(','.join(participant_ids).encode()).hexdigest()
+        cache_key = f'balance_teams:{self.pk}:{team_count}:{digest}'
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
+
+        players = describe_players(
+            Player.objects.filter(pk__in=participant_ids).select_related('details')
+        )
+        teams, totals = balance_teams(players, team_count)
+        result = {
+            'teams': [
+                {
+                    'players': team,
+                    'total_score': round(total, 2),
+                    'average_score': round(total / len(team), 2) if team else 0,
+                }
+                for team, total in zip(teams, totals)
+            ],
+            'spread': round(max(totals) - min(totals), 2),
+        }
+        cache.set(cache_key, result, self.TEAM_BALANCE_CACHE_SECONDS)
+        return result
+
     @classmethod
-    def update_all_game_statuses(cls):
-        """Update status of all games based on current time"""
-        updated_games = []
-        
-        # Get all non-canceled games
-        games = cls.objects.exclude(status='CANCELED')
-        
-        for game in games:
-            if game.update_status():
-                updated_games.append(game)
-        
-        return updated_games
+    def compute_status_transitions(cls, now=None):
+        """Work out which games need to move forward without loading model instances.
+
+        Both candidate sets are index range scans on end_at/start_at; only
+        the id and current status of each due game are fetched.
+        """
+        now = now or timezone.now()
+        active = cls.objects.filter(status__in=['UPCOMING', 'ONGOING'])
+
+        transitions = [
+            StatusTransition(game_id, current_status, 'COMPLETED')
+            for game_id, current_status in active.filter(
+                end_at__lte=now,
+            ).values_list('id', 'status').iterator()
+        ]
+        transitions.extend(
+            StatusTransition(game_id, 'UPCOMING', 'ONGOING')
+            for game_id in active.filter(
+                status='UPCOMING',
+                start_at__lte=now,
+                end_at__gt=now,
+            ).values_list('id', flat=True).iterator()
+        )
+        return transitions
+
+    @classmethod
+    def apply_status_transitions(cls, transitions, now=None):
+        """Apply transitions in batches of one locking read and one UPDATE per (old, new) status pair.
+
+        Only games still in their old status are locked and updated, so a
+        game canceled or changed since the transitions were computed is left
+        alone. Returns the transitions that were actually applied.
+        """
+        now = now or timezone.now()
+        grouped = defaultdict(list)
+        for transition in transitions:
+            grouped[(transition.old_status, transition.new_status)].append(transition.game_id)
+
+        applied = []
+        for (old_status, new_status), game_ids in grouped.items():
+            for i in range(0, len(game_ids), cls.STATUS_UPDATE_BATCH_SIZE):
+                batch = game_ids[i:i + cls.STATUS_UPDATE_BATCH_SIZE]
+                with transaction.atomic():
+                    due_ids = list(cls.objects.select_for_update().filter(
+                        pk__in=batch, status=old_status,
+                    ).values_list('id', flat=True))
+                    if due_ids:
+                        cls.objects.filter(pk__in=due_ids, status=old_status).update(
+                            status=new_status,
+                            updated_at=now,
+                        )
+                        if old_status == 'UPCOMING':
+                            GameSuggestion.close_games(due_ids)
+                applied.extend(StatusTransition(game_id, old_status, new_status) for game_id in due_ids)
+        return applied
+
+    @classmethod
+    def update_all_game_statuses(cls, now=None):
+        """Update status of all games based on current time.
+
+        Returns the list of StatusTransition(game_id, old_status, new_status)
+        that were applied.
+        """
+        now = now or timezone.now()
+        transitions = cls.compute_status_transitions(now=now)
+        if not transitions:
+            return []
+        return cls.apply_status_transitions(transitions, now=now)
 
     def is_completed(self):
         """Check if game is completed"""
@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
 from .base import Base
+from .leaderboard import LeaderboardEntry
+from .notification import Notification
+from .player_details import PlayerDetails
 
 class GameRating(Base):
     RESULT_CHOICES = [
@@ -38,4 +43,112 @@ class GameRating(Base):
     )
 
     def __str__(self):
-        return f"Rating for {self.game.title} by {self.player.name}" 
\ No newline at end of file
+        return f"Rating for {self.game.title} by {self.player.name}"
+
+    def get_counted_stats(self):
+        """The (player_id, result, goals, assists) this rating adds to player stats, if any"""
+        if self.verification_status != 'VERIFIED':
+            return None
+        return (self.player_id, self.result, self.goals, self.assists)
+
+    def get_stored_counted_stats(self):
+        """Counted stats of the stored row, locked until the transaction ends"""
+        stored = GameRating.objects.select_for_update().filter(pk=self.pk).values_list(
+            'verification_status', 'player_id', 'result', 'goals', 'assists',
+        ).first()
+        if stored is None or stored[0] != 'VERIFIED':
+            return None
+        return stored[1:]
+
+    def save(self, *args, **kwargs):
+        """Save and move the player's stats by the difference this save makes"""
+        with transaction.atomic():
+            previous = None if self._state.adding else self.get_stored_counted_stats()
+            super().save(*args, **kwargs)
+            current = self.get_counted_stats()
+            if previous != current:
+                if previous:
+                    PlayerDetails.apply_rating_results([previous], sign=-1)
+                    LeaderboardEntry.apply_rating_results([previous], self.game.date, sign=-1)
+                if current:
+                    PlayerDetails.apply_rating_results([current])
+                    LeaderboardEntry.apply_rating_results([current], self.game.date)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self.get_stored_counted_stats()
+            result = super().delete(*args, **kwargs)
+            if previous:
+                PlayerDetails.apply_rating_results([previous], sign=-1)
+                LeaderboardEntry.apply_rating_results([previous], self.game.date, sign=-1)
+        return result
+
+    @classmethod
+    def verify_pending(cls, game, rating_ids=None, actor_organizer=None):
+        """Verify a game's pending ratings in one transaction.
+
+        Verifies the given `rating_ids`, or every pending rating of the game
+        when None. The status change is one UPDATE, player stats and
+        leaderboards move by one folded batch each and rated players get
+        their notifications in one bulk insert. Returns the verified
+        ratings' ids.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            pending = cls.objects.select_for_update().filter(
+                game=game,
+                verification_status='PENDING',
+            )
+            if rating_ids is not None:
+                pending = pending.filter(pk__in=rating_ids)
+            rows = list(pending.values_list('pk', 'player_id', 'result', 'goals', 'assists'))
+            if not rows:
+                return []
+
+            verified_ids = [row[0] for row in rows]
+            cls.objects.filter(pk__in=verified_ids).update(
+                verification_status='VERIFIED',
+                updated_at=now,
+            )
+            results = [row[1:] for row in rows]
+            PlayerDetails.apply_rating_results(results)
+            LeaderboardEntry.apply_rating_results(results, game.date)
+            Notification.create_batch([
+                Notification(
+                    type='RATING_VERIFIED',
+                    message=f'Your result for "{game.title}" was verified',
+                    recipient_player_id=player_id,
+                    game=game,
+                    actor_organizer=actor_organizer,
+                )
+                for player_id in {row[1] for row in rows}
+            ])
+        return verified_ids
+
+    @classmethod
+    def rebuild_leaderboard_entries(cls, player_ids):
+        """Recompute every leaderboard entry of `player_ids` from their verified ratings.
+
+        The players' details rows are locked before ratings are read, so a
+        concurrent verify_pending() is either counted here or moves the
+        rebuilt entries once this transaction commits. Ratings are summed
+        per player, result and game date by the database. Returns the
+        number of entries written.
+        """
+        player_ids = list(player_ids)
+        with transaction.atomic():
+            list(PlayerDetails.objects.select_for_update().filter(
+                player_id__in=player_ids,
+            ).values_list('pk', flat=True))
+            results = [
+                (row['player_id'], row['result'], row['game__date'], row['count'], row['total_goals'], row['total_assists'])
+                for row in cls.objects.filter(
+                    player_id__in=player_ids,
+                    verification_status='VERIFIED',
+                ).order_by().values('player_id', 'result', 'game__date').annotate(
+                    count=Count('pk'),
+                    total_goals=Sum('goals'),
+                    total_assists=Sum('assists'),
+                )
+            ]
+            return LeaderboardEntry.replace_player_entries(player_ids, results)
@@ -0,0 +1,205 @@
+from collections import Counter, defaultdict
+from itertools import groupby
+from operator import itemgetter
+from django.core.cache import cache
+from django.db import connections, models, transaction
+from django.utils import timezone
+import hashlib
+from .base import Base
+from ..search import (
+    MAX_SUGGESTION_PREFIX_LENGTH, get_prefix_filter, get_suggestion_keys, get_suggestion_prefixes,
+    normalize_suggestion,
+)
+
+class GameSuggestion(Base):
+    """A title or venue name of a game, indexed for type-ahead by each of its words.
+
+    `key` is the normalized text starting at one of its words, so a
+    prefix lookup is a single range scan on the key index. `is_open`
+    marks rows of open public games, the only ones suggested and the
+    ones counted in GameSuggestionPrefix.
+    """
+    game = models.ForeignKey(
+        'Game',
+        on_delete=models.CASCADE,
+        related_name='suggestions'
+    )
+
+    # Suggestions per prefix are cached for this long
+    CACHE_SECONDS = 30
+    MAX_RESULTS = 10
+
+    text = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    is_open = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL serve LIKE 'prefix%' from
+            # the index under any collation; other backends ignore it
+            models.Index(fields=['key'], name='game_suggestion_key_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.text
+
+    @staticmethod
+    def is_open_game(visibility, status):
+        """Whether a game with this visibility and status is suggested"""
+        return visibility == 'PUBLIC' and status == 'UPCOMING'
+
+    @classmethod
+    def sync_game(cls, game, is_open=None):
+        """Bring a game's rows in line with its title, venue names and whether it is open.
+
+        `is_open` defaults to the game's own visibility and status. The
+        prefix counts move by the difference; call inside the transaction
+        that saved the game, so its row lock keeps concurrent syncs apart.
+        """
+        if is_open is None:
+            is_open = cls.is_open_game(game.visibility, game.status)
+        wanted = get_suggestion_keys(game.title, game.venue_details)
+        existing = {
+            (text, key): (pk, row_open)
+            for pk, text, key, row_open in cls.objects.filter(game=game).values_list(
+                'pk', 'text', 'key', 'is_open',
+            )
+        }
+        stale = [pk for entry, (pk, _) in existing.items() if entry not in wanted]
+        if stale:
+            cls.objects.filter(pk__in=stale).delete()
+        if any(row_open != is_open for entry, (_, row_open) in existing.items() if entry in wanted):
+            cls.objects.filter(game=game).exclude(is_open=is_open).update(is_open=is_open)
+        cls.objects.bulk_create([
+            cls(game=game, text=text, key=key, is_open=is_open)
+            for text, key in wanted
+            if (text, key) not in existing
+        ])
+
+        counted = {entry for entry, (_, row_open) in existing.items() if row_open}
+        GameSuggestionPrefix.apply_changes(counted, wanted if is_open else set())
+
+    @classmethod
+    def close_games(cls, game_ids):
+        """Stop suggesting games that are no longer open, e.g. after a status transition"""
+        rows = defaultdict(set)
+        for game_id, text, key in cls.objects.filter(game_id__in=game_ids, is_open=True).values_list(
+            'game_id', 'text', 'key',
+        ):
+            rows[game_id].add((text, key))
+        if not rows:
+            return
+        cls.objects.filter(game_id__in=list(rows), is_open=True).update(is_open=False)
+        deltas = Counter()
+        for keys in rows.values():
+            deltas.subtract(get_suggestion_prefixes(keys))
+        GameSuggestionPrefix.apply_deltas(deltas)
+
+    @classmethod
+    def suggest(cls, prefix):
+        """Up to MAX_RESULTS titles and venue names of open public games completing `prefix`.
+
+        Each suggestion counts the games it appears on and the most
+        common come first. Prefixes up to MAX_SUGGESTION_PREFIX_LENGTH read
+        the top rows of GameSuggestionPrefix; longer ones are narrow
+        enough to count from the open rows here.
+        """
+        key = normalize_suggestion(prefix)
+        if not key:
+            return []
+        cache_key = 'game_suggestions:' + hashlib.sha1(key.encode()).hexdigest()
+        suggestions = cache.get(cache_key)
+        if suggestions is None:
+            if len(key) <= MAX_SUGGESTION_PREFIX_LENGTH:
+                top = GameSuggestionPrefix.objects.filter(prefix=key, games__gt=0)
+            else:
+                top = cls.objects.filter(
+                    is_open=True,
+                    **get_prefix_filter(connections[cls.objects.db].vendor, 'key', key),
+                ).values('text').annotate(games=models.Count('game', distinct=True))
+            suggestions = list(top.values('text', 'games').order_by('-games', 'text')[:cls.MAX_RESULTS])
+            cache.set(cache_key, suggestions, cls.CACHE_SECONDS)
+        return suggestions
+
+
+class GameSuggestionPrefix(Base):
+    """Open public games carrying a suggestion with a key starting with a short prefix.
+
+    GameSuggestion.sync_game() and close_games() move the counts as games
+    open, close or are renamed, so the top suggestions for a prefix are
+    the first rows of one index range.
+    """
+    prefix = models.CharField(max_length=MAX_SUGGESTION_PREFIX_LENGTH)
+    text = models.CharField(max_length=255)
+    games = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'text'], name='unique_game_suggestion_prefix'),
+        ]
+        indexes = [
+            models.Index(fields=['prefix', '-games', 'text'], name='game_suggestion_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.text} for {self.prefix!r}"
+
+    @classmethod
+    def apply_changes(cls, before, after):
+        """Move the counts for one game from the {(text, key)} it was counted under to `after`"""
+        before, after = get_suggestion_prefixes(before), get_suggestion_prefixes(after)
+        deltas = Counter(after - before)
+        deltas.subtract(before - after)
+        cls.apply_deltas(deltas)
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Add {(prefix, text): games} with one UPDATE per text and change.
+
+        Rows that drop to zero are kept rather than deleted, so a
+        concurrent increment never lands on a missing row; suggest() skips
+        them and rebuild() clears them. Rows are inserted and locked in
+        (prefix, text) order before any UPDATE, so workers touching
+        overlapping prefixes wait on each other instead of deadlocking.
+        """
+        entries = sorted(entry for entry, delta in deltas.items() if delta)
+        if not entries:
+            return
+        grouped = defaultdict(list)
+        for prefix, text in entries:
+            grouped[(text, deltas[(prefix, text)])].append(prefix)
+        now = timezone.now()
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(prefix=prefix, text=text) for prefix, text in entries if deltas[(prefix, text)] > 0],
+                ignore_conflicts=True,
+            )
+            rows = models.Q()
+            for (text, _), prefixes in grouped.items():
+                rows |= models.Q(text=text, prefix__in=prefixes)
+            list(cls.objects.select_for_update().filter(rows).order_by('prefix', 'text').values_list('pk', flat=True))
+            for (text, delta), prefixes in sorted(grouped.items()):
+                cls.objects.filter(text=text, prefix__in=prefixes).update(
+                    games=models.F('games') + delta, updated_at=now,
+                )
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Re-mark open GameSuggestion rows from their games and recount every prefix; returns the rows written"""
+        open_games = models.Q(game__visibility='PUBLIC', game__status='UPCOMING')
+        GameSuggestion.objects.filter(open_games, is_open=False).update(is_open=True)
+        GameSuggestion.objects.filter(~open_games, is_open=True).update(is_open=False)
+
+        counts = Counter()
+        open_rows = GameSuggestion.objects.filter(is_open=True).order_by('game_id').values_list(
+            'game_id', 'text', 'key',
+        )
+        # Rows come grouped by game, so only one game's keys are held at a time
+        for _, rows in groupby(open_rows.iterator(chunk_size=batch_size), key=itemgetter(0)):
+            counts.update(get_suggestion_prefixes({(text, key) for _, text, key in rows}))
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            [cls(prefix=prefix, text=text, games=games) for (prefix, text), games in counts.items()],
+            batch_size=batch_size,
+        )
+        return len(counts)
@@ -0,0 +1,36 @@
+from django.db import models
+from .base import Base
+
+class GameWaitlistEntry(Base):
+    """A player waiting for a spot in a full game, served FIFO by (created_at, id)"""
+    game = models.ForeignKey(
+        'Game',
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    
+    player = models.ForeignKey(
+        'Player',
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'player'], name='unique_waitlist_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['game', 'created_at', 'id'], name='waitlist_game_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} waiting for {self.game.title}"
+
+    @property
+    def position(self):
+        """1-based place in the game's queue"""
+        return GameWaitlistEntry.objects.filter(
+            models.Q(created_at__lt=self.created_at)
+            | models.Q(created_at=self.created_at, id__lt=self.id),
+            game_id=self.game_id,
+        ).count() + 1
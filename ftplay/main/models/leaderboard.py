@@ -0,0 +1,207 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import models
+from django.db.models.functions import Coalesce
+from .base import Base
+from .player_details import RESULT_COUNTER_FIELDS, PlayerDetails
+
+# Counters summed per board; win_percentage is derived from them
+ENTRY_COUNTER_FIELDS = ['wins', 'draw', 'lose', 'goals', 'assists', 'games_played']
+
+class LeaderboardEntry(Base):
+    """A player's standing on one materialized leaderboard.
+
+    Each board is identified by a key combining its scope (global or a
+    PlayerDetails.location) and its window (all time, a week or a month),
+    see board_key(). Counters are moved incrementally as ratings are
+    verified, so top-K and rank lookups are single index range queries.
+    """
+    METRIC_CHOICES = [
+        ('win_percentage', 'Win percentage'),
+        ('wins', 'Wins'),
+        ('goals', 'Goals'),
+        ('assists', 'Assists'),
+    ]
+    PERIOD_CHOICES = [
+        ('ALL_TIME', 'All time'),
+        ('WEEK', 'Week'),
+        ('MONTH', 'Month'),
+    ]
+
+    board = models.CharField(max_length=300)
+
+    player = models.ForeignKey(
+        'Player',
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entries'
+    )
+
+    wins = models.IntegerField(default=0)
+    draw = models.IntegerField(default=0)
+    lose = models.IntegerField(default=0)
+    goals = models.IntegerField(default=0)
+    assists = models.IntegerField(default=0)
+    games_played = models.IntegerField(default=0)
+    win_percentage = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'player'], name='unique_leaderboard_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['board', '-win_percentage', 'player'], name='leaderboard_win_pct_idx'),
+            models.Index(fields=['board', '-wins', 'player'], name='leaderboard_wins_idx'),
+            models.Index(fields=['board', '-goals', 'player'], name='leaderboard_goals_idx'),
+            models.Index(fields=['board', '-assists', 'player'], name='leaderboard_assists_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} on {self.board}"
+
+    @staticmethod
+    def board_key(location=None, period='ALL_TIME', on=None):
+        """Key of the board for a scope and the window containing date `on`"""
+        key = f'location:{location.strip().casefold()}' if location else 'global'
+        if period == 'WEEK':
+            key += f':week:{(on - timedelta(days=on.weekday())).isoformat()}'
+        elif period == 'MONTH':
+            key += f':month:{on.strftime("%Y-%m")}'
+        return key
+
+    @classmethod
+    def boards_for(cls, location, on):
+        """Every board a result played on date `on` by a player at `location` counts towards"""
+        locations = [None, location] if location and location.strip() else [None]
+        return [
+            cls.board_key(scope, period, on)
+            for scope in locations
+            for period, _ in cls.PERIOD_CHOICES
+        ]
+
+    @classmethod
+    def rank_annotation(cls, metric):
+        """1-based rank of an entry on its board, ties broken by player id.
+
+        Entries left with no games (all their ratings un-verified) are not
+        listed, so they do not count as ahead either.
+        """
+        better = cls.objects.filter(
+            models.Q(**{f'{metric}__gt': models.OuterRef(metric)})
+            | models.Q(**{metric: models.OuterRef(metric), 'player_id__lt': models.OuterRef('player_id')}),
+            board=models.OuterRef('board'),
+            games_played__gt=0,
+        ).order_by().values('board').annotate(count=models.Count('*')).values('count')
+        return Coalesce(
+            models.Subquery(better, output_field=models.IntegerField()), 0
+        ) + 1
+
+    @classmethod
+    def apply_rating_results(cls, results, game_date, sign=1):
+        """Move leaderboard counters for verified results of a game played on `game_date`.
+
+        `results` is an iterable of (player_id, result, goals, assists), as
+        for PlayerDetails.apply_rating_results(). Missing entries are
+        inserted in one statement and players sharing a board and delta
+        share one UPDATE.
+        """
+        deltas = defaultdict(Counter)
+        for player_id, result, goals, assists in results:
+            delta = deltas[player_id]
+            delta[RESULT_COUNTER_FIELDS[result]] += sign
+            delta['games_played'] += sign
+            delta['goals'] += sign * (goals or 0)
+            delta['assists'] += sign * (assists or 0)
+        if not deltas:
+            return
+
+        locations = dict(
+            PlayerDetails.objects.filter(player_id__in=list(deltas)).values_list('player_id', 'location')
+        )
+        players_by_board_delta = defaultdict(list)
+        for player_id, delta in deltas.items():
+            key = tuple(sorted((field, value) for field, value in delta.items() if value))
+            for board in cls.boards_for(locations.get(player_id), game_date):
+                players_by_board_delta[(board, key)].append(player_id)
+
+        cls.objects.bulk_create(
+            [
+                cls(board=board, player_id=player_id)
+                for (board, _), player_ids in players_by_board_delta.items()
+                for player_id in player_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+        players_by_board = defaultdict(list)
+        for (board, key), player_ids in players_by_board_delta.items():
+            players_by_board[board].extend(player_ids)
+            if key:
+                cls.objects.filter(board=board, player_id__in=player_ids).update(
+                    **{field: models.F(field) + value for field, value in key}
+                )
+
+        for board, player_ids in players_by_board.items():
+            cls.objects.filter(board=board, player_id__in=player_ids).update(
+                win_percentage=cls.win_percentage_expression()
+            )
+
+    @classmethod
+    def replace_player_entries(cls, player_ids, results):
+        """Overwrite every entry of `player_ids` with counters folded from `results`.
+
+        `results` is an iterable of (player_id, result, game_date, count,
+        goals, assists) covering all verified ratings of those players.
+        Entries are upserted in place; entries on boards the players no
+        longer count towards, such as a location they moved away from, are
+        deleted. Returns the number of entries written.
+        """
+        player_ids = list(player_ids)
+        locations = dict(
+            PlayerDetails.objects.filter(player_id__in=player_ids).values_list('player_id', 'location')
+        )
+        totals = defaultdict(Counter)
+        for player_id, result, game_date, count, goals, assists in results:
+            for board in cls.boards_for(locations.get(player_id), game_date):
+                counters = totals[(board, player_id)]
+                counters[RESULT_COUNTER_FIELDS[result]] += count
+                counters['games_played'] += count
+                counters['goals'] += goals or 0
+                counters['assists'] += assists or 0
+
+        stale_ids = [
+            pk
+            for pk, board, player_id in cls.objects.filter(
+                player_id__in=player_ids,
+            ).values_list('pk', 'board', 'player_id')
+            if (board, player_id) not in totals
+        ]
+        if stale_ids:
+            cls.objects.filter(pk__in=stale_ids).delete()
+
+        entries = [
+            cls(
+                board=board,
+                player_id=player_id,
+                win_percentage=counters['wins'] * 100.0 / counters['games_played'] if counters['games_played'] else 0,
+                **{field: counters[field] for field in ENTRY_COUNTER_FIELDS},
+            )
+            for (board, player_id), counters in totals.items()
+        ]
+        cls.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['board', 'player'],
+            update_fields=ENTRY_COUNTER_FIELDS + ['win_percentage', 'updated_at'],
+        )
+        return len(entries)
+
+    @staticmethod
+    def win_percentage_expression():
+        return models.Case(
+            models.When(games_played__lte=0, then=models.Value(0.0)),
+            default=models.ExpressionWrapper(
+                models.F('wins') * 100.0 / models.F('games_played'),
+                output_field=models.FloatField(),
+            ),
+            output_field=models.FloatField(),
+        )
@@ -1,7 +1,37 @@
-from django.db import models
+from collections import Counter, defaultdict
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.utils import timezone
+from .. import leases
 from .base import Base
+from .game import Game
+from .organizer import Organizer
+from .player import Player
+from .push_message import PushMessage
+
+logger = logging.getLogger(__name__)
 
 class Notification(Base):
+    # Rows per INSERT statement when fanning out
+    FAN_OUT_BATCH_SIZE = 500
+
+    # Types merged into one digest row per recipient and game while it is
+    # unread and younger than NOTIFICATION_COALESCE_WINDOW_SECONDS; the
+    # digest message is the count followed by this text
+    DIGEST_SUFFIXES = {
+        'NEW_PARTICIPANT': ' players joined "{title}"',
+        'NEW_COMMENT': ' new comments on "{title}"',
+    }
+    DEFAULT_COALESCE_WINDOW_SECONDS = 5 * 60
+
+    # Who a game event is fanned out to
+    AUDIENCE_PARTICIPANTS = 'PARTICIPANTS'
+    AUDIENCE_ORGANIZER = 'ORGANIZER'
+    AUDIENCE_EVERYONE = 'EVERYONE'
+
     NOTIFICATION_TYPE_CHOICES = [
         ('GAME_CREATED', 'Game Created'),
         ('GAME_JOINED', 'Game Joined'),
@@ -28,6 +58,11 @@ class Notification(Base):
     )
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    # Events merged into this row by coalescing
+    coalesced_count = models.PositiveIntegerField(default=1)
+    # When the latest of those events happened; a digest moves up the inbox
+    # and is unread again past a mark-read cursor as events join it
+    last_event_at = models.DateTimeField(default=timezone.now)
     
     recipient_player = models.ForeignKey(
         'Player',
@@ -63,5 +98,338 @@ class Notification(Base):
         related_name='actor_notifications'
     )
 
+    class Meta:
+        indexes = [
+            # Unread lookups and mark-read per recipient
+            models.Index(fields=['recipient_player', 'is_read', 'last_event_at'], name='notif_player_unread_evt_idx'),
+            models.Index(fields=['recipient_organizer', 'is_read', 'last_event_at'], name='notif_org_unread_evt_idx'),
+            # Inbox pages, latest event first
+            models.Index(fields=['recipient_player', '-last_event_at', '-id'], name='notif_player_inbox_evt_idx'),
+            models.Index(fields=['recipient_organizer', '-last_event_at', '-id'], name='notif_org_inbox_evt_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} notification for {self.game.title}"
+
+    @staticmethod
+    def recipient_filter(recipient):
+        """Filter kwargs selecting the notifications of a Player or Organizer"""
+        if isinstance(recipient, Player):
+            return {'recipient_player': recipient}
+        return {'recipient_organizer': recipient}
+
+    @classmethod
+    def create_batch(cls, notifications):
+        """Insert unsaved notifications and add them to their recipients' unread counters.
+
+        Inserts run in FAN_OUT_BATCH_SIZE chunks and recipients gaining the
+        same number of notifications share one counter UPDATE. Recipients
+        with an fcm_token also get a push queued.
+        """
+        cls.objects.bulk_create(notifications, batch_size=cls.FAN_OUT_BATCH_SIZE)
+        PushMessage.enqueue(notifications)
+        cls.adjust_unread_counters(notifications)
+        return notifications
+
+    @staticmethod
+    def adjust_unread_counters(notifications, sign=1):
+        """Add the unread ones among `notifications` to their recipients' counters, or remove them with sign=-1.
+
+        Recipients changing by the same amount share one UPDATE.
+        """
+        for model, field in ((Player, 'recipient_player_id'), (Organizer, 'recipient_organizer_id')):
+            counts = Counter(
+                getattr(notification, field)
+                for notification in notifications
+                if getattr(notification, field) and not notification.is_read
+            )
+            recipients_by_count = defaultdict(list)
+            for recipient_id, count in counts.items():
+                recipients_by_count[count].append(recipient_id)
+            for count, recipient_ids in recipients_by_count.items():
+                model.objects.filter(pk__in=recipient_ids).update(
+                    unread_notifications=models.F('unread_notifications') + sign * count
+                )
+
+    @classmethod
+    def mark_read(cls, recipient, up_to=None):
+        """Mark a recipient's unread notifications read in one UPDATE; returns how many.
+
+        With `up_to`, only notifications at or before it in inbox order
+        (last_event_at, id) are marked, so ones that arrived, or digests
+        that gained events, after the client last loaded its inbox stay
+        unread.
+        """
+        unread = cls.objects.filter(is_read=False, **cls.recipient_filter(recipient))
+        if up_to is not None:
+            unread = unread.filter(
+                models.Q(last_event_at__lt=up_to.last_event_at)
+                | models.Q(last_event_at=up_to.last_event_at, id__lte=up_to.id)
+            )
+        with transaction.atomic():
+            marked = unread.update(is_read=True)
+            if marked:
+                type(recipient).objects.filter(pk=recipient.pk).update(
+                    unread_notifications=models.F('unread_notifications') - marked
+                )
+        return marked
+
+    @classmethod
+    def reconcile_unread_counters(cls, model, recipient_ids, dry_run=False):
+        """Reset the unread counters of Players or Organizers in `recipient_ids` to their unread rows.
+
+        The recipients are locked before their rows are counted, so a
+        notification or mark-read committing concurrently is either counted
+        or applied on top once the lock is released. Returns how many
+        counters were off.
+        """
+        field = 'recipient_player' if model is Player else 'recipient_organizer'
+        unread = cls.objects.filter(
+            is_read=False, **{field: models.OuterRef('pk')},
+        ).order_by().values(field).annotate(count=models.Count('*')).values('count')
+        actual = Coalesce(models.Subquery(unread, output_field=models.IntegerField()), 0)
+        with transaction.atomic():
+            recipients = model.objects.filter(pk__in=recipient_ids).order_by('pk')
+            if not dry_run:
+                # NO KEY so notifications can still be inserted for them meanwhile
+                recipients = recipients.select_for_update(no_key=connection.features.has_select_for_no_key_update)
+            drifted = list(
+                recipients.annotate(actual=actual).exclude(
+                    unread_notifications=models.F('actual'),
+                ).values_list('pk', flat=True)
+            )
+            if drifted and not dry_run:
+                model.objects.filter(pk__in=drifted).update(unread_notifications=actual)
+        return len(drifted)
+
+    @classmethod
+    def notify_game(cls, game, notification_type, message, audience, actor_player=None, actor_organizer=None):
+        """Queue a game event for fan_out_notifications to deliver to `audience`.
+
+        The event is one INSERT in the current transaction, so nothing is
+        sent if it rolls back and the fan-out never runs in the request.
+        Call it inside the same transaction.atomic() block as the change
+        it reports; outside one, the two commit separately.
+        The actor never receives their own event.
+        """
+        return NotificationEvent.objects.create(
+            game_id=game.pk,
+            type=notification_type,
+            message=message,
+            audience=audience,
+            actor_player_id=actor_player.pk if actor_player else None,
+            actor_organizer_id=actor_organizer.pk if actor_organizer else None,
+        )
+
+    @classmethod
+    def resolve_recipients(cls, game_id, audience, actor_player_id=None, actor_organizer_id=None):
+        """(player ids, organizer ids) receiving a game event, from one query"""
+        rows = Game.objects.filter(pk=game_id).values_list('organizer_id', 'participants__id')
+        player_ids, organizer_ids = set(), set()
+        for organizer_id, player_id in rows:
+            if audience in (cls.AUDIENCE_ORGANIZER, cls.AUDIENCE_EVERYONE):
+                organizer_ids.add(organizer_id)
+            if audience in (cls.AUDIENCE_PARTICIPANTS, cls.AUDIENCE_EVERYONE) and player_id:
+                player_ids.add(player_id)
+        player_ids.discard(actor_player_id)
+        organizer_ids.discard(actor_organizer_id)
+        return player_ids, organizer_ids
+
+    @classmethod
+    def get_coalesce_window(cls):
+        seconds = getattr(settings, 'NOTIFICATION_COALESCE_WINDOW_SECONDS', cls.DEFAULT_COALESCE_WINDOW_SECONDS)
+        return timedelta(seconds=seconds)
+
+    @classmethod
+    def coalesce(cls, game_id, notification_type, player_ids, organizer_ids, actor_player_id=None, actor_organizer_id=None):
+        """Fold a game event into recipients' recent unread digests of the same type.
+
+        Each recipient's latest matching digest has its count, message and
+        last_event_at moved by a single UPDATE; it stays unread, so unread
+        counters are unchanged and no new push is queued. Returns the
+        (player ids, organizer ids) that had no digest to join.
+        """
+        window = cls.get_coalesce_window()
+        if notification_type not in cls.DIGEST_SUFFIXES or not window or not (player_ids or organizer_ids):
+            return player_ids, organizer_ids
+
+        with transaction.atomic():
+            # Locked so a concurrent mark_read() cannot read a digest we are about to bump
+            recent = cls.objects.select_for_update().filter(
+                models.Q(recipient_player_id__in=player_ids)
+                | models.Q(recipient_organizer_id__in=organizer_ids),
+                type=notification_type,
+                game_id=game_id,
+                is_read=False,
+                created_at__gte=timezone.now() - window,
+            ).order_by('-created_at', '-id').values_list('id', 'recipient_player_id', 'recipient_organizer_id')
+
+            digest_ids, coalesced_players, coalesced_organizers = [], set(), set()
+            for notification_id, player_id, organizer_id in recent:
+                if player_id in coalesced_players or organizer_id in coalesced_organizers:
+                    continue
+                digest_ids.append(notification_id)
+                if player_id:
+                    coalesced_players.add(player_id)
+                else:
+                    coalesced_organizers.add(organizer_id)
+
+            if digest_ids:
+                title = Game.objects.filter(pk=game_id).values_list('title', flat=True).first() or ''
+                suffix = cls.DIGEST_SUFFIXES[notification_type].format(title=title)
+                count = models.F('coalesced_count') + 1
+                now = timezone.now()
+                cls.objects.filter(pk__in=digest_ids).update(
+                    coalesced_count=count,
+                    message=Concat(Cast(count, models.CharField()), models.Value(suffix)),
+                    actor_player_id=actor_player_id,
+                    actor_organizer_id=actor_organizer_id,
+                    last_event_at=now,
+                    updated_at=now,
+                )
+        return player_ids - coalesced_players, organizer_ids - coalesced_organizers
+
+    @classmethod
+    def fan_out(cls, game_id, notification_type, message, audience, actor_player_id=None, actor_organizer_id=None):
+        """Notify each recipient, folding coalescable events into digests; returns recipients reached.
+
+        New rows go out in batched INSERTs, so the statement count does not
+        grow with the audience.
+        """
+        player_ids, organizer_ids = cls.resolve_recipients(
+            game_id, audience, actor_player_id, actor_organizer_id
+        )
+        recipient_count = len(player_ids) + len(organizer_ids)
+        common = {
+            'type': notification_type,
+            'message': message,
+            'game_id': game_id,
+            'actor_player_id': actor_player_id,
+            'actor_organizer_id': actor_organizer_id,
+        }
+        with transaction.atomic():
+            player_ids, organizer_ids = cls.coalesce(
+                game_id, notification_type, player_ids, organizer_ids, actor_player_id, actor_organizer_id
+            )
+            notifications = [
+                cls(recipient_player_id=player_id, **common) for player_id in player_ids
+            ] + [
+                cls(recipient_organizer_id=organizer_id, **common) for organizer_id in organizer_ids
+            ]
+            cls.create_batch(notifications)
+        return recipient_count
+
+
+class NotificationEvent(Base):
+    """Outbox row for one game event, fanned out to its audience by fan_out_notifications.
+
+    Notification.notify_game() inserts it in the caller's transaction (the
+    game views open one around each change and its event), so an event
+    exists exactly when the change it reports was committed, and the
+    request never pays for the fan-out itself.
+    """
+    STATUS_PENDING = 'PENDING'
+    STATUS_DONE = 'DONE'
+    STATUS_FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    game = models.ForeignKey(
+        'Game',
+        on_delete=models.CASCADE,
+        related_name='notification_events'
+    )
+    type = models.CharField(max_length=50)
+    message = models.TextField()
+    audience = models.CharField(max_length=20)
+
+    actor_player = models.ForeignKey(
+        'Player',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='notification_events'
+    )
+
+    actor_organizer = models.ForeignKey(
+        'Organizer',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='notification_events'
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    # When a worker may next pick the event up; also pushed forward while
+    # a worker holds it, so a crashed worker's batch is retried
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notif_event_due_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.type} notification for {self.game.title}" 
\ No newline at end of file
+        return f"{self.status} {self.type} event for game {self.game_id}"
+
+    @classmethod
+    def claim_batch(cls, batch_size, now):
+        """Lease up to `batch_size` due events to this worker, oldest first"""
+        return leases.claim_batch(
+            cls.objects.filter(status=cls.STATUS_PENDING), batch_size, now,
+            ordering=('next_attempt_at', 'created_at'),
+        )
+
+    @classmethod
+    def process_batch(cls, batch_size=100, now=None):
+        """Fan out one batch of due events; returns (events claimed, events failed).
+
+        Each event is locked and checked to still be under this worker's
+        lease before it is fanned out, and its notifications and DONE mark
+        commit together, so an event is fanned out once even when a slow
+        worker's lease ran out and another worker took it over. A failed
+        event is retried after a backoff until main.leases.MAX_ATTEMPTS.
+        """
+        now = now or timezone.now()
+        pending = cls.objects.filter(status=cls.STATUS_PENDING)
+        events = cls.claim_batch(batch_size, now)
+        failed = 0
+        for event in events:
+            try:
+                with transaction.atomic():
+                    if not leases.holds_lease(pending, event):
+                        logger.warning('Notification event %s was taken over by another worker', event.pk)
+                        continue
+                    Notification.fan_out(
+                        event.game_id,
+                        event.type,
+                        event.message,
+                        event.audience,
+                        actor_player_id=event.actor_player_id,
+                        actor_organizer_id=event.actor_organizer_id,
+                    )
+                    cls.objects.filter(pk=event.pk).update(
+                        status=cls.STATUS_DONE, processed_at=timezone.now(), attempts=event.attempts + 1,
+                    )
+            except Exception as exc:
+                logger.exception('Fan-out of notification event %s failed', event.pk)
+                failed += 1
+                attempts = event.attempts + 1
+                # Only while still ours, so a retry never overwrites another worker's lease
+                held = pending.filter(pk=event.pk, next_attempt_at=event.next_attempt_at)
+                if attempts >= leases.MAX_ATTEMPTS:
+                    held.update(status=cls.STATUS_FAILED, attempts=attempts, last_error=str(exc))
+                else:
+                    held.update(
+                        attempts=attempts, last_error=str(exc), next_attempt_at=now + leases.get_backoff(attempts),
+                    )
+        return len(events), failed
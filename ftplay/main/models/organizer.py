@@ -23,5 +23,8 @@ class Organizer(Base):
     reset_token_expiry = models.DateTimeField(null=True, blank=True)
     fcm_token = models.CharField(max_length=255, null=True, blank=True)
 
+    # Maintained by Notification.create_batch() and Notification.mark_read()
+    unread_notifications = models.IntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.name 
\ No newline at end of file
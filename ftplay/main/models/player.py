@@ -1,4 +1,6 @@
+from django.core.cache import cache
 from django.db import models
+import uuid
 from .base import Base
 from .user import CustomUser
 
@@ -30,5 +32,36 @@ class Player(Base):
     reset_token_expiry = models.DateTimeField(null=True, blank=True)
     fcm_token = models.CharField(max_length=255, null=True, blank=True)
 
+    # Replaced in the same transaction as every join or leave, so a cached
+    # joined-game set keyed by it can never be read after it went stale.
+    # A random value rather than a counter, so a version from a rolled
+    # back transaction can never be issued again
+    joined_games_version = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    # Maintained by Notification.create_batch() and Notification.mark_read()
+    unread_notifications = models.IntegerField(default=0, editable=False)
+
+    JOINED_GAMES_CACHE_SECONDS = 60 * 60 * 24
+
     def __str__(self):
-        return self.name 
\ No newline at end of file
+        return self.name
+
+    def get_joined_game_ids(self):
+        """Ids of every game the player has joined, cached per joined_games_version.
+
+        The version is read with the player, so the set returned is never
+        older than the player row.
+        """
+        cache_key = f'joined_game_ids:{self.pk}:{self.joined_games_version}'
+        game_ids = cache.get(cache_key)
+        if game_ids is None:
+            game_ids = frozenset(
+                self.games.through.objects.filter(player_id=self.pk).values_list('game_id', flat=True)
+            )
+            cache.set(cache_key, game_ids, self.JOINED_GAMES_CACHE_SECONDS)
+        return game_ids
+
+    def bump_joined_games_version(self):
+        """Retire the cached joined-game set; call inside the transaction that changes it"""
+        self.joined_games_version = uuid.uuid4()
+        Player.objects.filter(pk=self.pk).update(joined_games_version=self.joined_games_version)
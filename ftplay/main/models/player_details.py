@@ -1,6 +1,14 @@
+from collections import Counter, defaultdict
 from django.db import models
 from .base import Base
 
+# PlayerDetails counter incremented by each GameRating result
+RESULT_COUNTER_FIELDS = {
+    'WIN': 'wins',
+    'DRAW': 'draw',
+    'LOSE': 'lose',
+}
+
 class PlayerDetails(Base):
     age_group = models.CharField(max_length=50, null=True, blank=True)
     play_position = models.JSONField(null=True, blank=True)  # Array of positions
@@ -23,6 +31,10 @@ class PlayerDetails(Base):
     lose = models.IntegerField(default=0)
     goal = models.IntegerField(default=0)
     assists = models.IntegerField(default=0)
+
+    # Computed from verified results by SkillRatingCheckpoint.process_games()
+    skill_rating = models.FloatField(default=1500.0)
+    rated_games = models.IntegerField(default=0)
     
     player = models.OneToOneField(
         'Player',
@@ -38,4 +50,45 @@ class PlayerDetails(Base):
         return ((self.wins or 0) / total) * 100
 
     def __str__(self):
-        return f"Details for {self.player.name}" 
\ No newline at end of file
+        return f"Details for {self.player.name}"
+
+    @classmethod
+    def apply_rating_results(cls, results, sign=1):
+        """Add (sign=1) or subtract (sign=-1) verified results from player counters.
+
+        `results` is an iterable of (player_id, result, goals, assists). Deltas
+        are folded per player and players with identical deltas share one
+        F-expression UPDATE, so a verified game costs a handful of statements
+        however many players it had.
+        """
+        deltas = defaultdict(Counter)
+        for player_id, result, goals, assists in results:
+            delta = deltas[player_id]
+            delta[RESULT_COUNTER_FIELDS[result]] += sign
+            delta['goal'] += sign * (goals or 0)
+            delta['assists'] += sign * (assists or 0)
+
+        if not deltas:
+            return
+
+        # Players without a details row yet get an empty one to count into
+        existing = set(
+            cls.objects.filter(player_id__in=list(deltas)).values_list('player_id', flat=True)
+        )
+        missing = [player_id for player_id in deltas if player_id not in existing]
+        if missing:
+            cls.objects.bulk_create(
+                [cls(player_id=player_id) for player_id in missing],
+                ignore_conflicts=True,
+            )
+
+        players_by_delta = defaultdict(list)
+        for player_id, delta in deltas.items():
+            key = tuple(sorted((field, value) for field, value in delta.items() if value))
+            if key:
+                players_by_delta[key].append(player_id)
+
+        for key, player_ids in players_by_delta.items():
+            cls.objects.filter(player_id__in=player_ids).update(
+                **{field: models.F(field) + value for field, value in key}
+            )
\ No newline at end of file
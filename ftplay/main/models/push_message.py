@@ -0,0 +1,103 @@
+from django.db import models
+from django.utils import timezone
+from .base import Base
+from .game import Game
+from .organizer import Organizer
+from .player import Player
+
+class PushMessage(Base):
+    """Outbox row for one push to one device token, drained by deliver_push_notifications"""
+    STATUS_PENDING = 'PENDING'
+    STATUS_SENT = 'SENT'
+    STATUS_FAILED = 'FAILED'
+    STATUS_DEAD_TOKEN = 'DEAD_TOKEN'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_DEAD_TOKEN, 'Dead Token'),
+    ]
+
+    # Rows per INSERT statement when enqueueing
+    ENQUEUE_BATCH_SIZE = 500
+
+    notification = models.ForeignKey(
+        'Notification',
+        on_delete=models.CASCADE,
+        related_name='push_messages'
+    )
+    token = models.CharField(max_length=255)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    # When a worker may next pick the message up; also pushed forward
+    # while a worker holds it, so a crashed worker's batch is retried
+    next_attempt_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='push_due_idx'),
+            models.Index(fields=['token', 'status'], name='push_token_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} push for notification {self.notification_id}"
+
+    @classmethod
+    def enqueue(cls, notifications):
+        """Queue a push for each saved notification whose recipient has an fcm_token.
+
+        Looks up tokens and game titles with one query each; returns the
+        queued messages.
+        """
+        tokens = {}
+        for model, field in ((Player, 'recipient_player_id'), (Organizer, 'recipient_organizer_id')):
+            recipient_ids = {
+                getattr(notification, field)
+                for notification in notifications
+                if getattr(notification, field)
+            }
+            if recipient_ids:
+                tokens[field] = dict(
+                    model.objects.filter(pk__in=recipient_ids).exclude(
+                        models.Q(fcm_token__isnull=True) | models.Q(fcm_token='')
+                    ).values_list('pk', 'fcm_token')
+                )
+        if not any(tokens.values()):
+            return []
+
+        game_titles = dict(Game.objects.filter(
+            pk__in={notification.game_id for notification in notifications}
+        ).values_list('pk', 'title'))
+        now = timezone.now()
+        messages = []
+        for notification in notifications:
+            token = next(
+                (
+                    tokens.get(field, {}).get(getattr(notification, field))
+                    for field in ('recipient_player_id', 'recipient_organizer_id')
+                    if getattr(notification, field)
+                ),
+                None,
+            )
+            if not token:
+                continue
+            messages.append(cls(
+                notification_id=notification.pk,
+                token=token,
+                title=game_titles.get(notification.game_id, ''),
+                body=notification.message,
+                # Kept identical across a fan-out so it can be sent as one multicast
+                data={'type': notification.type, 'game_id': str(notification.game_id)},
+                next_attempt_at=now,
+            ))
+        return cls.objects.bulk_create(messages, batch_size=cls.ENQUEUE_BATCH_SIZE)
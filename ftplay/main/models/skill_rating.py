@@ -0,0 +1,139 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import models, transaction
+from django.utils import timezone
+from .base import Base
+from .game import Game
+from .game_rating import GameRating
+from .player_details import PlayerDetails
+
+class SkillRatingCheckpoint(Base):
+    """How far the Elo-style skill rating engine has read completed games.
+
+    Games are consumed in (end_at, id) order; the checkpoint stores the
+    last game processed so each run only touches games that ended since.
+    Keying on the end keeps a long game that started before a shorter one
+    but ended after it from falling behind the checkpoint.
+    """
+    INITIAL_RATING = 1500.0
+    K_FACTOR = 32
+    RESULT_SCORES = {
+        'WIN': 1.0,
+        'DRAW': 0.5,
+        'LOSE': 0.0,
+    }
+    OPPONENT_RESULTS = {
+        'WIN': 'LOSE',
+        'LOSE': 'WIN',
+    }
+
+    name = models.CharField(max_length=50, unique=True, default='elo')
+    last_end_at = models.DateTimeField(null=True, blank=True)
+    last_game_id = models.UUIDField(null=True, blank=True)
+    games_processed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} checkpoint at {self.last_end_at}"
+
+    @classmethod
+    def rate_game(cls, results, ratings):
+        """Rating changes for one game.
+
+        `results` maps player id to WIN/LOSE/DRAW and `ratings` maps player id
+        to current rating. Each player is scored against the mean rating of
+        the players who reported the opposite result; draws (and one-sided
+        games) are scored against everyone else in the game.
+        """
+        players_by_result = defaultdict(list)
+        for player_id, result in results.items():
+            players_by_result[result].append(player_id)
+
+        changes = {}
+        for player_id, result in results.items():
+            opponents = players_by_result.get(cls.OPPONENT_RESULTS.get(result))
+            if not opponents:
+                opponents = [other for other in results if other != player_id]
+            if not opponents:
+                continue
+            opponent_rating = sum(ratings[other] for other in opponents) / len(opponents)
+            expected = 1 / (1 + 10 ** ((opponent_rating - ratings[player_id]) / 400))
+            changes[player_id] = cls.K_FACTOR * (cls.RESULT_SCORES[result] - expected)
+        return changes
+
+    @classmethod
+    def process_games(cls, batch_size=200, settle=timedelta(hours=48), replay=False, now=None):
+        """Apply every completed game past the checkpoint; returns games processed.
+
+        Only games that ended at least `settle` ago are read, giving
+        organizers time to verify results first. Eligibility comes from
+        end_at rather than the stored status, which may not have been
+        updated yet; canceled games are skipped. Games are read in keyset
+        batches and each batch commits together with the checkpoint, so
+        memory stays bounded and an interrupted run resumes where it stopped.
+        `replay` resets every rating and the checkpoint first.
+        """
+        now = now or timezone.now()
+        if replay:
+            with transaction.atomic():
+                PlayerDetails.objects.update(skill_rating=cls.INITIAL_RATING, rated_games=0)
+                cls.objects.filter(name='elo').update(
+                    last_end_at=None, last_game_id=None, games_processed=0,
+                )
+
+        processed = 0
+        while True:
+            with transaction.atomic():
+                checkpoint, _ = cls.objects.select_for_update().get_or_create(name='elo')
+                games = Game.objects.filter(end_at__lte=now - settle).exclude(status='CANCELED')
+                if checkpoint.last_end_at is not None:
+                    games = games.filter(
+                        models.Q(end_at__gt=checkpoint.last_end_at)
+                        | models.Q(end_at=checkpoint.last_end_at, id__gt=checkpoint.last_game_id)
+                    )
+                batch = list(games.order_by('end_at', 'id').values_list('id', 'end_at')[:batch_size])
+                if not batch:
+                    break
+
+                cls.apply_batch([game_id for game_id, _ in batch])
+                checkpoint.last_game_id, checkpoint.last_end_at = batch[-1]
+                checkpoint.games_processed += len(batch)
+                checkpoint.save()
+            processed += len(batch)
+        return processed
+
+    @classmethod
+    def apply_batch(cls, game_ids):
+        """Rate `game_ids` in the given order and store the new ratings"""
+        results_by_game = defaultdict(dict)
+        ratings = GameRating.objects.filter(
+            game_id__in=game_ids,
+            verification_status='VERIFIED',
+        ).order_by('created_at').values_list('game_id', 'player_id', 'result')
+        for game_id, player_id, result in ratings.iterator():
+            # A player's latest verified rating for a game wins
+            results_by_game[game_id][player_id] = result
+
+        player_ids = {player_id for results in results_by_game.values() for player_id in results}
+        if not player_ids:
+            return
+        PlayerDetails.objects.bulk_create(
+            [PlayerDetails(player_id=player_id) for player_id in player_ids],
+            ignore_conflicts=True,
+        )
+        details = {
+            d.player_id: d
+            for d in PlayerDetails.objects.filter(player_id__in=player_ids).only(
+                'id', 'player_id', 'skill_rating', 'rated_games',
+            )
+        }
+
+        for game_id in game_ids:
+            results = results_by_game.get(game_id)
+            if not results:
+                continue
+            current = {player_id: details[player_id].skill_rating for player_id in results}
+            for player_id, change in cls.rate_game(results, current).items():
+                details[player_id].skill_rating += change
+                details[player_id].rated_games += 1
+
+        PlayerDetails.objects.bulk_update(details.values(), ['skill_rating', 'rated_games'])
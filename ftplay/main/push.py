@@ -0,0 +1,210 @@
+"""Push delivery from the PushMessage outbox.
+
+Notification.create_batch() queues a PushMessage per notification whose
+recipient has an fcm_token. deliver_batch() claims due messages, groups
+those with the same payload into multicasts of up to the transport's
+limit, and sends them through the transport named by the PUSH_TRANSPORT
+setting. Each token's outcome is one of:
+
+- SENT: done.
+- RETRY: a transient failure, tried again after an exponential backoff
+  until main.leases.MAX_ATTEMPTS.
+- DEAD: the provider no longer knows the token. It is cleared from every
+  Player/Organizer holding it and its other queued messages are dropped.
+
+Transports take (payload, tokens) and return {token: (outcome, error)};
+tokens missing from the result are retried.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import leases
+from .models import Organizer, Player, PushMessage
+
+logger = logging.getLogger(__name__)
+
+SENT = 'SENT'
+RETRY = 'RETRY'
+DEAD = 'DEAD'
+
+DEFAULT_TRANSPORT = 'main.push.LogTransport'
+
+
+class LogTransport:
+    """Writes each multicast as a JSON line to PUSH_LOG_FILE, or the log, and reports every token sent"""
+    # FCM's multicast limit
+    multicast_limit = 500
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, 'PUSH_LOG_FILE', None)
+
+    def send(self, payload, tokens):
+        line = json.dumps({'payload': payload, 'tokens': tokens}, sort_keys=True)
+        if self.path:
+            with open(self.path, 'a') as log_file:
+                log_file.write(line + '\n')
+        else:
+            logger.info('push %s', line)
+        return {token: (SENT, '') for token in tokens}
+
+
+def get_transport():
+    """Instance of the transport class named by PUSH_TRANSPORT"""
+    return import_string(getattr(settings, 'PUSH_TRANSPORT', DEFAULT_TRANSPORT))()
+
+
+@dataclass
+class BatchStats:
+    claimed: int = 0
+    multicasts: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    dead: int = 0
+    tokens_pruned: int = 0
+    seconds: float = 0.0
+    send_seconds: float = 0.0
+
+    @property
+    def per_second(self):
+        return self.claimed / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'claimed': self.claimed,
+            'multicasts': self.multicasts,
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'dead': self.dead,
+            'tokens_pruned': self.tokens_pruned,
+            'seconds': round(self.seconds, 3),
+            'send_seconds': round(self.send_seconds, 3),
+            'per_second': round(self.per_second, 1),
+        }
+
+
+def claim_batch(batch_size, now):
+    """Lease up to `batch_size` due messages to this worker"""
+    return leases.claim_batch(
+        PushMessage.objects.filter(status=PushMessage.STATUS_PENDING).only(
+            'id', 'token', 'title', 'body', 'data', 'attempts', 'next_attempt_at',
+        ),
+        batch_size,
+        now,
+    )
+
+
+def group_multicasts(messages, limit):
+    """[(payload, {token: [messages]})] with at most `limit` tokens per multicast"""
+    by_payload = defaultdict(dict)
+    for message in messages:
+        payload = json.dumps(
+            {'title': message.title, 'body': message.body, 'data': message.data}, sort_keys=True
+        )
+        by_payload[payload].setdefault(message.token, []).append(message)
+
+    multicasts = []
+    for payload, by_token in by_payload.items():
+        tokens = list(by_token)
+        for start in range(0, len(tokens), limit):
+            multicasts.append((
+                json.loads(payload),
+                {token: by_token[token] for token in tokens[start:start + limit]},
+            ))
+    return multicasts
+
+
+def prune_dead_tokens(tokens):
+    """Clear dead tokens from their owners and drop their queued messages; returns owners cleared"""
+    pruned = 0
+    for model in (Player, Organizer):
+        pruned += model.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+    PushMessage.objects.filter(
+        token__in=tokens, status=PushMessage.STATUS_PENDING,
+    ).update(status=PushMessage.STATUS_DEAD_TOKEN)
+    return pruned
+
+
+def record_outcomes(outcomes, now, stats):
+    """Apply {message: (outcome, error)} with one UPDATE per distinct result.
+
+    Each UPDATE only matches messages still pending under the lease they
+    were claimed with, so a worker whose lease ran out mid-send never
+    overwrites the outcome recorded by the worker that took them over.
+    """
+    sent, dead, retry = defaultdict(list), defaultdict(list), defaultdict(list)
+    for message, (outcome, error) in outcomes.items():
+        if outcome == SENT:
+            sent[message.next_attempt_at].append(message)
+        elif outcome == DEAD:
+            dead[message.next_attempt_at].append(message)
+        else:
+            retry[(message.next_attempt_at, message.attempts + 1, error)].append(message)
+
+    pending = PushMessage.objects.filter(status=PushMessage.STATUS_PENDING)
+
+    def held(lease, messages):
+        return pending.filter(pk__in=[message.pk for message in messages], next_attempt_at=lease)
+
+    for lease, messages in sent.items():
+        stats.sent += held(lease, messages).update(
+            status=PushMessage.STATUS_SENT, sent_at=now, attempts=models.F('attempts') + 1,
+        )
+
+    for (lease, attempts, error), messages in retry.items():
+        if attempts >= leases.MAX_ATTEMPTS:
+            stats.failed += held(lease, messages).update(
+                status=PushMessage.STATUS_FAILED, attempts=attempts, last_error=error,
+            )
+        else:
+            stats.retried += held(lease, messages).update(
+                attempts=attempts, last_error=error, next_attempt_at=now + leases.get_backoff(attempts),
+            )
+
+    for lease, messages in dead.items():
+        stats.dead += held(lease, messages).update(
+            status=PushMessage.STATUS_DEAD_TOKEN, attempts=models.F('attempts') + 1,
+        )
+    if dead:
+        stats.tokens_pruned += prune_dead_tokens({
+            message.token for messages in dead.values() for message in messages
+        })
+
+
+def deliver_batch(transport=None, batch_size=1000, now=None):
+    """Claim, send and record one batch of due messages; returns its BatchStats"""
+    transport = transport or get_transport()
+    started = time.monotonic()
+    now = now or timezone.now()
+    stats = BatchStats()
+
+    messages = claim_batch(batch_size, now)
+    stats.claimed = len(messages)
+    outcomes = {}
+    for payload, by_token in group_multicasts(messages, transport.multicast_limit):
+        stats.multicasts += 1
+        send_started = time.monotonic()
+        try:
+            results = transport.send(payload, list(by_token))
+        except Exception as exc:
+            logger.exception('Push multicast failed')
+            results = {token: (RETRY, str(exc)) for token in by_token}
+        stats.send_seconds += time.monotonic() - send_started
+        for token, token_messages in by_token.items():
+            result = results.get(token, (RETRY, 'No result from transport'))
+            for message in token_messages:
+                outcomes[message] = result
+
+    with transaction.atomic():
+        record_outcomes(outcomes, now, stats)
+    stats.seconds = time.monotonic() - started
+    return stats
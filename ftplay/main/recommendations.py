@@ -0,0 +1,144 @@
+"""Rank upcoming games for a player.
+
+Candidates come from the (geo_cell, start_at) index: only open public
+games in the grid cells around the player and inside the horizon are
+read, capped at MAX_CANDIDATES. Each candidate is scored from distance,
+skill match, start time and fee, and only the requested page is loaded
+as full Game rows.
+"""
+import math
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+from .geo import cells_within, haversine_km
+from .models import Game, PlayerDetails
+
+# Games further away than this are not considered
+RADIUS_KM = 25
+
+# Games starting later than this are not considered
+HORIZON = timedelta(days=14)
+
+MAX_CANDIDATES = 200
+
+# Distance at which the distance score has dropped to about a third
+DISTANCE_SCALE_KM = 10
+
+WEIGHTS = {
+    'distance': 0.4,
+    'skill': 0.25,
+    'start': 0.2,
+    'fee': 0.15,
+}
+
+# Free-form PlayerDetails.skill_level values are matched on these words
+SKILL_TIER_KEYWORDS = [
+    (0, ('begin', 'novice', 'casual', 'new')),
+    (1, ('intermediate', 'amateur', 'average', 'medium')),
+    (2, ('advanced', 'experienced', 'good')),
+    (3, ('pro', 'expert', 'elite')),
+]
+MAX_SKILL_TIER = 3
+
+# Score for a factor that cannot be judged, e.g. no coordinates
+NEUTRAL_SCORE = 0.5
+
+
+def get_skill_tier(skill_level):
+    """Tier 0-3 of a skill_level string, or None when it is not recognized"""
+    if not skill_level:
+        return None
+    skill_level = skill_level.lower()
+    for tier, keywords in SKILL_TIER_KEYWORDS:
+        if any(keyword in skill_level for keyword in keywords):
+            return tier
+    return None
+
+
+def skill_tier_expression(field):
+    """SQL version of get_skill_tier() for aggregating over participants"""
+    return models.Case(
+        *[
+            models.When(**{f'{field}__icontains': keyword}, then=models.Value(float(tier)))
+            for tier, keywords in SKILL_TIER_KEYWORDS
+            for keyword in keywords
+        ],
+        default=None,
+        output_field=models.FloatField(),
+    )
+
+
+def get_candidates(player, latitude=None, longitude=None, now=None):
+    """(id, latitude, longitude, player_fees, start_at) of games the player could join"""
+    now = now or timezone.now()
+    games = Game.objects.filter(
+        status='UPCOMING',
+        visibility='PUBLIC',
+        start_at__gt=now,
+        start_at__lte=now + HORIZON,
+        spots_taken__lt=models.F('number_of_participants'),
+    ).exclude(
+        pk__in=Game.participants.through.objects.filter(player_id=player.pk).values('game_id')
+    )
+    if latitude is not None and longitude is not None:
+        games = games.filter(geo_cell__in=cells_within(latitude, longitude, RADIUS_KM))
+    return list(
+        games.order_by('start_at').values_list(
+            'id', 'latitude', 'longitude', 'player_fees', 'start_at'
+        )[:MAX_CANDIDATES]
+    )
+
+
+def get_game_skill_tiers(game_ids):
+    """Average skill tier of each game's participants, for games that have any"""
+    return dict(
+        Game.participants.through.objects.filter(
+            game_id__in=game_ids,
+        ).annotate(
+            tier=skill_tier_expression('player__details__skill_level'),
+        ).values('game_id').annotate(
+            average=models.Avg('tier'),
+        ).filter(
+            average__isnull=False,
+        ).values_list('game_id', 'average')
+    )
+
+
+def recommend_games(player, latitude=None, longitude=None, now=None):
+    """Candidate games for `player`, best first, as (game_id, score, distance_km)"""
+    now = now or timezone.now()
+    candidates = get_candidates(player, latitude, longitude, now)
+    if not candidates:
+        return []
+
+    details = PlayerDetails.objects.filter(player=player).values_list('skill_level', flat=True).first()
+    player_tier = get_skill_tier(details)
+    game_tiers = get_game_skill_tiers([row[0] for row in candidates]) if player_tier is not None else {}
+    max_fee = max(float(row[3]) for row in candidates)
+    horizon_seconds = HORIZON.total_seconds()
+
+    ranked = []
+    for game_id, game_latitude, game_longitude, fee, start_at in candidates:
+        distance = None
+        if None not in (latitude, longitude, game_latitude, game_longitude):
+            distance = haversine_km(latitude, longitude, game_latitude, game_longitude)
+            if distance > RADIUS_KM:
+                continue
+
+        game_tier = game_tiers.get(game_id)
+        scores = {
+            'distance': NEUTRAL_SCORE if distance is None else math.exp(-distance / DISTANCE_SCALE_KM),
+            'skill': (
+                NEUTRAL_SCORE if game_tier is None
+                else 1 - abs(player_tier - game_tier) / MAX_SKILL_TIER
+            ),
+            'start': 1 - (start_at - now).total_seconds() / horizon_seconds,
+            'fee': 1 - float(fee) / max_fee if max_fee > 0 else 1,
+        }
+        score = sum(WEIGHTS[factor] * value for factor, value in scores.items())
+        ranked.append((game_id, round(score, 4), None if distance is None else round(distance, 2)))
+
+    ranked.sort(key=lambda item: (-item[1], str(item[0])))
+    return ranked
@@ -0,0 +1,182 @@
+"""Full-text search over games.
+
+Game.search_document holds the searchable text (title, rules and venue
+names) and is rebuilt on save. Each backend indexes it natively:
+
+- PostgreSQL: a tsvector column main_game.search_vector, kept in sync
+  with search_document by a trigger, with a GIN index.
+- SQLite: an external-content FTS5 table main_game_fts, kept in sync
+  with main_game by triggers.
+
+The PostgreSQL column and trigger are added by migration 0011_game_search
+and the index is built concurrently by 0012 once the backfill has filled
+the column. SQLite rebuilds main_game (dropping its triggers and
+renumbering rows) on many schema changes, so the FTS5 table is instead
+checked after every migrate by ensure_sqlite_search_index().
+"""
+import re
+import unicodedata
+
+# Venue detail keys whose values are searched
+VENUE_NAME_KEY = re.compile(r'name|title|venue', re.IGNORECASE)
+
+SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+
+# Terms beyond this are ignored
+MAX_SEARCH_TERMS = 10
+
+SQLITE_SEARCH_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS main_game_fts USING fts5(
+        search_document, content='main_game', content_rowid='rowid',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_game_fts_insert AFTER INSERT ON main_game BEGIN
+        INSERT INTO main_game_fts(rowid, search_document)
+        VALUES (new.rowid, new.search_document);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_game_fts_delete AFTER DELETE ON main_game BEGIN
+        INSERT INTO main_game_fts(main_game_fts, rowid, search_document)
+        VALUES ('delete', old.rowid, old.search_document);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS main_game_fts_update AFTER UPDATE OF search_document ON main_game BEGIN
+        INSERT INTO main_game_fts(main_game_fts, rowid, search_document)
+        VALUES ('delete', old.rowid, old.search_document);
+        INSERT INTO main_game_fts(rowid, search_document)
+        VALUES (new.rowid, new.search_document);
+    END
+    """,
+]
+
+
+def ensure_sqlite_search_index(connection):
+    """Create the FTS5 table and triggers if missing, reindexing when they were.
+
+    Returns True when the index had to be rebuilt.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        table_names = connection.introspection.table_names(cursor)
+        if 'main_game' not in table_names:
+            return False
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'main_game_fts_%'"
+        )
+        if 'main_game_fts' in table_names and cursor.fetchone()[0] == 3:
+            return False
+        for statement in SQLITE_SEARCH_SCHEMA:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO main_game_fts(main_game_fts) VALUES ('rebuild')")
+    return True
+
+
+def get_venue_names(venue_details):
+    """Name-like strings from the free-form venue_details JSON"""
+    if isinstance(venue_details, str):
+        return [venue_details]
+    names = []
+    if isinstance(venue_details, dict):
+        for key, value in venue_details.items():
+            if isinstance(value, str) and VENUE_NAME_KEY.search(str(key)):
+                names.append(value)
+            elif isinstance(value, (dict, list)):
+                names.extend(get_venue_names(value))
+    elif isinstance(venue_details, list):
+        for item in venue_details:
+            names.extend(get_venue_names(item))
+    return names
+
+
+def build_search_document(title, game_rules, venue_details):
+    """Text indexed for a game"""
+    parts = [title or '', *get_venue_names(venue_details), game_rules or '']
+    return '\n'.join(part.strip() for part in parts if part and part.strip())
+
+
+def get_search_terms(query):
+    """Words of a user query, with any search syntax stripped"""
+    return SEARCH_TERM.findall(query or '')[:MAX_SEARCH_TERMS]
+
+
+def get_search_sql(vendor, terms):
+    """(tables, where, rank_sql, params) selecting and ranking games matching all `terms`.
+
+    `tables` are joined to main_game and `where` filters it to matches;
+    rank_sql is higher for better matches. `params` fill the placeholders
+    of both `where` and rank_sql.
+    """
+    if vendor == 'postgresql':
+        query = ' & '.join(terms)
+        where = ["main_game.search_vector @@ to_tsquery('english', %s)"]
+        rank_sql = "ts_rank(main_game.search_vector, to_tsquery('english', %s))"
+        return [], where, rank_sql, [query]
+
+    # FTS5: quoted terms are taken literally and joined with AND
+    query = ' '.join('"%s"' % term for term in terms)
+    where = [
+        'main_game_fts.rowid = main_game.rowid',
+        'main_game_fts MATCH %s',
+    ]
+    # The FTS5 rank column is bm25(), which is lower for better matches
+    return ['main_game_fts'], where, '-main_game_fts.rank', [query]
+
+
+# Words of a suggestion it can be completed from, e.g. "Model Town Arena"
+# is offered for "mod", "tow" and "are"
+MAX_SUGGESTION_WORDS = 8
+
+MAX_SUGGESTION_LENGTH = 255
+
+# Prefixes up to this long have their top suggestions counted ahead of time
+MAX_SUGGESTION_PREFIX_LENGTH = 10
+
+
+def normalize_suggestion(text):
+    """Case-, accent- and spacing-insensitive form of a suggestion or prefix"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(SEARCH_TERM.findall(text.casefold()))
+
+
+def get_suggestion_keys(title, venue_details):
+    """{(text, key)} to index for a game, where each key is a prefix-searchable suffix of text"""
+    keys = set()
+    for text in [title or '', *get_venue_names(venue_details)]:
+        text = ' '.join(text.split())[:MAX_SUGGESTION_LENGTH]
+        words = normalize_suggestion(text).split(' ')
+        for start in range(min(len(words), MAX_SUGGESTION_WORDS)):
+            key = ' '.join(words[start:])
+            if key:
+                keys.add((text, key[:MAX_SUGGESTION_LENGTH]))
+    return keys
+
+
+def get_suggestion_prefixes(keys):
+    """{(prefix, text)} for every prefix up to MAX_SUGGESTION_PREFIX_LENGTH of each (text, key)"""
+    return {
+        (key[:length], text)
+        for text, key in keys
+        for length in range(1, min(len(key), MAX_SUGGESTION_PREFIX_LENGTH) + 1)
+        # A normalized prefix never ends in a space
+        if key[length - 1] != ' '
+    }
+
+
+def get_prefix_filter(vendor, field, prefix):
+    """Filter kwargs matching values of `field` starting with `prefix` from an index.
+
+    PostgreSQL serves LIKE 'prefix%' from a varchar_pattern_ops index;
+    elsewhere (SQLite's LIKE never uses an index) an equivalent range
+    under binary collation is used.
+    """
+    if vendor == 'postgresql':
+        return {f'{field}__startswith': prefix}
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return {f'{field}__gte': prefix, f'{field}__lt': upper}
@@ -1,3 +1,1528 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from . import leases, push
+from .api.serializers.game import GameCreateSerializer, GameUpdateSerializer
+from .api.serializers.player import PlayerProfileSerializer, PlayerProfileUpdateSerializer
+from .management.commands.update_game_statuses import Command as UpdateGameStatusesCommand
+from .models import (
+    Game, GameRating, GameSuggestion, GameSuggestionPrefix, LeaderboardEntry, Notification, NotificationEvent,
+    Organizer, Player, PlayerDetails, PushMessage, SkillRatingCheckpoint,
+)
+from .models.game import StatusTransition
+from .models.user import CustomUser
+
+
+def create_organizer(name):
+    user = CustomUser.objects.create(username=name, email=f'{name}@example.com')
+    return Organizer.objects.create(user=user, name=name)
+
+
+def create_player(name):
+    user = CustomUser.objects.create(username=name, email=f'{name}@example.com')
+    return Player.objects.create(user=user, name=name)
+
+
+def create_game(organizer, start, **kwargs):
+    defaults = {
+        'title': 'Sunday 5-a-side',
+        'images': [],
+        'time': start,
+        'date': start.date(),
+        'venue_details': [],
+        'number_of_participants': 10,
+        'player_fees': 0,
+        'game_rules': 'No slide tackles',
+        'visibility': 'PUBLIC',
+    }
+    defaults.update(kwargs)
+    return Game.objects.create(organizer=organizer, **defaults)
+
+
+class GameListQueryBudgetTests(TestCase):
+    # Role lookup, page query, participants prefetch
+    QUERY_BUDGET = 3
+    # Players also load their joined game ids when the cache is cold
+    PLAYER_QUERY_BUDGET = QUERY_BUDGET + 1
+
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.players = [create_player(f'player{i}') for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer.user)
+
+    def create_games(self, count):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(count):
+            game = create_game(self.organizer, start + timedelta(hours=i))
+            game.participants.add(*self.players[:i % len(self.players) + 1])
+
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()['results']
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        self.create_games(2)
+        small_count, small_results = self.count_list_queries('/api/games/')
+        self.create_games(30)
+        large_count, large_results = self.count_list_queries('/api/games/')
+
+        self.assertEqual(len(small_results), 2)
+        self.assertEqual(len(large_results), 32)
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, self.QUERY_BUDGET)
+
+    def test_my_games_reports_participant_counts(self):
+        self.create_games(3)
+        query_count, results = self.count_list_queries('/api/games/my_games/')
+
+        self.assertLessEqual(query_count, self.QUERY_BUDGET)
+        self.assertEqual(sorted(game['participants_count'] for game in results), [1, 2, 3])
+        for game in results:
+            self.assertEqual(len(game['participants']), game['participants_count'])
+
+    def test_joined_games_count_includes_other_participants(self):
+        self.create_games(3)
+        self.client.force_authenticate(self.players[0].user)
+        query_count, results = self.count_list_queries('/api/games/joined_games/')
+
+        self.assertLessEqual(query_count, self.PLAYER_QUERY_BUDGET)
+        self.assertEqual(sorted(game['participants_count'] for game in results), [1, 2, 3])
+        self.assertTrue(all(game['is_joined'] for game in results))
+
+        warm_count, _ = self.count_list_queries('/api/games/joined_games/')
+        self.assertLessEqual(warm_count, self.QUERY_BUDGET)
+
+
+class GameStatusTransitionTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        now = timezone.now()
+        # Durations are in minutes; the default is 120
+        self.upcoming = create_game(self.organizer, now + timedelta(hours=2), title='Upcoming')
+        self.started = create_game(self.organizer, now - timedelta(minutes=30), title='Started')
+        self.ended = create_game(self.organizer, now - timedelta(hours=3), title='Ended')
+        self.ongoing_ended = create_game(self.organizer, now - timedelta(hours=3), title='Ongoing ended')
+        Game.objects.filter(pk=self.ongoing_ended.pk).update(status='ONGOING')
+        self.canceled = create_game(self.organizer, now - timedelta(hours=3), title='Canceled')
+        Game.objects.filter(pk=self.canceled.pk).update(status='CANCELED')
+
+    def test_compute_status_transitions(self):
+        transitions = set(Game.compute_status_transitions())
+        self.assertEqual(transitions, {
+            StatusTransition(self.started.pk, 'UPCOMING', 'ONGOING'),
+            StatusTransition(self.ended.pk, 'UPCOMING', 'COMPLETED'),
+            StatusTransition(self.ongoing_ended.pk, 'ONGOING', 'COMPLETED'),
+        })
+
+    def test_apply_reports_only_games_still_in_their_old_status(self):
+        transitions = Game.compute_status_transitions()
+        # Canceled between computing and applying
+        Game.objects.filter(pk=self.started.pk).update(status='CANCELED')
+
+        applied = Game.apply_status_transitions(transitions)
+
+        self.assertEqual({t.game_id for t in applied}, {self.ended.pk, self.ongoing_ended.pk})
+        self.assertEqual(Game.objects.get(pk=self.started.pk).status, 'CANCELED')
+        self.assertEqual(Game.objects.get(pk=self.ended.pk).status, 'COMPLETED')
+
+    def test_update_all_game_statuses_is_idempotent(self):
+        self.assertEqual(len(Game.update_all_game_statuses()), 3)
+        self.assertEqual(Game.update_all_game_statuses(), [])
+
+    def test_effective_status_matches_filters(self):
+        games = Game.objects.with_effective_status()
+        self.assertEqual(
+            dict(games.values_list('title', 'effective_status')),
+            {
+                'Upcoming': 'UPCOMING',
+                'Started': 'ONGOING',
+                'Ended': 'COMPLETED',
+                'Ongoing ended': 'COMPLETED',
+                'Canceled': 'CANCELED',
+            },
+        )
+        for status in ('UPCOMING', 'ONGOING', 'COMPLETED', 'CANCELED'):
+            self.assertEqual(
+                set(games.filter_effective_status(status).values_list('pk', flat=True)),
+                set(games.filter(effective_status=status).values_list('pk', flat=True)),
+                status,
+            )
+
+    def test_rating_checks_the_effective_status_without_writing_it(self):
+        player = create_player('player')
+        client = APIClient()
+        client.force_authenticate(player.user)
+
+        def rate(game):
+            data = {'result': 'WIN', 'game': str(game.pk), 'player': str(player.pk)}
+            return client.post(f'/api/games/{game.pk}/rate/', data, format='json')
+
+        self.assertEqual(rate(self.started).status_code, 400)
+        self.assertEqual(rate(self.ended).status_code, 201)
+        self.assertEqual(Game.objects.get(pk=self.ended.pk).status, 'UPCOMING')
+
+
+class UpdateGameStatusesReportTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        now = timezone.now()
+        create_game(organizer, now + timedelta(hours=2))
+        create_game(organizer, now - timedelta(minutes=30))
+        create_game(organizer, now - timedelta(hours=3))
+        self.ongoing = create_game(organizer, now - timedelta(minutes=10))
+        Game.objects.filter(pk=self.ongoing.pk).update(status='ONGOING')
+
+    def report(self, *args):
+        out = StringIO()
+        call_command('update_game_statuses', '--json', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_dry_run_and_apply_report_the_same_scan(self):
+        planned = self.report('--dry-run')
+        applied = self.report()
+
+        for report in (planned, applied):
+            self.assertEqual(report['rows_scanned'], 2)
+            self.assertEqual(report['updated'], 2)
+            self.assertEqual(report['transitions'], {
+                'UPCOMING->ONGOING': 1, 'UPCOMING->COMPLETED': 1, 'ONGOING->COMPLETED': 0,
+            })
+        self.assertTrue(planned['dry_run'])
+        self.assertFalse(applied['dry_run'])
+        self.assertEqual(applied['status_summary'], {'UPCOMING': 1, 'ONGOING': 2, 'COMPLETED': 1})
+        self.assertEqual(self.report()['rows_scanned'], 0)
+
+
+class GameStatusDaemonTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.command = UpdateGameStatusesCommand(stdout=StringIO())
+        self.now = timezone.now()
+        self.soon = create_game(self.organizer, self.now + timedelta(minutes=10), duration=60)
+        self.later = create_game(self.organizer, self.now + timedelta(days=2))
+
+    def test_load_transition_instants_covers_the_window(self):
+        heap = self.command.load_transition_instants(self.now, self.now + timedelta(hours=2))
+        self.assertEqual(
+            sorted(heap),
+            [(self.soon.start_at, self.soon.pk), (self.soon.end_at, self.soon.pk)],
+        )
+
+    def test_apply_due_transitions(self):
+        self.assertEqual(self.command.apply_due_transitions(self.now, verbose=False), [])
+        applied = self.command.apply_due_transitions(self.now + timedelta(minutes=15), verbose=False)
+        self.assertEqual(applied, [StatusTransition(self.soon.pk, 'UPCOMING', 'ONGOING')])
+        self.assertEqual(Game.objects.get(pk=self.soon.pk).status, 'ONGOING')
+
+    def test_changed_games_are_picked_up_between_resyncs(self):
+        seen = {}
+        since = self.command.latest_change()
+        instants, since = self.command.load_changed_instants(since, self.now + timedelta(hours=2), seen)
+        # The first poll overlaps the resync; later polls skip games already handled
+        self.assertEqual(len(instants), 2)
+        instants, since = self.command.load_changed_instants(since, self.now + timedelta(hours=2), seen)
+        self.assertEqual(instants, [])
+
+        # Rescheduled into the window, and a new near-term game
+        self.later.date = self.now.date()
+        self.later.time = self.now + timedelta(minutes=5)
+        self.later.save()
+        new_game = create_game(self.organizer, self.now + timedelta(minutes=20))
+
+        instants, _ = self.command.load_changed_instants(since, self.now + timedelta(hours=2), seen)
+        self.assertIn((self.later.start_at, self.later.pk), instants)
+        self.assertIn((new_game.start_at, new_game.pk), instants)
+
+
+class GameScheduleValidationTests(TestCase):
+    def payload(self, region, offset):
+        local = timezone.now().astimezone(zoneinfo.ZoneInfo(region)) + offset
+        return {
+            'title': 'Late kickoff',
+            'images': [],
+            'time': local.isoformat(),
+            'date': local.date().isoformat(),
+            'region': region,
+            'venue_details': [],
+            'number_of_participants': 10,
+            'player_fees': 0,
+            'game_rules': 'No slide tackles',
+            'visibility': 'PUBLIC',
+        }
+
+    def test_start_is_checked_in_the_game_region(self):
+        # UTC+14 and UTC-11, so the region's date is a day off the server's for much of the day
+        past = GameCreateSerializer(data=self.payload('Pacific/Kiritimati', -timedelta(hours=1)))
+        self.assertFalse(past.is_valid())
+        future = GameCreateSerializer(data=self.payload('Pacific/Pago_Pago', timedelta(hours=1)))
+        self.assertTrue(future.is_valid(), future.errors)
+
+    def test_update_uses_the_stored_region(self):
+        organizer = create_organizer('organizer')
+        game = create_game(organizer, timezone.now() + timedelta(days=2), region='Pacific/Kiritimati')
+        local = timezone.now().astimezone(zoneinfo.ZoneInfo('Pacific/Kiritimati')) - timedelta(hours=1)
+        serializer = GameUpdateSerializer(
+            game, data={'date': local.date().isoformat(), 'time': local.isoformat()}, partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+
+
+class GameJoinTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.game = create_game(
+            self.organizer, timezone.now() + timedelta(days=1), number_of_participants=2
+        )
+        self.players = [create_player(f'player{i}') for i in range(3)]
+
+    def join(self, player):
+        client = APIClient()
+        client.force_authenticate(player.user)
+        return client.post(f'/api/games/{self.game.pk}/join/')
+
+    def leave(self, player):
+        client = APIClient()
+        client.force_authenticate(player.user)
+        return client.post(f'/api/games/{self.game.pk}/leave/')
+
+    def test_join_stops_at_capacity(self):
+        self.assertEqual(self.join(self.players[0]).status_code, 200)
+        self.assertEqual(self.join(self.players[1]).status_code, 200)
+        response = self.join(self.players[2])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Game is full')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spots_taken, 2)
+        self.assertEqual(self.game.participants.count(), 2)
+
+    def test_duplicate_join_does_not_take_a_spot(self):
+        self.join(self.players[0])
+        response = self.join(self.players[0])
+
+        self.assertEqual(response.json()['error'], 'Already joined this game')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spots_taken, 1)
+
+    def test_leave_frees_the_spot(self):
+        self.join(self.players[0])
+        self.join(self.players[1])
+        self.assertEqual(self.leave(self.players[0]).status_code, 200)
+        self.assertEqual(self.leave(self.players[0]).json()['error'], 'Not joined this game')
+        self.assertEqual(self.join(self.players[2]).status_code, 200)
+
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spots_taken, 2)
+        self.assertEqual(
+            set(self.game.participants.values_list('pk', flat=True)),
+            {self.players[1].pk, self.players[2].pk},
+        )
+
+    def test_cannot_join_started_game(self):
+        started = create_game(self.organizer, timezone.now() - timedelta(minutes=10))
+        client = APIClient()
+        client.force_authenticate(self.players[0].user)
+        response = client.post(f'/api/games/{started.pk}/join/')
+
+        self.assertEqual(response.json()['error'], 'Game is not open for joining')
+
+    def test_saving_a_stale_instance_keeps_the_spot_counter(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        self.join(self.players[0])
+        self.join(self.players[1])
+        stale.title = 'Renamed'
+        stale.save()
+
+        self.assertEqual(self.join(self.players[2]).json()['error'], 'Game is full')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.title, 'Renamed')
+        self.assertEqual(self.game.spots_taken, 2)
+
+    def test_update_rechecks_capacity_against_joins_on_a_stale_instance(self):
+        self.game.number_of_participants = 3
+        self.game.save(update_fields=['number_of_participants'])
+        stale = Game.objects.get(pk=self.game.pk)
+        self.join(self.players[0])
+        self.join(self.players[1])
+        serializer = GameUpdateSerializer(stale, data={'number_of_participants': 1}, partial=True)
+        self.assertTrue(serializer.is_valid())
+
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.number_of_participants, 3)
+        self.assertEqual(self.game.spots_taken, 2)
+
+    def test_cancel_keeps_the_spot_counter(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        self.join(self.players[0])
+        client = APIClient()
+        client.force_authenticate(self.organizer.user)
+        self.assertEqual(client.post(f'/api/games/{stale.pk}/cancel/').status_code, 200)
+
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.status, 'CANCELED')
+        self.assertEqual(self.game.spots_taken, 1)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class GameJoinConcurrencyTests(TransactionTestCase):
+    # Needs a database with row-level locking (PostgreSQL); SQLite serializes writers.
+    # Throughput under the same load is reported by the benchmark_joins command.
+    PLAYERS = 60
+    CAPACITY = 22
+    WORKERS = 16
+
+    def test_parallel_joins_never_overfill(self):
+        organizer = create_organizer('organizer')
+        game = create_game(
+            organizer, timezone.now() + timedelta(days=1),
+            number_of_participants=self.CAPACITY,
+        )
+        players = [create_player(f'player{i}') for i in range(self.PLAYERS)]
+
+        def join(player):
+            try:
+                return Game.objects.get(pk=game.pk).add_participant(player)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            outcomes = list(executor.map(join, players))
+
+        game.refresh_from_db()
+        self.assertEqual(outcomes.count(Game.JOINED), self.CAPACITY)
+        self.assertEqual(outcomes.count(Game.FULL), self.PLAYERS - self.CAPACITY)
+        self.assertEqual(game.spots_taken, self.CAPACITY)
+        self.assertEqual(game.participants.count(), self.CAPACITY)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class GameWaitlistConcurrencyTests(TransactionTestCase):
+    # Needs row-level locking (PostgreSQL); SQLite serializes writers
+    ROUNDS = 20
+
+    def test_leave_racing_join_waitlist_never_strands_a_player(self):
+        organizer = create_organizer('organizer')
+        for round_number in range(self.ROUNDS):
+            game = create_game(
+                organizer, timezone.now() + timedelta(days=1), number_of_participants=1
+            )
+            leaver = create_player(f'leaver{round_number}')
+            waiter = create_player(f'waiter{round_number}')
+            game.add_participant(leaver)
+
+            def run(call):
+                try:
+                    return call()
+                finally:
+                    connections.close_all()
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                left = executor.submit(run, lambda: Game.objects.get(pk=game.pk).remove_participant(leaver))
+                queued = executor.submit(run, lambda: Game.objects.get(pk=game.pk).add_to_waitlist(waiter)[0])
+                left.result(), queued.result()
+
+            game.refresh_from_db()
+            # Either the waiter saw the free spot, or it was promoted into it
+            if queued.result() == Game.WAITLISTED:
+                self.assertEqual(set(game.participants.values_list('pk', flat=True)), {waiter.pk})
+                self.assertFalse(game.waitlist_entries.exists())
+            else:
+                self.assertEqual(queued.result(), Game.SPOTS_AVAILABLE)
+                self.assertEqual(game.spots_taken, 0)
+
+
+class GameWaitlistTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.game = create_game(
+            self.organizer, timezone.now() + timedelta(days=1), number_of_participants=1
+        )
+        self.players = [create_player(f'player{i}') for i in range(3)]
+
+    def post(self, user, action):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f'/api/games/{self.game.pk}/{action}/')
+
+    def position(self, player):
+        client = APIClient()
+        client.force_authenticate(player.user)
+        return client.get(f'/api/games/{self.game.pk}/waitlist_position/').json().get('position')
+
+    def participant_ids(self):
+        return set(self.game.participants.values_list('pk', flat=True))
+
+    def test_waitlist_only_for_full_games(self):
+        response = self.post(self.players[0].user, 'join_waitlist')
+        self.assertEqual(response.json()['error'], 'Game has open spots, join it directly')
+
+    def test_leave_promotes_first_waiting_player(self):
+        self.post(self.players[0].user, 'join')
+        self.assertEqual(self.post(self.players[1].user, 'join_waitlist').json()['position'], 1)
+        self.assertEqual(self.post(self.players[2].user, 'join_waitlist').json()['position'], 2)
+
+        self.post(self.players[0].user, 'leave')
+
+        self.assertEqual(self.participant_ids(), {self.players[1].pk})
+        self.assertIsNone(self.position(self.players[1]))
+        self.assertEqual(self.position(self.players[2]), 1)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spots_taken, 1)
+
+    def test_join_waitlist_survives_the_entry_leaving_before_the_response(self):
+        self.post(self.players[0].user, 'join')
+        add_to_waitlist = Game.add_to_waitlist
+
+        def add_then_leave(game, player, now=None):
+            result = add_to_waitlist(game, player, now=now)
+            game.remove_from_waitlist(player)
+            return result
+
+        with mock.patch.object(Game, 'add_to_waitlist', add_then_leave):
+            response = self.post(self.players[1].user, 'join_waitlist')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['position'], 1)
+
+    def test_raising_capacity_promotes_waiting_players(self):
+        self.post(self.players[0].user, 'join')
+        self.post(self.players[1].user, 'join_waitlist')
+        self.post(self.players[2].user, 'join_waitlist')
+
+        client = APIClient()
+        client.force_authenticate(self.organizer.user)
+        response = client.patch(
+            f'/api/games/{self.game.pk}/', {'number_of_participants': 3}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.participant_ids(), {p.pk for p in self.players})
+        self.assertFalse(self.game.waitlist_entries.exists())
+
+    def test_leave_waitlist(self):
+        self.post(self.players[0].user, 'join')
+        self.post(self.players[1].user, 'join_waitlist')
+
+        self.assertEqual(self.post(self.players[1].user, 'leave_waitlist').status_code, 200)
+        self.assertEqual(self.post(self.players[1].user, 'leave_waitlist').status_code, 400)
+
+
+class PlayerStatsTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        self.game = create_game(organizer, timezone.now() - timedelta(days=1))
+        self.player = create_player('player')
+
+    def stats(self):
+        details = PlayerDetails.objects.get(player=self.player)
+        return (details.wins, details.draw, details.lose, details.goal, details.assists)
+
+    def test_verifying_and_unverifying_moves_counters(self):
+        rating = GameRating.objects.create(
+            game=self.game, player=self.player, result='WIN', goals=2, assists=1
+        )
+        self.assertFalse(PlayerDetails.objects.filter(player=self.player).exists())
+
+        rating.verification_status = 'VERIFIED'
+        rating.save()
+        self.assertEqual(self.stats(), (1, 0, 0, 2, 1))
+
+        rating.verification_status = 'PENDING'
+        rating.save()
+        self.assertEqual(self.stats(), (0, 0, 0, 0, 0))
+
+    def test_rebuild_player_stats_matches_incremental_counters(self):
+        for result in ['WIN', 'DRAW', 'LOSE', 'WIN']:
+            GameRating.objects.create(
+                game=self.game, player=self.player, result=result,
+                goals=1, assists=2, verification_status='VERIFIED',
+            )
+        incremental = self.stats()
+        PlayerDetails.objects.update(wins=0, draw=0, lose=0, goal=0, assists=0)
+
+        call_command('rebuild_player_stats', stdout=StringIO())
+
+        self.assertEqual(incremental, (2, 1, 1, 4, 8))
+        self.assertEqual(self.stats(), incremental)
+
+    def test_bulk_verify_updates_stats_once_per_rating(self):
+        other = create_player('other')
+        ratings = [
+            GameRating.objects.create(game=self.game, player=player, result='WIN', goals=1)
+            for player in (self.player, other)
+        ]
+        client = APIClient()
+        client.force_authenticate(self.game.organizer.user)
+        url = f'/api/games/{self.game.pk}/verify_ratings/'
+
+        response = client.post(url, {'rating_ids': [str(ratings[0].pk)]}, format='json')
+        self.assertEqual(response.json()['verified'], 1)
+        response = client.post(url, {'all_pending': True}, format='json')
+        self.assertEqual(response.json()['verified'], 1)
+        response = client.post(url, {'all_pending': True}, format='json')
+        self.assertEqual(response.json()['verified'], 0)
+
+        self.assertEqual(self.stats(), (1, 0, 0, 1, 0))
+        self.assertEqual(PlayerDetails.objects.get(player=other).wins, 1)
+        self.assertEqual(self.game.notifications.filter(type='RATING_VERIFIED').count(), 2)
+
+    def test_profile_edits_never_write_the_result_counters(self):
+        GameRating.objects.create(
+            game=self.game, player=self.player, result='WIN', goals=2, verification_status='VERIFIED',
+        )
+        client = APIClient()
+        client.force_authenticate(self.player.user)
+        scores = {
+            'rank_technique_score': 70, 'rank_physical_score': 60,
+            'rank_defense_score': 50, 'rank_attack_score': 40,
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = client.put('/api/player/rank-scores/', scores, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "main_playerdetails"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"wins"', updates[0])
+
+        serializer = PlayerProfileSerializer(self.player, data={'details': {'wins': 9, 'title': 'Keeper'}}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        details = PlayerDetails.objects.get(player=self.player)
+        self.assertEqual((details.title, details.rank_attack_score), ('Keeper', 40))
+        self.assertEqual(self.stats(), (1, 0, 0, 2, 0))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        self.game = create_game(organizer, timezone.now() - timedelta(days=1))
+        self.players = [create_player(f'player{i}') for i in range(3)]
+        PlayerDetails.objects.create(player=self.players[0], location='Lahore')
+        for goals, player in enumerate(self.players):
+            GameRating.objects.create(game=self.game, player=player, result='WIN', goals=goals)
+        GameRating.verify_pending(self.game)
+
+    def get(self, player, url):
+        client = APIClient()
+        client.force_authenticate(player.user)
+        return client.get(url).json()
+
+    def test_top_players_by_goals(self):
+        results = self.get(self.players[0], '/api/leaderboards/?metric=goals')['results']
+        self.assertEqual([entry['goals'] for entry in results], [2, 1, 0])
+
+    def test_my_rank_per_scope(self):
+        self.assertEqual(self.get(self.players[0], '/api/leaderboards/me/?metric=goals')['rank'], 3)
+        url = '/api/leaderboards/me/?metric=goals&period=WEEK&location=lahore'
+        self.assertEqual(self.get(self.players[0], url)['rank'], 1)
+
+    def test_entries_without_games_do_not_count_towards_rank(self):
+        # Left behind when a player's only rating is un-verified
+        LeaderboardEntry.objects.create(
+            board=LeaderboardEntry.board_key(), player=create_player('unverified'), goals=5, games_played=0,
+        )
+        results = self.get(self.players[0], '/api/leaderboards/?metric=goals')['results']
+        self.assertEqual([entry['goals'] for entry in results], [2, 1, 0])
+        self.assertEqual(self.get(self.players[0], '/api/leaderboards/me/?metric=goals')['rank'], 3)
+
+    def test_location_change_moves_entries_to_the_new_board(self):
+        client = APIClient()
+        client.force_authenticate(self.players[0].user)
+        client.put('/api/player/profile/', {'location': 'Karachi'}, format='json')
+
+        boards = set(self.players[0].leaderboard_entries.values_list('board', flat=True))
+        self.assertIn(LeaderboardEntry.board_key('Karachi'), boards)
+        self.assertNotIn(LeaderboardEntry.board_key('Lahore'), boards)
+        url = '/api/leaderboards/me/?metric=goals&location=karachi'
+        self.assertEqual(self.get(self.players[0], url)['goals'], 0)
+
+    def test_rebuild_matches_incremental_entries(self):
+        incremental = set(LeaderboardEntry.objects.values_list('board', 'player_id', 'wins', 'goals'))
+        # A stale board the rebuild has to drop
+        LeaderboardEntry.objects.create(board=LeaderboardEntry.board_key('Multan'), player=self.players[0])
+
+        call_command('rebuild_leaderboards', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            set(LeaderboardEntry.objects.values_list('board', 'player_id', 'wins', 'goals')),
+            incremental,
+        )
+
+
+class SkillRatingTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.winner = create_player('winner')
+        self.loser = create_player('loser')
+
+    def play(self, days_ago, winner, loser):
+        game = create_game(self.organizer, timezone.now() - timedelta(days=days_ago), status='COMPLETED')
+        GameRating.objects.create(game=game, player=winner, result='WIN', verification_status='VERIFIED')
+        GameRating.objects.create(game=game, player=loser, result='LOSE', verification_status='VERIFIED')
+
+    def ratings(self):
+        return [
+            PlayerDetails.objects.get(player=player).skill_rating
+            for player in (self.winner, self.loser)
+        ]
+
+    def test_incremental_runs_match_full_replay(self):
+        self.play(10, self.winner, self.loser)
+        self.play(9, self.winner, self.loser)
+        self.assertEqual(SkillRatingCheckpoint.process_games(), 2)
+        winner, loser = self.ratings()
+        self.assertGreater(winner, SkillRatingCheckpoint.INITIAL_RATING)
+        self.assertAlmostEqual(winner + loser, 2 * SkillRatingCheckpoint.INITIAL_RATING)
+
+        self.play(8, self.loser, self.winner)
+        self.assertEqual(SkillRatingCheckpoint.process_games(), 1)
+        self.assertEqual(SkillRatingCheckpoint.process_games(), 0)
+        incremental = self.ratings()
+
+        self.assertEqual(SkillRatingCheckpoint.process_games(batch_size=1, replay=True), 3)
+        for replayed, expected in zip(self.ratings(), incremental):
+            self.assertAlmostEqual(replayed, expected)
+
+
+    def test_long_game_ending_after_a_later_start_is_rated(self):
+        now = timezone.now()
+        long_game = create_game(self.organizer, now - timedelta(hours=52), duration=300)
+        short_game = create_game(self.organizer, now - timedelta(hours=51), duration=60)
+        # A stale stored status must not hold a game back either
+        Game.objects.filter(pk=short_game.pk).update(status='UPCOMING')
+        for game in (long_game, short_game):
+            GameRating.objects.create(game=game, player=self.winner, result='WIN', verification_status='VERIFIED')
+            GameRating.objects.create(game=game, player=self.loser, result='LOSE', verification_status='VERIFIED')
+
+        # Only the short game has been over for 48 hours
+        self.assertEqual(SkillRatingCheckpoint.process_games(now=now), 1)
+        self.assertEqual(SkillRatingCheckpoint.process_games(now=now + timedelta(hours=3)), 1)
+        self.assertEqual(PlayerDetails.objects.get(player=self.winner).rated_games, 2)
+
+    def test_canceled_games_are_not_rated(self):
+        self.play(10, self.winner, self.loser)
+        Game.objects.update(status='CANCELED')
+        self.assertEqual(SkillRatingCheckpoint.process_games(), 0)
+
+
+class TeamBalanceTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.game = create_game(self.organizer, timezone.now() + timedelta(days=1), number_of_participants=10)
+        for i, score in enumerate([90, 80, 70, 60, 50, 40, 30, 20]):
+            player = create_player(f'player{i}')
+            PlayerDetails.objects.create(
+                player=player,
+                play_position=['Goalkeeper'] if i < 2 else ['Striker'],
+                rank_technique_score=score,
+                rank_physical_score=score,
+                rank_defense_score=score,
+                rank_attack_score=score,
+            )
+            self.game.add_participant(player)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.organizer.user)
+
+    def test_teams_are_even_and_share_goalkeepers(self):
+        response = self.client.get(f'/api/games/{self.game.pk}/balance_teams/')
+        self.assertEqual(response.status_code, 200)
+        teams = response.data['teams']
+        self.assertEqual([len(team['players']) for team in teams], [4, 4])
+        for team in teams:
+            self.assertEqual(sum(1 for p in team['players'] if p['role'] == 'GOALKEEPER'), 1)
+        self.assertLessEqual(response.data['spread'], 10)
+
+    def test_rejects_more_teams_than_participants(self):
+        response = self.client.get(f'/api/games/{self.game.pk}/balance_teams/?teams=9')
+        self.assertEqual(response.status_code, 400)
+
+
+class GameRecommendationTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.player = create_player('player')
+        PlayerDetails.objects.create(player=self.player, skill_level='Intermediate')
+        start = timezone.now() + timedelta(days=2)
+        self.near = create_game(self.organizer, start, location={'lat': 31.52, 'lng': 74.35})
+        self.farther = create_game(self.organizer, start, location=[{'coordinates': [74.45, 31.6]}])
+        self.distant = create_game(self.organizer, start, location={'lat': 33.7, 'lng': 73.1})
+        self.joined = create_game(self.organizer, start, location={'lat': 31.52, 'lng': 74.35})
+        self.joined.add_participant(self.player)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.player.user)
+
+    def test_location_is_extracted_on_save(self):
+        self.assertEqual((self.farther.latitude, self.farther.longitude), (31.6, 74.45))
+        self.assertIsNotNone(self.farther.geo_cell)
+
+    def test_nearby_open_games_ranked_by_distance(self):
+        response = self.client.get('/api/games/recommended_games/?lat=31.5&lon=74.3')
+        self.assertEqual(response.status_code, 200)
+        ids = [game['id'] for game in response.data['results']]
+        self.assertEqual(ids, [str(self.near.pk), str(self.farther.pk)])
+        self.assertLess(response.data['results'][0]['distance_km'], 10)
+
+
+class GameNearbyTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        start = timezone.now() + timedelta(days=1)
+        self.games = [
+            create_game(organizer, start, location={'lat': 31.5 + offset, 'lng': 74.3})
+            for offset in (0.03, 0.01, 0.02, 0.5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=create_player('player').user)
+
+    def test_pages_walk_outwards_within_radius(self):
+        url = '/api/games/nearby/?lat=31.5&lon=74.3&radius=5&page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(game['id'] for game in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [str(self.games[i].pk) for i in (1, 2, 0)])
+
+    def test_requires_coordinates(self):
+        self.assertEqual(self.client.get('/api/games/nearby/?lat=31.5').status_code, 400)
+
+    def test_only_upcoming_games_through_the_indexable_window(self):
+        started = create_game(
+            Organizer.objects.get(), timezone.now() - timedelta(minutes=30), location={'lat': 31.5, 'lng': 74.3},
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/games/nearby/?lat=31.5&lon=74.3&radius=5')
+        self.assertNotIn(str(started.pk), [game['id'] for game in response.data['results']])
+        self.assertTrue(any('"start_at" >' in query['sql'] for query in context.captured_queries))
+
+
+class GameSearchTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        start = timezone.now() + timedelta(days=1)
+        self.arena = create_game(
+            organizer, start, title='Friday futsal',
+            venue_details=[{'name': 'Model Town Arena'}], game_rules='Arena rules apply at the arena',
+        )
+        self.park = create_game(
+            organizer, start, title='Sunday kickabout',
+            venue_details=[{'name': 'Race Course Park'}], game_rules='Bring bibs',
+        )
+        self.private = create_game(
+            organizer, start, title='Arena night', visibility='PRIVATE',
+            venue_details=[], game_rules='',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=create_player('player').user)
+
+    def search(self, q):
+        response = self.client.get('/api/games/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [game['id'] for game in response.data['results']]
+
+    def test_matches_title_venue_and_rules(self):
+        self.assertEqual(self.search('arena'), [str(self.arena.pk)])
+        self.assertEqual(self.search('race course'), [str(self.park.pk)])
+        self.assertEqual(self.search('bibs'), [str(self.park.pk)])
+        self.assertEqual(self.search('arena bibs'), [])
+
+    def test_index_follows_updates(self):
+        self.park.title = 'Arena warmup'
+        self.park.save(update_fields=['title'])
+        self.assertEqual(set(self.search('arena')), {str(self.arena.pk), str(self.park.pk)})
+        self.arena.delete()
+        self.assertEqual(self.search('arena'), [str(self.park.pk)])
+
+    def test_search_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"arena" OR *'), [])
+
+    def test_query_without_words_returns_an_empty_page(self):
+        self.assertEqual(self.search('!!!'), [])
+
+
+class GameAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        organizer = create_organizer('organizer')
+        start = timezone.now() + timedelta(days=1)
+        for venue in ('Model Town Arena', 'Model Town Arena', 'Arena Sports'):
+            create_game(organizer, start, title='Sunday futsal', venue_details=[{'name': venue}])
+        self.game = create_game(organizer, start, title='Café Cup', venue_details=[])
+        create_game(organizer, start, title='Arena invitational', visibility='PRIVATE')
+        self.client = APIClient()
+        self.client.force_authenticate(user=create_player('player').user)
+
+    def suggest(self, q):
+        response = self.client.get('/api/games/autocomplete/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [(s['text'], s['games']) for s in response.data['suggestions']]
+
+    def test_completes_any_word_most_used_first(self):
+        self.assertEqual(self.suggest('ARE'), [('Model Town Arena', 2), ('Arena Sports', 1)])
+        self.assertEqual(self.suggest('town a'), [('Model Town Arena', 2)])
+        self.assertEqual(self.suggest('cafe'), [('Café Cup', 1)])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_renamed_game_is_reindexed(self):
+        self.game.title = 'Derby night'
+        self.game.save(update_fields=['title'])
+        self.assertEqual(self.suggest('derby'), [('Derby night', 1)])
+        self.assertEqual(self.suggest('cafe'), [])
+
+    def test_prefixes_past_the_counted_length_are_counted_from_open_rows(self):
+        self.assertEqual(self.suggest('model town arena'), [('Model Town Arena', 2)])
+        self.assertEqual(self.suggest('sunday futsal'), [('Sunday futsal', 3)])
+
+    def test_only_open_games_are_suggested(self):
+        self.game.status = 'CANCELED'
+        self.game.save(update_fields=['status'])
+        Game.objects.get(suggestions__key='arena sports').delete()
+        later = timezone.now() + timedelta(days=2)
+        Game.update_all_game_statuses(now=later)
+        self.assertFalse(GameSuggestion.objects.filter(is_open=True).exists())
+        self.assertEqual(self.suggest('cafe'), [])
+        self.assertEqual(self.suggest('are'), [])
+        self.assertEqual(self.suggest('model town arena'), [])
+
+    def test_rebuild_matches_the_maintained_counts(self):
+        self.game.title = 'Arena cup'
+        self.game.save(update_fields=['title'])
+        Game.objects.filter(title='Arena invitational').get().delete()
+        counts = set(GameSuggestionPrefix.objects.filter(games__gt=0).values_list('prefix', 'text', 'games'))
+        self.assertIn(('are', 'Model Town Arena', 2), counts)
+        self.assertIn(('ar', 'Arena cup', 1), counts)
+
+        call_command('rebuild_game_suggestions', stdout=StringIO())
+        self.assertEqual(set(GameSuggestionPrefix.objects.values_list('prefix', 'text', 'games')), counts)
+
+
+class QueryPlanAuditTests(TestCase):
+    def setUp(self):
+        organizer = create_organizer('organizer')
+        player = create_player('player')
+        now = timezone.now()
+        for day in range(-10, 20):
+            game = create_game(organizer, now + timedelta(days=day))
+            if day % 3 == 0:
+                game.participants.add(player)
+
+    def test_hot_querysets_use_indexes(self):
+        out = StringIO()
+        call_command('audit_query_plans', stdout=out)
+        self.assertNotIn('SEQ SCAN', out.getvalue())
+        self.assertIn('No sequential scans', out.getvalue())
+
+
+class JoinedGameIdsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        organizer = create_organizer('organizer')
+        start = timezone.now() + timedelta(days=1)
+        self.games = [create_game(organizer, start + timedelta(hours=i)) for i in range(3)]
+        self.player = create_player('player')
+        self.client = APIClient()
+
+    def available(self):
+        # A fresh player row per request, as authentication would load it
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.player.user.pk))
+        response = self.client.get('/api/games/available_games/')
+        self.assertEqual(response.status_code, 200)
+        return [game['id'] for game in response.data['results']]
+
+    def test_join_and_leave_update_the_cached_set_exactly(self):
+        self.assertEqual(len(self.available()), 3)
+
+        self.games[0].add_participant(self.player)
+        self.assertNotIn(str(self.games[0].pk), self.available())
+        self.assertEqual(self.player.get_joined_game_ids(), {self.games[0].pk})
+
+        self.games[0].remove_participant(self.player)
+        self.assertEqual(len(self.available()), 3)
+
+    def test_profile_edit_on_a_stale_player_keeps_the_version(self):
+        stale = Player.objects.get(pk=self.player.pk)
+        self.games[0].add_participant(self.player)
+        serializer = PlayerProfileUpdateSerializer(stale, data={'name': 'Renamed'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+
+        self.assertEqual(Player.objects.get(pk=self.player.pk).joined_games_version, self.player.joined_games_version)
+        self.assertNotIn(str(self.games[0].pk), self.available())
+
+    def test_is_joined_marks_listed_games(self):
+        self.games[1].add_participant(self.player)
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.player.user.pk))
+        response = self.client.get('/api/games/')
+        joined = {game['id']: game['is_joined'] for game in response.data['results']}
+        self.assertEqual(joined, {str(game.pk): game == self.games[1] for game in self.games})
+
+
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.game = create_game(
+            self.organizer, timezone.now() + timedelta(days=1), number_of_participants=40
+        )
+
+    def add_players(self, count):
+        existing = Player.objects.count()
+        players = [create_player(f'player{existing + i}') for i in range(count)]
+        for player in players:
+            self.game.add_participant(player)
+        return players
+
+    def post(self, user, action, data=None):
+        """Make the request, then run the worker; returns the worker's statement count"""
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(f'/api/games/{self.game.pk}/{action}/', data, format='json')
+        self.assertLess(response.status_code, 300)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(NotificationEvent.process_batch(), (1, 0))
+        return len(context.captured_queries)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW_SECONDS=0)
+    def test_fan_out_statements_do_not_grow_with_game_size(self):
+        self.add_players(2)
+        small = self.post(create_player('joiner_small').user, 'join')
+        self.add_players(30)
+        large = self.post(create_player('joiner_large').user, 'join')
+
+        self.assertEqual(small, large)
+        # 33 participants before the second join, plus the organizer
+        self.assertEqual(Notification.objects.filter(type='NEW_PARTICIPANT').count(), 3 + 34)
+
+    def test_comment_reaches_everyone_but_the_author(self):
+        author, other = self.add_players(2)
+        self.post(author.user, 'comment', {'content': 'Bring bibs', 'game': str(self.game.pk)})
+
+        notifications = Notification.objects.filter(type='NEW_COMMENT')
+        self.assertEqual(
+            {(n.recipient_player_id, n.recipient_organizer_id) for n in notifications},
+            {(other.pk, None), (None, self.organizer.pk)},
+        )
+        self.assertTrue(all(n.actor_player_id == author.pk for n in notifications))
+
+    def test_cancel_notifies_participants_only(self):
+        players = self.add_players(3)
+        self.post(self.organizer.user, 'cancel')
+
+        notifications = Notification.objects.filter(type='GAME_CANCELED')
+        self.assertEqual({n.recipient_player_id for n in notifications}, {p.pk for p in players})
+        self.assertFalse(notifications.filter(recipient_organizer__isnull=False).exists())
+
+    def test_request_only_queues_the_event(self):
+        players = self.add_players(3)
+        client = APIClient()
+        client.force_authenticate(self.organizer.user)
+        response = client.post(f'/api/games/{self.game.pk}/cancel/')
+        self.assertEqual(response.status_code, 200)
+
+        event = NotificationEvent.objects.get()
+        self.assertEqual((event.type, event.status), ('GAME_CANCELED', NotificationEvent.STATUS_PENDING))
+        self.assertFalse(Notification.objects.exists())
+
+        out = StringIO()
+        call_command('fan_out_notifications', '--json', stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])['claimed'], 1)
+        self.assertEqual(Notification.objects.count(), len(players))
+        event.refresh_from_db()
+        self.assertEqual(event.status, NotificationEvent.STATUS_DONE)
+        self.assertEqual(NotificationEvent.process_batch(), (0, 0))
+
+    def test_rolled_back_events_are_never_sent(self):
+        self.add_players(2)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Notification.notify_game(self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_EVERYONE)
+            raise RuntimeError
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    def post_with_failing_event(self, user, action, data=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch.object(NotificationEvent.objects, 'create', side_effect=RuntimeError('Boom')), \
+                self.assertRaises(RuntimeError):
+            client.post(f'/api/games/{self.game.pk}/{action}/', data, format='json')
+
+    def test_cancel_is_rolled_back_with_its_event(self):
+        self.post_with_failing_event(self.organizer.user, 'cancel')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.status, 'UPCOMING')
+
+    def test_join_is_rolled_back_with_its_event(self):
+        player = create_player('joiner')
+        self.post_with_failing_event(player.user, 'join')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.spots_taken, 0)
+        self.assertFalse(self.game.participants.filter(pk=player.pk).exists())
+
+    def test_comment_is_rolled_back_with_its_event(self):
+        author, = self.add_players(1)
+        self.post_with_failing_event(author.user, 'comment', {'content': 'Bring bibs', 'game': str(self.game.pk)})
+        self.assertFalse(self.game.comments.exists())
+
+    def test_failed_fan_out_is_retried_after_a_backoff(self):
+        self.add_players(2)
+        Notification.notify_game(self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_EVERYONE)
+        now = timezone.now()
+        with mock.patch.object(Notification, 'create_batch', side_effect=RuntimeError('Boom')), \
+                self.assertLogs('main.models.notification', 'ERROR'):
+            self.assertEqual(NotificationEvent.process_batch(now=now), (1, 1))
+        self.assertFalse(Notification.objects.exists())
+        event = NotificationEvent.objects.get()
+        self.assertEqual((event.attempts, event.last_error), (1, 'Boom'))
+        self.assertEqual(event.next_attempt_at, now + leases.BACKOFF_BASE)
+
+        self.assertEqual(NotificationEvent.process_batch(now=now), (0, 0))
+        self.assertEqual(NotificationEvent.process_batch(now=event.next_attempt_at), (1, 0))
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_worker_whose_lease_ran_out_does_not_fan_out_again(self):
+        self.add_players(2)
+        Notification.notify_game(self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_EVERYONE)
+        now = timezone.now()
+        slow_claim = NotificationEvent.claim_batch(10, now)
+        # Another worker takes the event over once the slow worker's lease expires
+        later = now + leases.CLAIM_TIMEOUT + timedelta(seconds=1)
+        self.assertEqual(NotificationEvent.process_batch(now=later), (1, 0))
+        self.assertEqual(Notification.objects.count(), 3)
+
+        with mock.patch.object(NotificationEvent, 'claim_batch', return_value=slow_claim), \
+                self.assertLogs('main.models.notification', 'WARNING'):
+            self.assertEqual(NotificationEvent.process_batch(now=now), (1, 0))
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertEqual(NotificationEvent.objects.get().attempts, 1)
+
+
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.organizer.fcm_token = 'organizer-token'
+        self.organizer.save(update_fields=['fcm_token'])
+        self.game = create_game(
+            self.organizer, timezone.now() + timedelta(days=1), number_of_participants=20
+        )
+
+    def join(self, name):
+        player = create_player(name)
+        self.game.add_participant(player)
+        Notification.notify_game(
+            self.game, 'NEW_PARTICIPANT', f'{name} joined', Notification.AUDIENCE_ORGANIZER,
+            actor_player=player,
+        )
+        NotificationEvent.process_batch()
+        return player
+
+    def organizer_notifications(self):
+        return Notification.objects.filter(recipient_organizer=self.organizer).order_by('created_at')
+
+    def test_burst_becomes_one_digest(self):
+        self.join('first')
+        self.join('second')
+        last = self.join('third')
+
+        digest = self.organizer_notifications().get()
+        self.assertEqual(digest.coalesced_count, 3)
+        self.assertEqual(digest.message, f'3 players joined "{self.game.title}"')
+        self.assertEqual(digest.actor_player_id, last.pk)
+        self.organizer.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(self.organizer.unread_notifications, 1)
+        self.assertEqual(PushMessage.objects.filter(token='organizer-token').count(), 1)
+
+    def test_read_or_old_digests_are_not_reopened(self):
+        self.join('first')
+        Notification.mark_read(self.organizer)
+        self.join('second')
+        Notification.objects.filter(pk=self.organizer_notifications().last().pk).update(
+            created_at=timezone.now() - Notification.get_coalesce_window() - timedelta(seconds=1)
+        )
+        self.join('third')
+
+        self.assertEqual(
+            [n.coalesced_count for n in self.organizer_notifications()], [1, 1, 1]
+        )
+        self.organizer.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(self.organizer.unread_notifications, 2)
+
+    def test_other_types_are_not_coalesced(self):
+        for _ in range(2):
+            Notification.notify_game(
+                self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_ORGANIZER
+            )
+        NotificationEvent.process_batch()
+        self.assertEqual(self.organizer_notifications().count(), 2)
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.player = create_player('player')
+        self.game = create_game(self.organizer, timezone.now() + timedelta(days=1))
+        self.client = APIClient()
+        # A fresh user, as a request would load, so user.player is not a stale cached instance
+        self.client.force_authenticate(CustomUser.objects.get(pk=self.player.user.pk))
+
+    def notify(self, count):
+        start = timezone.now()
+        notifications = Notification.create_batch([
+            Notification(
+                type='NEW_COMMENT',
+                message=f'Comment {i}',
+                game=self.game,
+                recipient_player=self.player,
+            )
+            for i in range(count)
+        ])
+        # Distinct timestamps so inbox order is predictable
+        for i, notification in enumerate(notifications):
+            at = start + timedelta(seconds=i)
+            Notification.objects.filter(pk=notification.pk).update(created_at=at, last_event_at=at)
+        return notifications
+
+    def unread(self):
+        self.player.refresh_from_db(fields=['unread_notifications'])
+        return self.player.unread_notifications
+
+    def test_inbox_pages_newest_first(self):
+        notifications = self.notify(5)
+        response = self.client.get('/api/notifications/', {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        first = [item['message'] for item in response.data['results']]
+        self.assertEqual(first, ['Comment 4', 'Comment 3', 'Comment 2'])
+
+        response = self.client.get(response.data['next'])
+        second = [item['message'] for item in response.data['results']]
+        self.assertEqual(second, ['Comment 1', 'Comment 0'])
+        self.assertEqual(len(notifications), 5)
+
+    def test_digests_moving_up_mid_walk_are_not_repeated_and_head_the_first_page(self):
+        notifications = self.notify(5)
+        response = self.client.get('/api/notifications/', {'page_size': 2})
+        self.assertEqual([item['message'] for item in response.data['results']], ['Comment 4', 'Comment 3'])
+
+        # One row not yet paged to and one already shown gain events
+        later = timezone.now() + timedelta(minutes=1)
+        Notification.objects.filter(pk=notifications[0].pk).update(last_event_at=later)
+        Notification.objects.filter(pk=notifications[4].pk).update(last_event_at=later + timedelta(seconds=1))
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['message'] for item in response.data['results']], ['Comment 2', 'Comment 1'])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/notifications/', {'page_size': 2})
+        self.assertEqual([item['message'] for item in response.data['results']], ['Comment 4', 'Comment 0'])
+
+    def test_unread_count_is_read_from_the_counter(self):
+        self.notify(4)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.data, {'unread': 4})
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in context.captured_queries))
+
+    def test_mark_read_up_to_leaves_newer_notifications_unread(self):
+        notifications = self.notify(5)
+        response = self.client.post(
+            '/api/notifications/mark-read/', {'up_to': str(notifications[2].pk)}, format='json'
+        )
+        self.assertEqual(response.data, {'marked': 3, 'unread': 2})
+        self.assertEqual(
+            set(Notification.objects.filter(is_read=False).values_list('message', flat=True)),
+            {'Comment 3', 'Comment 4'},
+        )
+
+        response = self.client.post('/api/notifications/mark-read/', {}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 0})
+        self.assertEqual(self.unread(), 0)
+
+    def test_digest_joined_after_the_cursor_stays_unread_and_moves_up(self):
+        self.game.add_participant(self.player)
+        Notification.notify_game(self.game, 'NEW_COMMENT', 'First comment', Notification.AUDIENCE_PARTICIPANTS)
+        NotificationEvent.process_batch()
+        digest = Notification.objects.get()
+        Notification.objects.filter(pk=digest.pk).update(
+            created_at=timezone.now() - timedelta(seconds=20), last_event_at=timezone.now() - timedelta(seconds=20),
+        )
+        cursor = Notification.create_batch([
+            Notification(type='GAME_STARTING_SOON', message='Starting soon', game=self.game, recipient_player=self.player)
+        ])[0]
+        # The client loads its inbox, then another comment joins the older digest
+        Notification.notify_game(self.game, 'NEW_COMMENT', 'Second comment', Notification.AUDIENCE_PARTICIPANTS)
+        NotificationEvent.process_batch()
+
+        response = self.client.get('/api/notifications/')
+        self.assertEqual([item['id'] for item in response.data['results']], [str(digest.pk), str(cursor.pk)])
+
+        response = self.client.post('/api/notifications/mark-read/', {'up_to': str(cursor.pk)}, format='json')
+        self.assertEqual(response.data, {'marked': 1, 'unread': 1})
+        digest.refresh_from_db()
+        self.assertEqual((digest.is_read, digest.coalesced_count), (False, 2))
+
+    def test_mark_read_rejects_another_recipients_notification(self):
+        other = create_player('other')
+        notification = Notification.create_batch([
+            Notification(type='NEW_COMMENT', message='Not yours', game=self.game, recipient_player=other)
+        ])[0]
+        response = self.client.post(
+            '/api/notifications/mark-read/', {'up_to': str(notification.pk)}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        other.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(other.unread_notifications, 1)
+
+    def test_fan_out_maintains_counters(self):
+        self.game.add_participant(self.player)
+        Notification.notify_game(
+            self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_EVERYONE
+        )
+        NotificationEvent.process_batch()
+        self.organizer.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(self.organizer.unread_notifications, 1)
+
+
+class RecordingTransport:
+    """Push transport returning preset outcomes per token, SENT by default"""
+    multicast_limit = 3
+
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.multicasts = []
+
+    def send(self, payload, tokens):
+        self.multicasts.append((payload, tokens))
+        return {token: self.outcomes.get(token, (push.SENT, '')) for token in tokens}
+
+
+class PushDeliveryTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.game = create_game(
+            self.organizer, timezone.now() + timedelta(days=1), number_of_participants=20
+        )
+        self.players = [create_player(f'player{i}') for i in range(5)]
+        for i, player in enumerate(self.players):
+            # The last player has no device registered
+            player.fcm_token = f'token{i}' if i < 4 else None
+            player.save(update_fields=['fcm_token'])
+            self.game.add_participant(player)
+
+    def cancel(self):
+        Notification.notify_game(
+            self.game, 'GAME_CANCELED', 'Canceled', Notification.AUDIENCE_PARTICIPANTS
+        )
+        NotificationEvent.process_batch()
+
+    def test_fan_out_is_sent_as_multicasts_up_to_the_limit(self):
+        self.cancel()
+        self.assertEqual(PushMessage.objects.count(), 4)
+
+        transport = RecordingTransport()
+        stats = push.deliver_batch(transport)
+
+        self.assertEqual([len(tokens) for _, tokens in transport.multicasts], [3, 1])
+        self.assertEqual(transport.multicasts[0][0]['body'], 'Canceled')
+        self.assertEqual(transport.multicasts[0][0]['title'], self.game.title)
+        self.assertEqual((stats.claimed, stats.multicasts, stats.sent), (4, 2, 4))
+        self.assertEqual(PushMessage.objects.filter(status=PushMessage.STATUS_SENT).count(), 4)
+        self.assertEqual(push.deliver_batch(transport).claimed, 0)
+
+    def test_transient_failures_back_off_then_fail(self):
+        self.cancel()
+        transport = RecordingTransport({'token0': (push.RETRY, 'Unavailable')})
+        now = timezone.now()
+
+        stats = push.deliver_batch(transport, now=now)
+        message = PushMessage.objects.get(token='token0')
+        self.assertEqual((stats.sent, stats.retried), (3, 1))
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.next_attempt_at, now + leases.BACKOFF_BASE)
+        # Not due again until the backoff has passed
+        self.assertEqual(push.deliver_batch(transport, now=now + timedelta(seconds=1)).claimed, 0)
+
+        for attempt in range(2, leases.MAX_ATTEMPTS + 1):
+            now += leases.get_backoff(attempt - 1)
+            push.deliver_batch(transport, now=now)
+        message.refresh_from_db()
+        self.assertEqual(message.status, PushMessage.STATUS_FAILED)
+        self.assertEqual(message.last_error, 'Unavailable')
+
+    def test_worker_whose_lease_ran_out_does_not_overwrite_the_outcome(self):
+        self.cancel()
+        now = timezone.now()
+        takeover = RecordingTransport()
+
+        class SlowTransport(RecordingTransport):
+            def send(self, payload, tokens):
+                # Another worker takes the messages over once the lease runs out
+                push.deliver_batch(takeover, now=now + leases.CLAIM_TIMEOUT + timedelta(seconds=1))
+                return {token: (push.RETRY, 'Timeout') for token in tokens}
+
+        stats = push.deliver_batch(SlowTransport(), batch_size=1, now=now)
+
+        self.assertEqual((stats.claimed, stats.retried), (1, 0))
+        self.assertEqual(PushMessage.objects.filter(status=PushMessage.STATUS_SENT).count(), 4)
+        self.assertFalse(PushMessage.objects.exclude(attempts=1).exists())
+
+    def test_dead_tokens_are_pruned(self):
+        self.cancel()
+        self.cancel()
+        transport = RecordingTransport({'token1': (push.DEAD, 'Unregistered')})
+        transport.multicast_limit = 1
+
+        pruned = 0
+        for _ in range(8):
+            pruned += push.deliver_batch(transport, batch_size=1).tokens_pruned
+
+        self.assertEqual(pruned, 1)
+        self.players[1].refresh_from_db()
+        self.assertIsNone(self.players[1].fcm_token)
+        # The second message for that token is dropped without being sent
+        self.assertEqual(
+            PushMessage.objects.filter(token='token1', status=PushMessage.STATUS_DEAD_TOKEN).count(), 2
+        )
+
+    def test_command_drains_the_queue_with_the_log_transport(self):
+        self.cancel()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'push.log')
+            out = StringIO()
+            with override_settings(PUSH_TRANSPORT='main.push.LogTransport', PUSH_LOG_FILE=path):
+                call_command('deliver_push_notifications', '--batch-size', '3', '--json', stdout=out)
+            with open(path) as log_file:
+                logged = [json.loads(line) for line in log_file]
+
+        reports = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([report['claimed'] for report in reports], [3, 1, 4])
+        self.assertEqual(reports[-1]['label'], 'total')
+        self.assertEqual(sorted(token for entry in logged for token in entry['tokens']), [f'token{i}' for i in range(4)])
+
+
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.organizer = create_organizer('organizer')
+        self.player = create_player('player')
+        self.game = create_game(self.organizer, timezone.now() + timedelta(days=1))
+
+    def notify(self, notification_type, days_old, is_read=False, recipient=None, count=1):
+        recipient = recipient or self.player
+        notifications = Notification.create_batch([
+            Notification(
+                type=notification_type,
+                message='Event',
+                game=self.game,
+                is_read=is_read,
+                **Notification.recipient_filter(recipient),
+            )
+            for _ in range(count)
+        ])
+        at = timezone.now() - timedelta(days=days_old)
+        Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(created_at=at, last_event_at=at)
+        return notifications
+
+    def prune(self, *args):
+        out = StringIO()
+        call_command('prune_notifications', '--sleep', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_old_read_notifications_only(self):
+        self.notify('GAME_CANCELED', 40, is_read=True, count=3)
+        recent = self.notify('GAME_CANCELED', 5, is_read=True)
+        unread = self.notify('GAME_CANCELED', 40)
+
+        self.prune('--batch-size', '2')
+
+        remaining = set(Notification.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {recent[0].pk, unread[0].pk})
+
+    def test_collapses_stale_unread_and_keeps_counters_in_step(self):
+        self.notify('NEW_PARTICIPANT', 100, count=4)
+        self.notify('NEW_PARTICIPANT', 100, recipient=self.organizer, count=2)
+        self.notify('GAME_CANCELED', 100, count=2)
+        self.notify('NEW_PARTICIPANT', 10)
+
+        self.prune('--batch-size', '3')
+
+        digest = Notification.objects.get(
+            recipient_player=self.player, type='NEW_PARTICIPANT', created_at__lt=timezone.now() - timedelta(days=90)
+        )
+        self.assertEqual(digest.coalesced_count, 4)
+        self.assertEqual(digest.message, f'4 players joined "{self.game.title}"')
+        self.assertEqual(
+            Notification.objects.get(recipient_player=self.player, type='GAME_CANCELED').coalesced_count, 2
+        )
+        self.assertEqual(Notification.objects.filter(recipient_organizer=self.organizer).count(), 1)
+        # Counters match what is left unread
+        for recipient in (self.player, self.organizer):
+            recipient.refresh_from_db(fields=['unread_notifications'])
+            self.assertEqual(
+                recipient.unread_notifications,
+                Notification.objects.filter(is_read=False, **Notification.recipient_filter(recipient)).count(),
+            )
+
+    def test_keeps_the_newest_row_of_each_group(self):
+        rows = [self.notify('NEW_COMMENT', days_old)[0] for days_old in (120, 95, 130, 100)]
+
+        self.prune('--batch-size', '1')
+
+        kept = Notification.objects.get()
+        self.assertEqual(kept.pk, rows[1].pk)
+        self.assertEqual(kept.coalesced_count, 4)
+
+    def test_dry_run_changes_nothing(self):
+        self.notify('GAME_CANCELED', 40, is_read=True, count=2)
+        self.notify('NEW_COMMENT', 100, count=2)
+
+        output = self.prune('--dry-run')
+
+        self.assertIn('Would remove 2 read and 1 collapsed unread', output)
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_stops_when_the_time_budget_is_spent(self):
+        self.notify('GAME_CANCELED', 40, is_read=True, count=3)
+
+        output = self.prune('--batch-size', '1', '--max-seconds', '0')
+
+        self.assertIn('--max-seconds reached', output)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_reconcile_resets_drifted_unread_counters(self):
+        self.notify('GAME_CANCELED', 1, count=3)
+        self.notify('GAME_CANCELED', 1, recipient=self.organizer)
+        Player.objects.filter(pk=self.player.pk).update(unread_notifications=0)
+
+        self.assertIn('would fix 1 unread counters', self.prune('--reconcile-counters', '--dry-run'))
+        self.assertIn('fixed 1 unread counters', self.prune('--reconcile-counters', '--batch-size', '1'))
+        self.player.refresh_from_db(fields=['unread_notifications'])
+        self.organizer.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(self.player.unread_notifications, 3)
+        self.assertEqual(self.organizer.unread_notifications, 1)
+
+    def test_profile_edit_on_a_stale_player_keeps_the_unread_counter(self):
+        stale = Player.objects.get(pk=self.player.pk)
+        self.notify('GAME_CANCELED', 1, count=2)
+        serializer = PlayerProfileUpdateSerializer(stale, data={'name': 'Renamed'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+
+        self.player.refresh_from_db(fields=['unread_notifications'])
+        self.assertEqual(self.player.unread_notifications, 2)